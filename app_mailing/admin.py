@@ -1,6 +1,8 @@
 from django.contrib import admin
 
-from app_mailing.models import Attempt, Mailing, Message, Recipient
+from app_mailing.models import (Attempt, AttemptArchive, Mailing, Message,
+                                OwnerDailyStats, Recipient, Segment,
+                                ServerResponse, Suppression)
 
 
 @admin.register(Recipient)
@@ -11,6 +13,14 @@ class RecipientAdmin(admin.ModelAdmin):
     search_fields = ("email", "full_name", "owner__email",)
 
 
+@admin.register(Segment)
+class SegmentAdmin(admin.ModelAdmin):
+    """Настройка отображения данных "Сегмент получателей" в админке (модель *Segment*)."""
+    list_display = ("id", "name", "kind", "value", "owner",)
+    list_filter = ("kind", "owner",)
+    search_fields = ("name", "value", "owner__email",)
+
+
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
     """Настройка отображения данных "Сообщение рассылки" в админке (модель *Message*)."""
@@ -22,14 +32,54 @@ class MessageAdmin(admin.ModelAdmin):
 @admin.register(Mailing)
 class MailingAdmin(admin.ModelAdmin):
     """Настройка отображения данных "Рассылка" в админке (модель *Mailing*)."""
-    list_display = ("id", "first_message_sending", "end_message_sending", "status", "message", "owner",)
+    list_display = (
+        "id", "first_message_sending", "end_message_sending", "status", "message", "segment", "owner",
+        "recipient_count", "success_count", "failed_count", "suppressed_count", "pending_count",
+    )
     list_filter = ("first_message_sending", "end_message_sending", "status", "message", "owner",)
     search_fields = ("first_message_sending", "end_message_sending", "status", "message", "owner__email",)
+    # Счетчики поддерживаются автоматически (services.py, signals.py) - вручную их не редактируем
+    readonly_fields = ("recipient_count", "success_count", "failed_count", "suppressed_count", "pending_count",)
 
 
 @admin.register(Attempt)
 class AttemptAdmin(admin.ModelAdmin):
     """Настройка отображения данных "Попытки рассылки" в админке (модель *Attempt*)."""
-    list_display = ("id", "attempt_time", "status", "server_response", "mailing", "recipient", "owner",)
-    list_filter = ("attempt_time", "status", "server_response", "mailing", "recipient", "owner",)
-    search_fields = ("attempt_time", "status", "server_response", "mailing", "recipient", "owner__email",)
+    list_display = ("id", "attempt_time", "status", "response", "mailing", "recipient", "owner",)
+    list_filter = ("attempt_time", "status", "response", "mailing", "recipient", "owner",)
+    search_fields = ("attempt_time", "status", "response__text", "mailing", "recipient", "owner__email",)
+    list_select_related = ("response", "mailing", "recipient", "owner",)
+
+
+@admin.register(ServerResponse)
+class ServerResponseAdmin(admin.ModelAdmin):
+    """Настройка отображения данных "Ответ почтового сервера" в админке (модель *ServerResponse*)."""
+    list_display = ("id", "text", "digest",)
+    search_fields = ("text",)
+    readonly_fields = ("digest",)
+
+
+@admin.register(AttemptArchive)
+class AttemptArchiveAdmin(admin.ModelAdmin):
+    """Настройка отображения данных "Архив попыток рассылок" в админке (модель *AttemptArchive*)."""
+    list_display = ("id", "partition", "archived_before", "path", "archived_at",)
+    readonly_fields = ("partition", "archived_before", "path", "mailing_ids", "archived_at",)
+
+
+@admin.register(OwnerDailyStats)
+class OwnerDailyStatsAdmin(admin.ModelAdmin):
+    """Настройка отображения данных "Дневная статистика" в админке (модель *OwnerDailyStats*)."""
+    list_display = (
+        "id", "owner", "day", "successful_attempts", "failed_attempts",
+        "launched_mailings", "accomplished_mailings", "sent_mailings",
+    )
+    list_filter = ("day", "owner",)
+    search_fields = ("owner__email",)
+
+
+@admin.register(Suppression)
+class SuppressionAdmin(admin.ModelAdmin):
+    """Настройка отображения данных "Список исключений" в админке (модель *Suppression*)."""
+    list_display = ("id", "email", "owner", "reason", "created_at",)
+    list_filter = ("reason", "owner",)
+    search_fields = ("email", "owner__email",)
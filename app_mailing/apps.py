@@ -14,6 +14,10 @@ class AppMailingConfig(AppConfig):
 
     def ready(self):
         import os
+
+        # Регистрирую обработчики сигналов (счетчики рассылок)
+        from . import signals  # noqa: F401
+
         if os.environ.get("RUN_MAIN") == "true":  # защита от двойного запуска Gunicorn/Runserver
             from . import scheduler
             try:
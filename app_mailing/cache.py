@@ -0,0 +1,343 @@
+"""Кэш страниц списков (получатели, сообщения, рассылки) со сбросом по поколениям (generation counters).
+
+Для каждой модели ведется счетчик поколения на владельца ("gen:app_mailing.recipient:42") и общий счетчик модели
+("gen:app_mailing.recipient:all" - для Менеджера сервиса, который видит данные всех пользователей). Ключ страницы
+содержит текущие поколения всех моделей, данные которых выводятся на странице. Любое изменение данных владельца
+увеличивает его счетчик (и общий) - страницы со старыми поколениями больше не читаются и истекают сами. Сброс -
+это один INCR в Redis, без поиска ключей страниц, и он одинаково работает во всех процессах. Счетчики читаются на
+каждый запрос, поэтому хранятся в кэше "горячих" значений (алиас hot, config/cache_backends.py).
+
+Поколения увеличивают сигналы (post_save, post_delete, m2m_changed в app_mailing/signals.py) и сервисные функции,
+изменяющие данные без сигналов (отправка и остановка рассылок, импорт и слияние получателей).
+
+Защита от "стампеда" (get_or_rebuild): значение хранится в "конверте" с версией (поколениями), сроком свежести и
+временем вычисления. Пересчитывает значение только один запрос - тот, кто взял короткую блокировку в Redis, остальные
+в это время получают прежнее (устаревшее) значение (stale-while-revalidate). Кроме того, незадолго до истечения
+срока свежести значение пересчитывается заранее с вероятностью, растущей к концу срока (алгоритм XFetch) - так
+одновременные запросы не упираются в истекший ключ все сразу.
+
+Условные GET-запросы (ConditionalGetMixin): ETag страницы - хэш версии ее данных (тех же поколений), пользователя
+и строки запроса. Если браузер присылает If-None-Match с текущим ETag, сервер отвечает 304 Not Modified, не
+выполняя запросов к БД и не рендеря шаблон."""
+import functools
+import hashlib
+import math
+import os
+import random
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import quote_etag
+
+from config.cache_backends import hot_cache
+
+GENERATION_KEY = "gen:{model}:{owner}"
+PAGE_CACHE_KEY = "page:{view}:{viewer}:{scope}:{query}"
+PAGE_CACHE_TIMEOUT = 60 * 15
+REBUILD_LOCK_KEY = "lock:{key}"
+REBUILD_LOCK_TIMEOUT = 30  # Блокировка пересчета снимается сама, если пересчитывающий процесс упал
+REBUILD_WAIT = 2  # Сколько секунд ждать чужого пересчета, если прежнего значения нет
+STALE_TIMEOUT = 60 * 5  # Сколько хранить значение после окончания срока свежести (для stale-while-revalidate)
+XFETCH_BETA = 1.0  # Больше 1 - пересчитывать раньше, меньше 1 - позже
+
+
+def _model_label(model):
+    """Имя счетчика поколения: модель или произвольное имя данных (например, "dashboard")."""
+    return model if isinstance(model, str) else model._meta.label_lower
+
+
+def get_generations(models, owner_id=None):
+    """Текущие поколения моделей владельца (owner_id=None - общие поколения моделей). Отсутствующий в кэше счетчик
+    (еще не создан или вытеснен) создается со значением-меткой времени: после вытеснения счетчик не начнется заново
+    с прежних значений и не "оживит" старые страницы."""
+    owner = "all" if owner_id is None else owner_id
+    keys = [GENERATION_KEY.format(model=_model_label(model), owner=owner) for model in models]
+    generations = hot_cache.get_many(keys)
+    for key in keys:
+        if key not in generations:
+            hot_cache.add(key, time.time_ns(), timeout=None)
+            generations[key] = hot_cache.get(key)
+    return [generations[key] for key in keys]
+
+
+def _incr_generation(key):
+    try:
+        hot_cache.incr(key)
+    except ValueError:  # Счетчика нет в кэше - страниц с ним тоже нет, создаю новый
+        hot_cache.add(key, time.time_ns(), timeout=None)
+
+
+def bump_generation(model, owner_id):
+    """Сервисная функция для сброса кэша страниц со списками модели владельца: увеличивает поколение модели у
+    владельца и общее поколение модели (после коммита транзакции, чтобы страница не была закэширована заново по еще
+    не закоммиченным данным)."""
+    if owner_id is None:
+        return
+    label = _model_label(model)
+
+    def bump():
+        _incr_generation(GENERATION_KEY.format(model=label, owner=owner_id))
+        _incr_generation(GENERATION_KEY.format(model=label, owner="all"))
+
+    transaction.on_commit(bump)
+
+
+def is_fresh(envelope, version, beta=XFETCH_BETA):
+    """True, если значение в конверте можно отдавать без пересчета: версия совпадает, а срок свежести не истек с
+    учетом XFetch - время вычисления (delta), умноженное на -log(random), "сдвигает" текущий момент вперед, поэтому
+    долгие вычисления начинаются заранее и не одновременно."""
+    if envelope is None or envelope["version"] != version:
+        return False
+    return time.time() - envelope["delta"] * beta * math.log(1.0 - random.random()) < envelope["expires"]
+
+
+def store_envelope(key, value, version, timeout, delta):
+    """Кладет значение в кэш в конверте. Конверт живет дольше срока свежести (на STALE_TIMEOUT), чтобы было что
+    отдавать, пока другой запрос пересчитывает значение."""
+    envelope = {"value": value, "version": version, "expires": time.time() + timeout, "delta": delta}
+    cache.set(key, envelope, timeout + STALE_TIMEOUT)
+
+
+def acquire_rebuild_lock(key):
+    """Пытается взять блокировку пересчета значения (атомарный add в Redis): True - пересчитывает этот запрос."""
+    return cache.add(REBUILD_LOCK_KEY.format(key=key), 1, REBUILD_LOCK_TIMEOUT)
+
+
+def release_rebuild_lock(key):
+    cache.delete(REBUILD_LOCK_KEY.format(key=key))
+
+
+def wait_for_rebuild(key, version):
+    """Ждет (до REBUILD_WAIT секунд), пока другой запрос положит в кэш значение нужной версии."""
+    deadline = time.monotonic() + REBUILD_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        envelope = cache.get(key)
+        if envelope is not None and envelope["version"] == version:
+            return envelope
+    return None
+
+
+def get_or_rebuild(key, compute, timeout, version=None, with_version=False):
+    """Значение из кэша с защитой от "стампеда":
+    - свежее значение (is_fresh) - отдается из кэша;
+    - иначе пересчитывает только запрос, взявший блокировку, а остальные получают прежнее значение;
+    - если прежнего значения нет (первый запрос или вытеснение), остальные ждут пересчета до REBUILD_WAIT секунд, а
+    потом вычисляют значение сами.
+    :param key: ключ кэша.
+    :param compute: функция без аргументов, вычисляющая значение.
+    :param timeout: срок свежести значения, в секундах.
+    :param version: версия данных (например, поколения) - значение другой версии считается устаревшим.
+    :param with_version: вернуть пару (значение, его версия) - прежнее значение отдается со своей, прежней версией
+    (нужно для ETag, см. ConditionalGetMixin)."""
+    envelope = cache.get(key)
+    if is_fresh(envelope, version):
+        value, value_version = envelope["value"], envelope["version"]
+    elif not acquire_rebuild_lock(key):
+        if envelope is None:
+            envelope = wait_for_rebuild(key, version)
+        if envelope is not None:
+            value, value_version = envelope["value"], envelope["version"]
+        else:
+            value, value_version = compute(), version
+    else:
+        try:
+            started = time.monotonic()
+            value, value_version = compute(), version
+            store_envelope(key, value, version, timeout, time.monotonic() - started)
+        finally:
+            release_rebuild_lock(key)
+    return (value, value_version) if with_version else value
+
+
+def _hash(value):
+    return hashlib.md5(value.encode("utf-8")).hexdigest()
+
+
+def get_cache_scope(request):
+    """Владелец, чьи данные выводятся пользователю (None - Менеджер сервиса видит данные всех пользователей)."""
+    return None if request.authz.is_manager else request.user.pk
+
+
+def get_viewer_cache_key(request):
+    """Часть ключа кэша, зависящая от того, кто смотрит страницу: пользователь, его email и аватар (выводятся в
+    меню), права (меню, кнопки, статус блокировки) и CSRF-секрет из cookie (в формах страницы есть CSRF-токен,
+    который подходит только к своему секрету). None - у клиента еще нет CSRF-cookie: при рендере будет создан новый
+    секрет, кэшировать нельзя."""
+    csrf_secret = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+    if not csrf_secret:
+        return None
+    authz, user = request.authz, request.user
+    rights = repr((
+        authz.is_manager, authz.is_blocked, authz.is_superuser, sorted(authz.permissions),
+        user.email, str(user.avatar),
+    ))
+    return f"{user.pk}:{_hash(rights)}:{_hash(csrf_secret)}"
+
+
+@functools.cache
+def get_templates_version():
+    """Версия шаблонов проекта (время изменения файлов шаблонов приложений проекта) - входит в ETag, чтобы после
+    выкладки новых шаблонов браузеры не получали 304 на страницы со старой версткой. Считается один раз на процесс."""
+    mtimes = []
+    for app_config in apps.get_app_configs():
+        if not app_config.path.startswith(str(settings.BASE_DIR)):
+            continue
+        for root, _, files in os.walk(os.path.join(app_config.path, "templates")):
+            mtimes.extend(os.path.getmtime(os.path.join(root, name)) for name in files)
+    return _hash(repr((len(mtimes), max(mtimes, default=0))))
+
+
+class ConditionalGetMixin:
+    """Миксин для страниц: условный GET по ETag. Версию данных страницы задает get_cache_version() (например,
+    поколения моделей); ETag - хэш версии, пользователя и его прав (get_viewer_cache_key), CSRF-секрета (в формах
+    страницы есть CSRF-токен), области данных, строки запроса и версии шаблонов. На If-None-Match с текущим ETag
+    отвечает 304 Not Modified - без запросов к БД и рендера шаблона.
+    Ответы (200 и 304) помечаются "Cache-Control: private, no-cache" (хранить только в браузере и каждый раз
+    проверять ETag) и "Vary: Cookie" (страница зависит от пользователя) - общий кэш (nginx, прокси) не отдаст
+    страницу или 304 другому пользователю, а ETag другого пользователя все равно не совпадет.
+    Last-Modified не выставляется: версии - счетчики, а не время, а точности в секунду недостаточно, чтобы отличить
+    два изменения за одну секунду. Если ждут показа уведомления (messages) или у клиента еще нет CSRF-cookie - ETag
+    нет, страница рендерится полностью.
+    Если страница выведена по прежней версии данных (из кэша, пока другой запрос пересчитывает), контроллер
+    записывает ее в self.rendered_version - ETag ответа строится по ней, и следующий запрос получит новую страницу.
+    etag_lifetime (секунды) - ограничить срок жизни ETag, если на странице есть данные, зависящие от времени.
+    Указывается в списке базовых классов после LoginRequiredMixin."""
+
+    etag_lifetime = None
+
+    def get_cache_version(self, request):
+        """Версия данных страницы (None - страница без условного GET)."""
+        return None
+
+    def get_current_version(self, request):
+        """Текущая версия данных (get_cache_version), вычисляется один раз за запрос."""
+        if not hasattr(self, "_current_version"):
+            self._current_version = self.get_cache_version(request)
+        return self._current_version
+
+    def get_etag(self, request, version):
+        viewer = get_viewer_cache_key(request)
+        if version is None or viewer is None or len(messages.get_messages(request)):
+            return None
+        lifetime = int(time.time() // self.etag_lifetime) if self.etag_lifetime else ""
+        return quote_etag(_hash(":".join(str(part) for part in (
+            get_templates_version(), type(self).__name__, viewer, get_cache_scope(request) or "all",
+            request.META.get("QUERY_STRING", ""), version, lifetime,
+        ))))
+
+    def add_conditional_headers(self, request, response):
+        """ETag (по версии выведенных данных), Cache-Control и Vary для ответа на GET-запрос."""
+        if response.status_code == 200 and not response.streaming:
+            etag = self.get_etag(request, getattr(self, "rendered_version", self.get_current_version(request)))
+            if etag is not None:
+                response["ETag"] = etag
+        if response.status_code in (200, 304):
+            patch_cache_control(response, private=True, no_cache=True)
+            patch_vary_headers(response, ("Cookie",))
+        return response
+
+    def get_not_modified_response(self, request):
+        """Ответ 304 Not Modified (или 412 на невыполненный If-Match), если версия у клиента совпадает с текущей,
+        иначе None."""
+        etag = self.get_etag(request, self.get_current_version(request))
+        if etag is None:
+            return None
+        response = get_conditional_response(request, etag=etag)
+        if response is not None:
+            response["ETag"] = etag
+            self.add_conditional_headers(request, response)
+        return response
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return super().dispatch(request, *args, **kwargs)
+        response = self.get_not_modified_response(request)
+        if response is not None:
+            return response
+        return self.add_conditional_headers(request, super().dispatch(request, *args, **kwargs))
+
+
+class GenerationCacheMixin(ConditionalGetMixin):
+    """Миксин для списков: кэширует отрендеренную страницу (GET) в ключе с поколениями моделей cache_models.
+    Ключ также учитывает пользователя (get_viewer_cache_key), область данных (свои данные или, для Менеджера
+    сервиса, данные всех пользователей) и строку запроса (курсор и размер страницы).
+    Если в сессии ждут показа уведомления (django.contrib.messages) - страница рендерится без кэша, иначе уведомление
+    было бы потеряно (или показано из кэша повторно).
+    Поколения - также версия для условного GET (ConditionalGetMixin): если страница у браузера не изменилась, ответ
+    304 отдается еще до чтения кэша страницы.
+    Указывается в списке базовых классов после LoginRequiredMixin."""
+
+    cache_models = ()
+    cache_timeout = PAGE_CACHE_TIMEOUT
+
+    def get_page_cache_key(self, request):
+        """Ключ страницы без поколений: поколения - версия значения в конверте, поэтому после сброса кэша
+        прежняя страница остается доступной как устаревшая, пока ее пересчитывает один запрос."""
+        viewer = get_viewer_cache_key(request)
+        if viewer is None or len(messages.get_messages(request)):
+            return None
+        return PAGE_CACHE_KEY.format(
+            view=type(self).__name__,
+            viewer=viewer,
+            scope=get_cache_scope(request) or "all",
+            query=_hash(request.META.get("QUERY_STRING", "")),
+        )
+
+    def get_cache_version(self, request):
+        return ".".join(str(generation) for generation in get_generations(self.cache_models, get_cache_scope(request)))
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return super().dispatch(request, *args, **kwargs)
+        response = self.get_not_modified_response(request)
+        if response is not None:
+            return response
+        key = self.get_page_cache_key(request)
+        if key is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        # Та же логика, что в get_or_rebuild, но страница рендерится уже после выхода из dispatch()
+        version = self.get_current_version(request)
+        envelope = cache.get(key)
+        if not is_fresh(envelope, version):
+            if not acquire_rebuild_lock(key):
+                if envelope is None:
+                    envelope = wait_for_rebuild(key, version)
+                if envelope is None:
+                    # Страница вычисляется без кэша (возможно, с реплики) - ETag для нее не выдаю: данные
+                    # отстающей реплики не должны закрепиться у браузера под текущей версией
+                    self.rendered_version = None
+                    return super().dispatch(request, *args, **kwargs)
+            else:
+                return self.rebuild_page(key, version, request, *args, **kwargs)
+
+        content, content_type = envelope["value"]
+        self.rendered_version = envelope["version"]  # Может быть прежней, пока страницу пересчитывает другой запрос
+        return self.add_conditional_headers(request, HttpResponse(content, content_type=content_type))
+
+    def rebuild_page(self, key, version, request, *args, **kwargs):
+        """Рендерит страницу и кладет ее в кэш (вызывается с блокировкой пересчета, снимает ее). Страница для кэша
+        читается из основной базы (read_from_primary, ReadReplicaMixin): данные отстающей реплики иначе были бы
+        сохранены под только что увеличенным поколением и отдавались бы до следующего изменения."""
+        self.read_from_primary = True
+        started = time.monotonic()
+        try:
+            response = super().dispatch(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                # Шаблон рендерится здесь, а не после выхода из контроллера: если рендер упадет, блокировка все
+                # равно снимется, и следующие запросы не будут ждать ее истечения (REBUILD_LOCK_TIMEOUT)
+                if hasattr(response, "render") and callable(response.render):
+                    response.render()
+                value = (response.content, response["Content-Type"])
+                store_envelope(key, value, version, self.cache_timeout, time.monotonic() - started)
+        finally:
+            release_rebuild_lock(key)
+        return response
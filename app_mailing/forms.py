@@ -1,6 +1,6 @@
 from django import forms
 
-from app_mailing.models import Mailing, Message, Recipient
+from app_mailing.models import Mailing, Message, Recipient, Segment
 
 
 class AddNewRecipientForm(forms.ModelForm):
@@ -21,8 +21,9 @@ class AddNewRecipientForm(forms.ModelForm):
         пользователя (owner). Если да - не позволяет повторно добавить этого получателя.
         Это предотвращает дублирование одного и того же email в списке клиента приложения, но разрешает другим
         пользователям добавлять такого же получателя себе."""
-        # Беру значение, которое пользователь ввёл в поле "Email" (после коробочной проверки, что email валидный).
-        email = self.cleaned_data["email"]
+        # Беру значение, которое пользователь ввёл в поле "Email" (после коробочной проверки, что email валидный),
+        # и нормализую его (нижний регистр) - так email хранится в БД, и Foo@x.ru считается дубликатом foo@x.ru.
+        email = Recipient.normalize_email(self.cleaned_data["email"])
 
         # Получаю владельца (того, кто создаёт или редактирует получателя):
         # 1) self.instance.owner - работает, если мы редактируем существующего получателя.
@@ -56,6 +57,26 @@ class AddNewRecipientForm(forms.ModelForm):
                 field.widget.attrs["class"] = "form-check-input"
 
 
+class ImportRecipientsForm(forms.Form):
+    """Форма для массового импорта Получателей рассылки из файла на странице recipient_import.html"""
+
+    file = forms.FileField(
+        label="Файл с получателями:",
+        help_text="CSV с заголовком (email, full_name, comment) или NDJSON - один JSON-объект на строку",
+    )
+    file_format = forms.ChoiceField(
+        label="Формат файла:",
+        choices=[("csv", "CSV"), ("ndjson", "NDJSON")],
+        initial="csv",
+    )
+
+    def __init__(self, *args, **kwargs):
+        """Стилизация полей формы (как в остальных формах приложения)."""
+        super().__init__(*args, **kwargs)
+        self.fields["file"].widget.attrs["class"] = "form-control text-muted-secondary"
+        self.fields["file_format"].widget.attrs["class"] = "form-select text-muted-secondary"
+
+
 class AddNewMessageForm(forms.ModelForm):
     """Форма для добавления пользователем нового Сообщения рассылки на странице message_add_update.html"""
 
@@ -87,12 +108,18 @@ class AddNewMailingForm(forms.ModelForm):
 
     class Meta:
         model = Mailing
-        fields = ["message", "recipients"]
+        fields = ["message", "segment", "snapshot_recipients", "recipients"]
         exclude = ["owner"]
         widgets = {
             "message": forms.Select(
                 attrs={"class": "form-select text-muted-secondary"}
             ),
+            "segment": forms.Select(
+                attrs={"class": "form-select text-muted-secondary"}
+            ),
+            "snapshot_recipients": forms.CheckboxInput(
+                attrs={"class": "form-check-input"}
+            ),
             "recipients": forms.SelectMultiple(
                 attrs={"class": "duallistbox form-control", "multiple": "multiple", }
             ),
@@ -115,6 +142,7 @@ class AddNewMailingForm(forms.ModelForm):
         if user:
             self.fields["message"].queryset = Message.objects.filter(owner=user)
             self.fields["recipients"].queryset = Recipient.objects.filter(owner=user)
+            self.fields["segment"].queryset = Segment.objects.filter(owner=user)
 
         # ШАГ 2: Выполняю стилизацию формы
         def get_message_subject(obj):
@@ -124,3 +152,31 @@ class AddNewMailingForm(forms.ModelForm):
 
         for field_name, field in self.fields.items():
             field.help_text = None
+
+    def clean(self):
+        """Проверка, что у рассылки есть аудитория: сегмент и/или явно выбранные получатели."""
+        cleaned_data = super().clean()
+        if not cleaned_data.get("segment") and not cleaned_data.get("recipients"):
+            raise forms.ValidationError("Выберите сегмент или хотя бы одного получателя рассылки.")
+        return cleaned_data
+
+
+class SegmentForm(forms.ModelForm):
+    """Форма для добавления/редактирования пользователем Сегмента получателей на странице segment_add_update.html"""
+
+    class Meta:
+        model = Segment
+        fields = ["name", "kind", "value"]
+        widgets = {
+            "name": forms.TextInput(attrs={"placeholder": "Введите название сегмента"}),
+            "kind": forms.Select(attrs={"class": "form-select text-muted-secondary"}),
+            "value": forms.TextInput(attrs={"placeholder": "Домен (gmail.com) или тег (vip) - не нужен для всех"}),
+        }
+
+    def __init__(self, *args, **kwargs):
+        """Стилизация полей формы (как в остальных формах приложения)."""
+        super().__init__(*args, **kwargs)
+        for field_name, field in self.fields.items():
+            field.help_text = None
+            if not isinstance(field.widget, forms.Select):
+                field.widget.attrs["class"] = "form-control text-muted-secondary"
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from app_mailing.partitions import (archive_attempt_partition,
+                                    get_partitions_to_archive, is_supported)
+
+
+class Command(BaseCommand):
+    """Команда для архивирования старых *Попыток рассылок*: месячные партиции tb_attempt старше заданного
+    количества месяцев отсоединяются от таблицы, выгружаются в сжатые CSV-файлы (<партиция>.csv.gz) на локальный
+    диск и удаляются из БД. Так размер таблицы, индексов и работа vacuum остаются ограниченными.
+    Счетчики рассылок и OwnerDailyStats хранятся отдельно и после архивации не меняются. Архивы записываются в
+    AttemptArchive: команды recount_mailings и backfill_daily_stats не пересчитывают рассылки с архивированными
+    попытками и дневную статистику до границы архива (этих попыток в БД уже нет)."""
+
+    help = "Архивирование старых месячных партиций tb_attempt в сжатые CSV-файлы"
+
+    def add_arguments(self, parser):
+        """Добавляем аргументы: сколько месяцев хранить в БД, куда писать архивы, режим просмотра."""
+        parser.add_argument(
+            "--keep-months", type=int, default=12, help="Сколько последних месяцев (включая текущий) хранить в БД"
+        )
+        parser.add_argument(
+            "--output-dir", default=settings.ATTEMPT_ARCHIVE_DIR, help="Каталог для архивов партиций"
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true", help="Только показать партиции, которые будут архивированы"
+        )
+
+    def handle(self, *args, **kwargs):
+        """Основная логика команды: находит старые партиции и архивирует их по одной."""
+        if not is_supported():
+            self.stdout.write(self.style.WARNING("Секционирование поддерживается только в PostgreSQL."))
+            return
+        if kwargs["keep_months"] < 1:
+            raise CommandError("--keep-months должен быть не меньше 1.")
+
+        partitions = get_partitions_to_archive(kwargs["keep_months"])
+        if not partitions:
+            self.stdout.write(self.style.SUCCESS("Нет партиций для архивирования."))
+            return
+
+        for month, name in partitions:
+            if kwargs["dry_run"]:
+                self.stdout.write(f"Будет архивирована партиция {name} ({month:%m.%Y})")
+                continue
+            path = archive_attempt_partition(name, kwargs["output_dir"])
+            self.stdout.write(self.style.SUCCESS(f"Партиция {name} архивирована в {path}"))
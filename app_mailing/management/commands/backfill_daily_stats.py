@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from app_mailing.partitions import get_archive_cutoff
+from app_mailing.services import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    """Команда для построения *Дневной статистики* пользователей (OwnerDailyStats) по уже существующей истории
+    рассылок и попыток рассылок. Существующие строки статистики заменяются пересчитанными - кроме дней до границы
+    архива попыток (команда archive_attempts) включительно: их попыток в БД уже нет."""
+
+    help = "Построение дневной статистики пользователей по существующей истории рассылок"
+
+    def add_arguments(self, parser):
+        """Добавляем необязательный аргумент: ID пользователей (по умолчанию статистика строится для всех)."""
+        parser.add_argument("owner_ids", nargs="*", type=int, help="ID пользователей для пересчета")
+
+    def handle(self, *args, **kwargs):
+        """Основная логика команды: пересобирает статистику и выводит количество созданных строк."""
+        created = rebuild_daily_stats(kwargs["owner_ids"] or None)
+        cutoff = get_archive_cutoff()
+
+        self.stdout.write(self.style.SUCCESS(f"Создано строк дневной статистики: {created}"))
+        if cutoff:
+            kept_until = timezone.localdate(cutoff)
+            self.stdout.write(self.style.WARNING(
+                f"Статистика по {kept_until:%d.%m.%Y} включительно не пересчитывалась (попытки архивированы)"
+            ))
@@ -0,0 +1,71 @@
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.urls import reverse
+
+from app_mailing.views import MailingListView
+from users.authz import get_authz
+from users.models import AppUser
+
+
+class Command(BaseCommand):
+    """Команда для замера времени рендера страницы списка рассылок (mailing_list.html) пользователя:
+    - полный рендер - все строки таблицы рендерятся заново (кэш строк выключен);
+    - повторный рендер - строки берутся из кэша, заново рендерятся только измененные рассылки (--changed).
+    Запросы к БД в замер не входят: страница (queryset и контекст) собирается один раз до замеров."""
+
+    help = "Замер рендера списка рассылок: полный и повторный (с кэшем строк таблицы)"
+
+    def add_arguments(self, parser):
+        """Аргументы: email пользователя, размер страницы, количество измененных строк и повторов замера."""
+        parser.add_argument("email", help="Email пользователя, чьи рассылки выводятся")
+        parser.add_argument("--page-size", type=int, default=200, help="Размер страницы (по умолчанию 200)")
+        parser.add_argument("--changed", type=int, default=1, help="Сколько строк изменено перед повторным рендером")
+        parser.add_argument("--repeat", type=int, default=5, help="Количество повторов каждого замера")
+
+    def handle(self, *args, **kwargs):
+        """Основная логика команды: собирает контекст страницы как MailingListView и замеряет рендер шаблона."""
+        user = AppUser.objects.filter(email=kwargs["email"]).first()
+        if user is None:
+            raise CommandError(f"Пользователь {kwargs['email']} не найден")
+
+        request = RequestFactory().get(reverse("app_mailing:mailing_list_page"), {"page_size": kwargs["page_size"]})
+        request.user = user
+        request.authz = get_authz(user)
+        request.COOKIES[settings.CSRF_COOKIE_NAME] = uuid.uuid4().hex  # Отдельный ключ кэша строк для замера
+
+        view = MailingListView()
+        view.setup(request)
+        view.object_list = view.get_queryset()
+        context = view.get_context_data()
+        mailings = list(context["mailings"])
+        if not mailings:
+            raise CommandError("У пользователя нет рассылок")
+
+        def render(timeout):
+            context["row_cache_timeout"] = timeout
+            started = time.perf_counter()
+            render_to_string(view.template_name, context, request=request)
+            return (time.perf_counter() - started) * 1000
+
+        full = min(render(0) for _ in range(kwargs["repeat"]))
+
+        render(view.row_cache_timeout)  # Прогрев кэша строк
+        incremental = []
+        for _ in range(kwargs["repeat"]):
+            for mailing in mailings[:kwargs["changed"]]:  # "Изменяю" рассылки - новый ключ кэша их строк
+                mailing.updated_at += timedelta(microseconds=1)
+            incremental.append(render(view.row_cache_timeout))
+        incremental = min(incremental)
+
+        self.stdout.write(f"Строк на странице: {len(mailings)}, изменено перед повторным рендером: "
+                          f"{min(kwargs['changed'], len(mailings))}")
+        self.stdout.write(f"Полный рендер: {full:.1f} мс")
+        self.stdout.write(self.style.SUCCESS(
+            f"Повторный рендер (кэш строк): {incremental:.1f} мс, быстрее в {full / incremental:.1f} раз"
+        ))
@@ -0,0 +1,44 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from config.cache_backends import get_cache_metrics, reset_cache_metrics
+
+
+class Command(BaseCommand):
+    """Команда для вывода метрик кэша (по всем процессам) по префиксам ключей: попадания, промахи, доля попаданий,
+    записи, удаления, объем прочитанных/записанных данных и время операций (среднее и 95-й перцентиль)."""
+
+    help = "Метрики кэша по префиксам ключей"
+
+    def add_arguments(self, parser):
+        """Аргументы: вывод в JSON и обнуление метрик (например, перед замером эффекта изменений)."""
+        parser.add_argument("--json", action="store_true", help="Вывести метрики в JSON (с гистограммой времени)")
+        parser.add_argument("--reset", action="store_true", help="Обнулить метрики после вывода")
+
+    def handle(self, *args, **kwargs):
+        """Основная логика команды: выводит таблицу метрик по каждому кэшу со сбором метрик."""
+        metrics = get_cache_metrics()
+        if kwargs["json"]:
+            self.stdout.write(json.dumps(metrics, ensure_ascii=False, indent=2))
+        else:
+            for alias, prefixes in metrics.items():
+                self.stdout.write(self.style.MIGRATE_HEADING(f"Кэш '{alias}':"))
+                if not prefixes:
+                    self.stdout.write("  Метрик пока нет")
+                    continue
+                self.stdout.write(
+                    f"  {'Префикс':<40} {'Попад.':>8} {'Промахи':>8} {'Доля':>6} {'Записи':>8} {'Удал.':>7} "
+                    f"{'Чтение, Б':>11} {'Запись, Б':>11} {'Сред., мс':>9} {'p95, мс':>8}"
+                )
+                for prefix, stats in prefixes.items():
+                    hit_ratio = "-" if stats["hit_ratio"] is None else f"{stats['hit_ratio']:.0%}"
+                    self.stdout.write(
+                        f"  {prefix:<40} {stats['hits']:>8} {stats['misses']:>8} {hit_ratio:>6} {stats['sets']:>8} "
+                        f"{stats['deletes']:>7} {stats['bytes_read']:>11} {stats['bytes_written']:>11} "
+                        f"{stats['avg_ms'] or 0:>9.2f} {stats['p95_ms'] or '-':>8}"
+                    )
+
+        if kwargs["reset"]:
+            reset_cache_metrics()
+            self.stdout.write(self.style.SUCCESS("Метрики кэша обнулены"))
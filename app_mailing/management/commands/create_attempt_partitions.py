@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from app_mailing.partitions import ensure_attempt_partitions, is_supported
+
+
+class Command(BaseCommand):
+    """Команда для создания месячных партиций таблицы *Попыток рассылок* (tb_attempt) на текущий и следующие
+    месяцы. Планировщик делает это сам раз в сутки, команда нужна для ручного запуска/деплоя."""
+
+    help = "Создание месячных партиций tb_attempt на текущий и следующие месяцы"
+
+    def add_arguments(self, parser):
+        """Добавляем необязательный аргумент: на сколько месяцев вперед создавать партиции."""
+        parser.add_argument("--months-ahead", type=int, default=3, help="На сколько месяцев вперед")
+
+    def handle(self, *args, **kwargs):
+        """Основная логика команды: создает недостающие партиции и выводит их имена."""
+        if not is_supported():
+            self.stdout.write(self.style.WARNING("Секционирование поддерживается только в PostgreSQL."))
+            return
+
+        created = ensure_attempt_partitions(kwargs["months_ahead"])
+
+        if created:
+            self.stdout.write(self.style.SUCCESS(f"Созданы партиции: {', '.join(created)}"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Все партиции уже существуют."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from app_mailing.services import merge_duplicate_recipients
+
+
+class Command(BaseCommand):
+    """Команда для слияния дубликатов *Получателей рассылки* (email отличается только регистром или пробелами):
+    попытки рассылок и участие в рассылках переносятся на самого раннего получателя, дубликаты удаляются."""
+
+    help = "Слияние дубликатов получателей рассылки (регистронезависимо по email)"
+
+    def add_arguments(self, parser):
+        """Добавляем необязательный аргумент: ID пользователей (по умолчанию - все пользователи)."""
+        parser.add_argument("owner_ids", nargs="*", type=int, help="ID пользователей")
+
+    def handle(self, *args, **kwargs):
+        """Основная логика команды: выполняет слияние и выводит результат."""
+        merged, normalized = merge_duplicate_recipients(kwargs["owner_ids"] or None)
+        self.stdout.write(self.style.SUCCESS(
+            f"Удалено дубликатов: {merged}, приведено к нижнему регистру email: {normalized}"
+        ))
@@ -0,0 +1,51 @@
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from app_mailing.services import (IMPORT_CHUNK_SIZE, IMPORT_FORMATS,
+                                  import_recipients)
+
+
+class Command(BaseCommand):
+    """Команда для массового импорта *Получателей рассылки* пользователя из CSV- или NDJSON-файла."""
+
+    help = "Импорт получателей рассылки из CSV/NDJSON-файла"
+
+    def add_arguments(self, parser):
+        """Добавляем аргументы: путь к файлу, email владельца получателей, формат файла и размер пачки."""
+        parser.add_argument("path", type=str, help="Путь к файлу с получателями")
+        parser.add_argument("--owner", type=str, required=True, help="Email пользователя-владельца получателей")
+        parser.add_argument(
+            "--format",
+            choices=IMPORT_FORMATS,
+            help="Формат файла (по умолчанию определяется по расширению: .csv или .ndjson/.jsonl)",
+        )
+        parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE, help="Размер пачки строк")
+
+    def handle(self, *args, **kwargs):
+        """Основная логика команды: потоковый импорт файла и вывод отчета."""
+        try:
+            owner = get_user_model().objects.get(email=kwargs["owner"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"Пользователь {kwargs['owner']} не найден")
+
+        fmt = kwargs["format"]
+        if fmt is None:
+            extension = os.path.splitext(kwargs["path"])[1].lower()
+            fmt = "csv" if extension == ".csv" else "ndjson" if extension in (".ndjson", ".jsonl") else None
+        if fmt is None:
+            raise CommandError("Не удалось определить формат файла - укажите --format")
+
+        try:
+            with open(kwargs["path"], "rb") as stream:
+                report = import_recipients(owner, stream, fmt=fmt, chunk_size=kwargs["chunk_size"])
+        except OSError as e:
+            raise CommandError(f"Не удалось прочитать файл: {e}")
+
+        for error in report["errors"]:
+            self.stdout.write(self.style.WARNING(error))
+        self.stdout.write(self.style.SUCCESS(
+            f"Импорт завершен: добавлено {report['inserted']}, обновлено {report['updated']}, "
+            f"отклонено {report['rejected']}"
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from app_mailing.suppression import build_suppression_filter
+
+
+class Command(BaseCommand):
+    """Команда для построения заново фильтра Блума по *Списку исключений* и сохранения его в кэш (например, после
+    массовой загрузки исключений напрямую в БД, минуя сигналы)."""
+
+    help = "Построение фильтра Блума по списку исключений"
+
+    def handle(self, *args, **kwargs):
+        """Основная логика команды: строит фильтр и выводит его параметры."""
+        bloom = build_suppression_filter()
+        self.stdout.write(self.style.SUCCESS(
+            f"Фильтр построен: емкость {bloom.capacity}, размер {bloom.size} бит, "
+            f"хеш-функций {bloom.hash_count}, последний ID исключения {bloom.max_id}"
+        ))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from app_mailing.models import Mailing
+from app_mailing.partitions import get_archived_mailing_ids
+from app_mailing.services import recount_mailing_counters
+
+
+class Command(BaseCommand):
+    """Команда для пересчета денормализованных счетчиков *Рассылок* (recipient_count, success_count, failed_count,
+    pending_count) из исходных таблиц: связей рассылок с получателями и *Попыток рассылок*. Рассылки с
+    архивированными попытками (команда archive_attempts) не пересчитываются."""
+
+    help = "Пересчет счетчиков рассылок из исходных таблиц"
+
+    def add_arguments(self, parser):
+        """Добавляем необязательный аргумент: ID рассылок (по умолчанию пересчитываются все рассылки)."""
+        parser.add_argument("mailing_ids", nargs="*", type=int, help="ID рассылок для пересчета")
+
+    def handle(self, *args, **kwargs):
+        """Основная логика команды: пересчитывает счетчики одним UPDATE и выводит количество рассылок."""
+        mailings = Mailing.objects.all()
+        if kwargs["mailing_ids"]:
+            mailings = mailings.filter(pk__in=kwargs["mailing_ids"])
+
+        updated = recount_mailing_counters(mailings)
+        skipped = mailings.filter(pk__in=get_archived_mailing_ids()).count()
+
+        self.stdout.write(self.style.SUCCESS(f"Счетчики пересчитаны для рассылок: {updated}"))
+        if skipped:
+            self.stdout.write(self.style.WARNING(f"Пропущено рассылок с архивированными попытками: {skipped}"))
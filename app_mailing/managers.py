@@ -0,0 +1,75 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+from django.db import models, transaction
+
+# Изменчивые части ответа почтового сервера: адреса, ID писем в очереди, даты, время, IP-адреса и длинные числа.
+# Коды ответа SMTP (550) и расширенные коды (5.1.1) сохраняются - по ним ответы и различаются
+RESPONSE_VARIABLE_PARTS = [
+    (re.compile(r"<?[\w.+-]+@[\w-]+(?:\.[\w-]+)+>?"), "<email>"),
+    (re.compile(r"\b(?=[0-9A-Za-z]*[0-9])(?=[0-9A-Za-z]*[A-Za-z])[0-9A-Za-z]{8,}\b"), "<id>"),
+    (re.compile(r"\b\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2})?)?"), "<date>"),
+    (re.compile(r"\b\d{1,2}:\d{2}(?::\d{2})?\b"), "<time>"),
+    (re.compile(r"\b\d{1,3}(?:\.\d{1,3}){3}\b"), "<ip>"),
+    (re.compile(r"\b\d{4,}\b"), "<n>"),
+]
+
+
+def normalize_response_text(text):
+    """Приводит ответ почтового сервера к общему виду: изменчивые части (RESPONSE_VARIABLE_PARTS) заменяются
+    метками, пробелы схлопываются. Ошибки, отличающиеся только адресом или ID письма, - один ответ в справочнике."""
+    for pattern, placeholder in RESPONSE_VARIABLE_PARTS:
+        text = pattern.sub(placeholder, text)
+    return " ".join(text.split())
+
+
+class ServerResponseManager(models.Manager):
+    """Кастомный менеджер справочника ответов почтового сервера (модель *ServerResponse*).
+    Ответы хранятся в нормализованном виде (normalize_response_text), иначе адреса и ID писем в тексте ошибок
+    делали бы почти каждый ответ новым, и справочник рос бы вместе с tb_attempt.
+    Хранит in-process LRU-кэш "текст ответа → ID", чтобы запись *Попытки рассылки* с уже известным ответом
+    ("OK" или повторяющаяся ошибка SMTP) не требовала дополнительного запроса к БД."""
+
+    cache_size = 1024  # Сколько последних различных ответов держать в памяти процесса
+
+    def __init__(self):
+        super().__init__()
+        self._ids = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_digest(text):
+        """Возвращает SHA-256 текста ответа - по нему ответ ищется в справочнике (уникальный индекс)."""
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_id_for(self, text):
+        """Возвращает ID ответа сервера в справочнике, при необходимости создавая новую запись.
+        :param text: текст ответа почтового сервера (нормализуется перед поиском).
+        :return: ID записи справочника ServerResponse."""
+        text = normalize_response_text(text)
+        with self._lock:
+            response_id = self._ids.get(text)
+            if response_id is not None:
+                self._ids.move_to_end(text)
+                return response_id
+
+        response, _ = self.get_or_create(digest=self.make_digest(text), defaults={"text": text})
+        # В кэш попадают только закоммиченные записи: если внешняя транзакция откатится, в памяти не останется
+        # ID несуществующей строки (в режиме autocommit on_commit выполняется сразу).
+        transaction.on_commit(lambda: self._remember(text, response.pk))
+        return response.pk
+
+    def _remember(self, text, response_id):
+        """Кладет пару "текст → ID" в LRU-кэш, вытесняя самые давно использованные записи."""
+        with self._lock:
+            self._ids[text] = response_id
+            self._ids.move_to_end(text)
+            while len(self._ids) > self.cache_size:
+                self._ids.popitem(last=False)
+
+    def clear_cache(self):
+        """Очищает LRU-кэш ответов (например, после ручной чистки справочника)."""
+        with self._lock:
+            self._ids.clear()
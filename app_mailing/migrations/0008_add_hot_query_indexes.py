@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:00
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_mailing', '0007_alter_recipient_email_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attempt',
+            index=models.Index(fields=['owner', 'status'], name='attempt_owner_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attempt',
+            index=models.Index(fields=['mailing', 'recipient'], name='attempt_mailing_recipient_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mailing',
+            index=models.Index(condition=models.Q(('status', 'created')), fields=['first_message_sending'], name='mailing_created_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mailing',
+            index=models.Index(fields=['owner', 'status'], name='mailing_owner_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['owner', 'message_subject'], name='message_owner_subject_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipient',
+            index=models.Index(fields=['owner', 'full_name'], name='recipient_owner_name_idx'),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:01
+
+from django.db import migrations, models
+from django.db.models import Count, Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(queryset):
+    """Оборачивает queryset в подзапрос COUNT(*) для использования в UPDATE ... SET field = (SELECT COUNT(*) ...)."""
+    return Coalesce(
+        Subquery(queryset.order_by().values("mailing_id").annotate(n=Count("*")).values("n")),
+        0,
+    )
+
+
+def fill_mailing_counters(apps, schema_editor):
+    """Заполнение новых счетчиков для уже существующих рассылок одним UPDATE с подзапросами."""
+    Mailing = apps.get_model("app_mailing", "Mailing")
+    Attempt = apps.get_model("app_mailing", "Attempt")
+    MailingRecipient = Mailing.recipients.through
+    db_alias = schema_editor.connection.alias
+
+    attempts = Attempt.objects.filter(mailing_id=OuterRef("pk"))
+    links = MailingRecipient.objects.filter(mailing_id=OuterRef("pk"))
+    not_attempted_links = links.filter(
+        ~Exists(Attempt.objects.filter(mailing_id=OuterRef("mailing_id"), recipient_id=OuterRef("recipient_id")))
+    )
+    Mailing.objects.using(db_alias).update(
+        recipient_count=count_subquery(links),
+        success_count=count_subquery(attempts.filter(status="success")),
+        failed_count=count_subquery(attempts.filter(status="failed")),
+        pending_count=count_subquery(not_attempted_links),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app_mailing", "0008_add_hot_query_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mailing",
+            name="failed_count",
+            field=models.IntegerField(
+                default=0,
+                help_text="Количество неуспешных попыток рассылки",
+                verbose_name="Неуспешных попыток:",
+            ),
+        ),
+        migrations.AddField(
+            model_name="mailing",
+            name="pending_count",
+            field=models.IntegerField(
+                default=0,
+                help_text="Количество получателей, по которым еще не было попытки рассылки",
+                verbose_name="Ожидают отправки:",
+            ),
+        ),
+        migrations.AddField(
+            model_name="mailing",
+            name="recipient_count",
+            field=models.IntegerField(
+                default=0,
+                help_text="Количество получателей рассылки",
+                verbose_name="Количество получателей:",
+            ),
+        ),
+        migrations.AddField(
+            model_name="mailing",
+            name="success_count",
+            field=models.IntegerField(
+                default=0,
+                help_text="Количество успешных попыток рассылки",
+                verbose_name="Успешных попыток:",
+            ),
+        ),
+        migrations.RunPython(fill_mailing_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app_mailing", "0009_mailing_counters"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OwnerDailyStats",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "day",
+                    models.DateField(
+                        help_text="День, за который посчитана статистика",
+                        verbose_name="День:",
+                    ),
+                ),
+                (
+                    "successful_attempts",
+                    models.IntegerField(
+                        default=0,
+                        help_text="Количество успешных попыток рассылок за день",
+                        verbose_name="Успешных попыток:",
+                    ),
+                ),
+                (
+                    "failed_attempts",
+                    models.IntegerField(
+                        default=0,
+                        help_text="Количество неуспешных попыток рассылок за день",
+                        verbose_name="Неуспешных попыток:",
+                    ),
+                ),
+                (
+                    "launched_mailings",
+                    models.IntegerField(
+                        default=0,
+                        help_text="Количество рассылок, запущенных за день",
+                        verbose_name="Запущено рассылок:",
+                    ),
+                ),
+                (
+                    "accomplished_mailings",
+                    models.IntegerField(
+                        default=0,
+                        help_text="Количество рассылок, завершенных (или остановленных) за день",
+                        verbose_name="Завершено рассылок:",
+                    ),
+                ),
+                (
+                    "sent_mailings",
+                    models.IntegerField(
+                        default=0,
+                        help_text="Количество рассылок, по которым за день впервые были сделаны попытки отправки",
+                        verbose_name="Отправлено рассылок:",
+                    ),
+                ),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        help_text="Пользователь, к которому относится статистика",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_stats",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь:",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Дневная статистика",
+                "verbose_name_plural": "Дневная статистика",
+                "db_table": "tb_owner_daily_stats",
+                "ordering": ["-day"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("owner", "day"), name="unique_daily_stats_per_owner"
+                    )
+                ],
+            },
+        ),
+    ]
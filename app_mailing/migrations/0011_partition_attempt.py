@@ -0,0 +1,99 @@
+# Секционирование таблицы tb_attempt по месяцам (PostgreSQL declarative partitioning).
+#
+# Django не умеет описывать секционированные таблицы в моделях, поэтому состояние модели Attempt не меняется,
+# а таблица пересоздается SQL-ом:
+# 1) старая таблица переименовывается в tb_attempt_legacy;
+# 2) создается tb_attempt с теми же колонками, PARTITION BY RANGE (attempt_time);
+# 3) создаются месячные партиции на всю историю (+3 месяца вперед) и партиция по умолчанию;
+# 4) данные копируются, старая таблица удаляется;
+# 5) первичный ключ (id, attempt_time) - ключ секционирования обязан входить в PK; внешние ключи и индексы
+#    восстанавливаются с прежними именами (их определения берутся из старой таблицы).
+#
+# На других СУБД (SQLite) миграция ничего не делает.
+
+from datetime import date, datetime
+from datetime import timezone as dt_timezone
+
+from django.db import migrations
+
+MONTHS_AHEAD = 3
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_attempts(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        # Определения индексов (кроме PK) и внешних ключей старой таблицы - чтобы восстановить их с теми же именами
+        cursor.execute(
+            """
+            SELECT pg_get_indexdef(i.indexrelid)
+            FROM pg_index i
+            WHERE i.indrelid = 'tb_attempt'::regclass AND NOT i.indisprimary
+            """
+        )
+        index_defs = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            """
+            SELECT conname, pg_get_constraintdef(oid)
+            FROM pg_constraint
+            WHERE conrelid = 'tb_attempt'::regclass AND contype = 'f'
+            """
+        )
+        foreign_keys = cursor.fetchall()
+
+        cursor.execute("ALTER TABLE tb_attempt RENAME TO tb_attempt_legacy")
+        cursor.execute("CREATE TABLE tb_attempt (LIKE tb_attempt_legacy) PARTITION BY RANGE (attempt_time)")
+
+        # Identity-колонки в секционированных таблицах поддерживаются только с PostgreSQL 17, поэтому id
+        # заполняется из обычной последовательности, принадлежащей колонке (pg_get_serial_sequence её находит).
+        cursor.execute("CREATE SEQUENCE tb_attempt_partitioned_id_seq")
+        cursor.execute(
+            "ALTER TABLE tb_attempt ALTER COLUMN id SET DEFAULT nextval('tb_attempt_partitioned_id_seq')"
+        )
+        cursor.execute("ALTER SEQUENCE tb_attempt_partitioned_id_seq OWNED BY tb_attempt.id")
+        cursor.execute(
+            "SELECT setval('tb_attempt_partitioned_id_seq', COALESCE(MAX(id), 0) + 1, false) FROM tb_attempt_legacy"
+        )
+
+        # Месячные партиции: от самой старой попытки до текущего месяца + MONTHS_AHEAD
+        cursor.execute("SELECT MIN(attempt_time) FROM tb_attempt_legacy")
+        now = datetime.now(dt_timezone.utc)
+        oldest = (cursor.fetchone()[0] or now).astimezone(dt_timezone.utc)
+        month = date(oldest.year, oldest.month, 1)
+        last = add_months(date(now.year, now.month, 1), MONTHS_AHEAD)
+        while month <= last:
+            start = datetime.combine(month, datetime.min.time(), tzinfo=dt_timezone.utc)
+            end = datetime.combine(add_months(month, 1), datetime.min.time(), tzinfo=dt_timezone.utc)
+            cursor.execute(
+                f"CREATE TABLE tb_attempt_{month:%Y_%m} PARTITION OF tb_attempt FOR VALUES FROM (%s) TO (%s)",
+                [start.isoformat(), end.isoformat()],
+            )
+            month = add_months(month, 1)
+        cursor.execute("CREATE TABLE tb_attempt_default PARTITION OF tb_attempt DEFAULT")
+
+        cursor.execute("INSERT INTO tb_attempt SELECT * FROM tb_attempt_legacy")
+        cursor.execute("DROP TABLE tb_attempt_legacy")
+
+        cursor.execute("ALTER TABLE tb_attempt ADD CONSTRAINT tb_attempt_pkey PRIMARY KEY (id, attempt_time)")
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE tb_attempt ADD CONSTRAINT "{name}" {definition}')
+        for definition in index_defs:  # Определения были получены до переименования и ссылаются на tb_attempt
+            cursor.execute(definition)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app_mailing", "0010_owner_daily_stats"),
+    ]
+
+    operations = [
+        # Обратная миграция не нужна: для Django секционированная таблица неотличима от обычной.
+        migrations.RunPython(partition_attempts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,120 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:07
+#
+# Тексты ответов почтового сервера переносятся из tb_attempt.server_response в справочник tb_server_response.
+# Перенос идет пачками по диапазонам ID, каждая пачка - в своей транзакции (atomic = False), чтобы на большой
+# таблице попыток не держать одну длинную транзакцию и блокировки.
+
+import hashlib
+
+import django.db.models.deletion
+from django.db import migrations, models, transaction
+
+BATCH_SIZE = 10000
+
+
+def _id_batches(queryset):
+    """Диапазоны [start, start + BATCH_SIZE) по ID попыток."""
+    bounds = queryset.aggregate(low=models.Min("id"), high=models.Max("id"))
+    if bounds["low"] is None:
+        return
+    for start in range(bounds["low"], bounds["high"] + 1, BATCH_SIZE):
+        yield start, start + BATCH_SIZE
+
+
+def fill_attempt_responses(apps, schema_editor):
+    Attempt = apps.get_model("app_mailing", "Attempt")
+    ServerResponse = apps.get_model("app_mailing", "ServerResponse")
+    db_alias = schema_editor.connection.alias
+    attempts = Attempt.objects.using(db_alias).filter(server_response__isnull=False)
+    response_ids = {}  # текст ответа → ID в справочнике
+
+    for start, end in _id_batches(attempts):
+        with transaction.atomic(using=db_alias):
+            batch = attempts.filter(id__gte=start, id__lt=end)
+            texts = set(batch.values_list("server_response", flat=True).distinct())
+            for text in texts - response_ids.keys():
+                digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+                response, _ = ServerResponse.objects.using(db_alias).get_or_create(
+                    digest=digest, defaults={"text": text}
+                )
+                response_ids[text] = response.pk
+            for text in texts:
+                batch.filter(server_response=text).update(response_id=response_ids[text])
+
+
+def restore_server_responses(apps, schema_editor):
+    Attempt = apps.get_model("app_mailing", "Attempt")
+    ServerResponse = apps.get_model("app_mailing", "ServerResponse")
+    db_alias = schema_editor.connection.alias
+    attempts = Attempt.objects.using(db_alias).filter(response__isnull=False)
+
+    for start, end in _id_batches(attempts):
+        with transaction.atomic(using=db_alias):
+            batch = attempts.filter(id__gte=start, id__lt=end)
+            response_ids = batch.values_list("response_id", flat=True).distinct()
+            for response in ServerResponse.objects.using(db_alias).filter(pk__in=list(response_ids)):
+                batch.filter(response_id=response.pk).update(server_response=response.text)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ("app_mailing", "0011_partition_attempt"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ServerResponse",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "digest",
+                    models.CharField(
+                        help_text="SHA-256 текста ответа (для быстрого поиска)",
+                        max_length=64,
+                        unique=True,
+                        verbose_name="Хэш ответа:",
+                    ),
+                ),
+                (
+                    "text",
+                    models.TextField(
+                        help_text="Текст ответа почтового сервера",
+                        verbose_name="Текст ответа:",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Ответ почтового сервера",
+                "verbose_name_plural": "Ответы почтового сервера",
+                "db_table": "tb_server_response",
+            },
+        ),
+        migrations.AddField(
+            model_name="attempt",
+            name="response",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Укажите ответ почтового сервера",
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="attempts",
+                to="app_mailing.serverresponse",
+                verbose_name="Ответ почтового сервера:",
+            ),
+        ),
+        migrations.RunPython(fill_attempt_responses, restore_server_responses),
+        migrations.RemoveField(
+            model_name="attempt",
+            name="server_response",
+        ),
+    ]
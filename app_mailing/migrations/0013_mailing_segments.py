@@ -0,0 +1,100 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app_mailing", "0012_intern_server_response"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mailing",
+            name="snapshot_recipients",
+            field=models.BooleanField(
+                default=False,
+                help_text="Сохранить состав сегмента на момент запуска в списке получателей рассылки",
+                verbose_name="Зафиксировать получателей сегмента при запуске",
+            ),
+        ),
+        migrations.CreateModel(
+            name="Segment",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(
+                        help_text="Укажите название сегмента",
+                        max_length=200,
+                        verbose_name="Название сегмента:",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("all", "Все получатели"),
+                            ("domain", "Домен email"),
+                            ("comment_tag", "Тег в комментарии"),
+                        ],
+                        default="all",
+                        help_text="Укажите правило отбора получателей",
+                        max_length=20,
+                        verbose_name="Вид сегмента:",
+                    ),
+                ),
+                (
+                    "value",
+                    models.CharField(
+                        blank=True,
+                        default="",
+                        help_text="Домен email (например, gmail.com) или тег без # (например, vip)",
+                        max_length=200,
+                        verbose_name="Значение:",
+                    ),
+                ),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        help_text="Пользователь, создавший этот сегмент",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="segments",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Создатель сегмента:",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Сегмент получателей",
+                "verbose_name_plural": "Сегменты получателей",
+                "db_table": "tb_segment",
+                "ordering": ["name"],
+            },
+        ),
+        migrations.AddField(
+            model_name="mailing",
+            name="segment",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Укажите сегмент получателей (вычисляется в момент отправки)",
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="mailings",
+                to="app_mailing.segment",
+                verbose_name="Сегмент получателей:",
+            ),
+        ),
+    ]
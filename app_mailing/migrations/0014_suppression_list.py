@@ -0,0 +1,109 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app_mailing", "0013_mailing_segments"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mailing",
+            name="suppressed_count",
+            field=models.IntegerField(
+                default=0,
+                help_text="Количество получателей, пропущенных из-за списка исключений",
+                verbose_name="Пропущено (исключения):",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="attempt",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("success", "Успешно"),
+                    ("failed", "Не успешно"),
+                    ("suppressed", "Пропущено (в списке исключений)"),
+                ],
+                help_text="Укажите статус попытки рассылки",
+                max_length=15,
+                verbose_name="Статус попытки рассылки:",
+            ),
+        ),
+        migrations.CreateModel(
+            name="Suppression",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "email",
+                    models.EmailField(
+                        help_text="Адрес, на который нельзя отправлять рассылки",
+                        max_length=254,
+                        verbose_name="Почта:",
+                    ),
+                ),
+                (
+                    "reason",
+                    models.CharField(
+                        choices=[
+                            ("hard_bounce", "Жесткий отказ (адрес не существует)"),
+                            ("unsubscribe", "Отписка получателя"),
+                            ("manual", "Исключен вручную"),
+                        ],
+                        default="manual",
+                        help_text="Причина исключения адреса",
+                        max_length=20,
+                        verbose_name="Причина:",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Дата и время добавления:"
+                    ),
+                ),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Пользователь, для рассылок которого действует исключение (пусто - для всех пользователей)",
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="suppressions",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Владелец:",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Исключение из рассылок",
+                "verbose_name_plural": "Список исключений",
+                "db_table": "tb_suppression",
+                "ordering": ["-created_at"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("owner", "email"), name="unique_suppression_per_owner"
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(("owner__isnull", True)),
+                        fields=("email",),
+                        name="unique_global_suppression",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:17
+#
+# Email получателей становится регистронезависимым: перед добавлением ограничения "email только в нижнем регистре"
+# существующие дубликаты (Foo@x.ru и foo@x.ru у одного владельца) сливаются set-based SQL-запросами - так же, как в
+# сервисной функции merge_duplicate_recipients (команда dedupe_recipients).
+#
+# Слияние и добавление ограничения выполняются в разных транзакциях (atomic = False, RunPython(atomic=True)):
+# в PostgreSQL внешние ключи Django - DEFERRABLE INITIALLY DEFERRED, и после DELETE в tb_recipient в транзакции
+# остаются отложенные проверки, а ALTER TABLE этой же таблицы в такой транзакции падает с ошибкой
+# "cannot ALTER TABLE because it has pending trigger events".
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Exists, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(queryset):
+    return Coalesce(
+        Subquery(queryset.order_by().values("mailing_id").annotate(n=Count("*")).values("n")),
+        0,
+    )
+
+
+def merge_duplicate_recipients(apps, schema_editor):
+    Mailing = apps.get_model("app_mailing", "Mailing")
+    Attempt = apps.get_model("app_mailing", "Attempt")
+    MailingRecipient = Mailing.recipients.through
+    db_alias = schema_editor.connection.alias
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            """
+            CREATE TEMPORARY TABLE recipient_merge AS
+            SELECT id AS dup_id, keep_id
+            FROM (
+                SELECT id, MIN(id) OVER (PARTITION BY owner_id, LOWER(TRIM(email))) AS keep_id
+                FROM tb_recipient
+            ) grouped
+            WHERE id <> keep_id
+            """
+        )
+        cursor.execute(
+            "SELECT DISTINCT mailing_id FROM tb_mailing_recipients "
+            "WHERE recipient_id IN (SELECT dup_id FROM recipient_merge)"
+        )
+        mailing_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            """
+            UPDATE tb_attempt SET recipient_id = recipient_merge.keep_id
+            FROM recipient_merge WHERE tb_attempt.recipient_id = recipient_merge.dup_id
+            """
+        )
+        cursor.execute(
+            """
+            INSERT INTO tb_mailing_recipients (mailing_id, recipient_id)
+            SELECT DISTINCT link.mailing_id, recipient_merge.keep_id
+            FROM tb_mailing_recipients link JOIN recipient_merge ON link.recipient_id = recipient_merge.dup_id
+            WHERE true
+            ON CONFLICT (mailing_id, recipient_id) DO NOTHING
+            """
+        )
+        cursor.execute("DELETE FROM tb_mailing_recipients WHERE recipient_id IN (SELECT dup_id FROM recipient_merge)")
+        cursor.execute("DELETE FROM tb_recipient WHERE id IN (SELECT dup_id FROM recipient_merge)")
+        cursor.execute("UPDATE tb_recipient SET email = LOWER(TRIM(email)) WHERE email <> LOWER(TRIM(email))")
+        cursor.execute("DROP TABLE recipient_merge")
+
+    # Попытки рассылок не удалялись (только перенесены), поэтому меняются только счетчики получателей
+    links = MailingRecipient.objects.filter(mailing_id=OuterRef("pk"))
+    not_attempted_links = links.filter(
+        ~Exists(Attempt.objects.filter(mailing_id=OuterRef("mailing_id"), recipient_id=OuterRef("recipient_id")))
+    )
+    (Mailing.objects.using(db_alias)
+     .filter(pk__in=mailing_ids)
+     .exclude(Q(segment__isnull=False, snapshot_recipients=False, status="accomplished"))
+     .update(recipient_count=count_subquery(links), pending_count=count_subquery(not_attempted_links)))
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("app_mailing", "0014_suppression_list"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_recipients, migrations.RunPython.noop, atomic=True),
+        migrations.AddConstraint(
+            model_name="recipient",
+            constraint=models.CheckConstraint(
+                condition=models.Q(
+                    ("email", django.db.models.functions.text.Lower("email"))
+                ),
+                name="recipient_email_lowercase",
+            ),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:22
+
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app_mailing", "0015_recipient_email_lowercase"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="recipient",
+            name="recipient_owner_name_idx",
+        ),
+        migrations.AddIndex(
+            model_name="recipient",
+            index=models.Index(
+                models.F("owner"),
+                django.db.models.functions.comparison.Coalesce(
+                    "full_name", models.Value("")
+                ),
+                models.F("id"),
+                name="recipient_owner_name_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipient",
+            index=models.Index(
+                django.db.models.functions.comparison.Coalesce(
+                    "full_name", models.Value("")
+                ),
+                models.F("id"),
+                name="recipient_name_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:23
+
+import datetime
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app_mailing", "0016_recipient_keyset_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="mailing",
+            index=models.Index(
+                models.F("owner"),
+                models.Case(
+                    models.When(status="launched", then=models.Value(0)),
+                    models.When(status="created", then=models.Value(1)),
+                    models.When(status="accomplished", then=models.Value(2)),
+                    default=models.Value(3),
+                    output_field=models.IntegerField(),
+                ),
+                models.OrderBy(
+                    django.db.models.functions.comparison.Coalesce(
+                        "end_message_sending",
+                        models.Value(
+                            datetime.datetime(
+                                1970, 1, 1, 0, 0, tzinfo=datetime.timezone.utc
+                            )
+                        ),
+                    ),
+                    descending=True,
+                ),
+                models.F("id"),
+                name="mailing_owner_list_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="mailing",
+            index=models.Index(
+                models.Case(
+                    models.When(status="launched", then=models.Value(0)),
+                    models.When(status="created", then=models.Value(1)),
+                    models.When(status="accomplished", then=models.Value(2)),
+                    default=models.Value(3),
+                    output_field=models.IntegerField(),
+                ),
+                models.OrderBy(
+                    django.db.models.functions.comparison.Coalesce(
+                        "end_message_sending",
+                        models.Value(
+                            datetime.datetime(
+                                1970, 1, 1, 0, 0, tzinfo=datetime.timezone.utc
+                            )
+                        ),
+                    ),
+                    descending=True,
+                ),
+                models.F("id"),
+                name="mailing_list_idx",
+            ),
+        ),
+    ]
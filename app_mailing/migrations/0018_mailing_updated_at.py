@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app_mailing", "0017_mailing_list_ordering_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="mailing",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True,
+                help_text="Дата и время последнего изменения рассылки",
+                verbose_name="Изменена:",
+            ),
+        ),
+    ]
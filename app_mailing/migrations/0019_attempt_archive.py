@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app_mailing", "0018_mailing_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AttemptArchive",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "partition",
+                    models.CharField(
+                        help_text="Имя архивированной партиции tb_attempt",
+                        max_length=63,
+                        unique=True,
+                        verbose_name="Партиция:",
+                    ),
+                ),
+                (
+                    "archived_before",
+                    models.DateTimeField(
+                        help_text="Граница партиции: попытки раньше этого времени (в пределах партиции) удалены из БД",
+                        verbose_name="Попытки до:",
+                    ),
+                ),
+                (
+                    "path",
+                    models.CharField(
+                        help_text="Путь к сжатому CSV-файлу со строками партиции",
+                        max_length=500,
+                        verbose_name="Файл архива:",
+                    ),
+                ),
+                (
+                    "mailing_ids",
+                    models.JSONField(
+                        default=list,
+                        help_text="ID рассылок, попытки которых были в партиции",
+                        verbose_name="Рассылки:",
+                    ),
+                ),
+                (
+                    "archived_at",
+                    models.DateTimeField(
+                        auto_now_add=True,
+                        help_text="Дата и время архивирования партиции",
+                        verbose_name="Архивирована:",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Архив попыток рассылок",
+                "verbose_name_plural": "Архивы попыток рассылок",
+                "db_table": "tb_attempt_archive",
+                "ordering": ["-archived_before"],
+            },
+        ),
+    ]
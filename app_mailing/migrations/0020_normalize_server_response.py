@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:10
+#
+# Ответы почтового сервера в справочнике tb_server_response приводятся к нормализованному виду
+# (normalize_response_text): ответы, отличавшиеся только адресом, ID письма или временем, сливаются в одну запись,
+# попытки рассылок переводятся на нее, лишние записи удаляются.
+
+import hashlib
+
+from django.db import migrations
+
+from app_mailing.managers import normalize_response_text
+
+
+def normalize_server_responses(apps, schema_editor):
+    Attempt = apps.get_model("app_mailing", "Attempt")
+    ServerResponse = apps.get_model("app_mailing", "ServerResponse")
+    db_alias = schema_editor.connection.alias
+    responses = ServerResponse.objects.using(db_alias)
+    groups = {}  # нормализованный текст → [(ID записи справочника, исходный текст), ...]
+
+    for pk, text in responses.order_by("pk").values_list("pk", "text").iterator():
+        groups.setdefault(normalize_response_text(text), []).append((pk, text))
+
+    # Нормализация идемпотентна, поэтому новый хэш записи не совпадет с хэшем записи из другой группы
+    for text, ((response_id, original), *duplicates) in groups.items():
+        if duplicates:
+            duplicate_ids = [pk for pk, _ in duplicates]
+            Attempt.objects.using(db_alias).filter(response_id__in=duplicate_ids).update(response_id=response_id)
+            responses.filter(pk__in=duplicate_ids).delete()
+        if text != original:
+            digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+            responses.filter(pk=response_id).update(text=text, digest=digest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("app_mailing", "0019_attempt_archive"),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_server_responses, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+from django.http import Http404, HttpResponseForbidden, StreamingHttpResponse
+
+from config.routers import (is_sticky_to_primary, iterate_on_replica,
+                            use_replica)
+
+
+class ReadReplicaMixin:
+    """Миксин для контроллеров "только для чтения" (списки, главная страница, выгрузки): запросы к БД во время
+    обработки запроса идут на реплику (config/routers.py). Исключение - пользователь, который только что изменял
+    данные: он читает из основной базы, пока не истечет окно "прилипания" (ReplicaStickinessMiddleware).
+    read_from_primary = True - запрос читает из основной базы (так пересчитывается страница для кэша в
+    GenerationCacheMixin: данные отстающей реплики не должны попасть в кэш под новым поколением).
+    Указывается в списке базовых классов после LoginRequiredMixin."""
+
+    read_from_primary = False
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.read_from_primary or is_sticky_to_primary(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        with use_replica():
+            response = super().dispatch(request, *args, **kwargs)
+            # Шаблон TemplateResponse рендерится после выхода из контроллера - рендерю его здесь, на реплике
+            if hasattr(response, "render") and callable(response.render):
+                response.render()
+        # Тело потокового ответа (выгрузки) читается после выхода из контроллера - тоже с реплики
+        if isinstance(response, StreamingHttpResponse):
+            response.streaming_content = iterate_on_replica(response.streaming_content)
+        return response
+
+
+class OwnerRequiredMixin:
+    """Миксин для контроллеров редактирования и удаления объектов пользователя (UpdateView, DeleteView): объект
+    загружается один раз за запрос - сразу с условием "владелец - текущий пользователь" и с select_related("owner"),
+    и переиспользуется в get()/post()/form_valid() через get_object(). Чужой (или несуществующий) объект - один
+    запрос к БД и 403 с сообщением owner_forbidden_message.
+    Указывается в списке базовых классов после LoginRequiredMixin."""
+
+    owner_forbidden_message = "У вас нет прав на этот объект."
+
+    def get_queryset(self):
+        return super().get_queryset().select_related("owner").filter(owner=self.request.user)
+
+    def get_object(self, queryset=None):
+        """Объект, загруженный в dispatch(), без повторного запроса к БД."""
+        if queryset is None and getattr(self, "owned_object", None) is not None:
+            return self.owned_object
+        return super().get_object(queryset)
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            self.owned_object = self.get_object()
+        except Http404:
+            return HttpResponseForbidden(self.owner_forbidden_message)
+        return super().dispatch(request, *args, **kwargs)
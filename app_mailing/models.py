@@ -1,5 +1,12 @@
+import re
+from datetime import datetime, timezone
+
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import Coalesce, Lower
 
+from app_mailing.managers import ServerResponseManager, normalize_response_text
 from config import settings
 
 
@@ -43,6 +50,24 @@ class Recipient(models.Model):
         """Метод определяет строковое представление объекта. Полезно для отображения объектов в админке/консоли."""
         return f"{self.email} ({self.full_name})"
 
+    @staticmethod
+    def normalize_email(email):
+        """Нормализация email получателя: без пробелов по краям и в нижнем регистре. Все адреса хранятся в таком
+        виде, поэтому Foo@x.ru и foo@x.ru - один и тот же получатель."""
+        return email.strip().lower()
+
+    def clean(self):
+        """Email нормализуется уже при валидации (full_clean() - админка, ModelForm): проверка ограничения
+        recipient_email_lowercase выполняется до save(), и без этого адрес Foo@x.ru был бы отклонен."""
+        if self.email:
+            self.email = self.normalize_email(self.email)
+
+    def save(self, *args, **kwargs):
+        """Перед сохранением email нормализуется (см. normalize_email)."""
+        if self.email:
+            self.email = self.normalize_email(self.email)
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Получатель"
         verbose_name_plural = "Получатели"
@@ -50,9 +75,97 @@ class Recipient(models.Model):
         db_table = "tb_recipient"
         # Добавляю уникальный "together constraint" - теперь Django будет следить за тем,
         # чтобы у каждого пользователя email был уникальным, но другие пользователи могут добавить такой же email себе.
+        # Email хранится только в нижнем регистре (это проверяет сама БД), поэтому обычный уникальный индекс
+        # (owner, email) работает как регистронезависимый и используется для поиска по email без индекса-выражения.
         constraints = [
-            models.UniqueConstraint(fields=["owner", "email"], name="unique_recipient_per_owner")
+            models.UniqueConstraint(fields=["owner", "email"], name="unique_recipient_per_owner"),
+            models.CheckConstraint(condition=Q(email=Lower("email")), name="recipient_email_lowercase"),
         ]
+        # Индексы под постраничный вывод списка получателей (RecipientListView): ключ страницы - ФИО (NULL как
+        # пустая строка) + id. Первый - для списка пользователя (фильтр по owner), второй - для Менеджера сервиса.
+        indexes = [
+            models.Index(F("owner"), Coalesce("full_name", Value("")), F("id"), name="recipient_owner_name_idx"),
+            models.Index(Coalesce("full_name", Value("")), F("id"), name="recipient_name_idx"),
+        ]
+
+
+class Segment(models.Model):
+    """Модель *Segment* представляет "Сегмент получателей" - сохраненное правило отбора *Получателей* пользователя.
+    Рассылка, нацеленная на сегмент, не хранит получателей в связи "многие ко многим": состав сегмента вычисляется
+    запросом к tb_recipient в момент отправки рассылки.
+    Виды сегментов:
+        Все получатели - все получатели владельца сегмента.
+        Домен email - получатели с почтой в указанном домене (например, gmail.com).
+        Тег в комментарии - получатели, в комментарии которых есть тег вида #vip."""
+
+    SEGMENT_KIND = [
+        ("all", "Все получатели"),
+        ("domain", "Домен email"),
+        ("comment_tag", "Тег в комментарии"),
+    ]
+
+    name = models.CharField(
+        max_length=200,
+        verbose_name="Название сегмента:",
+        help_text="Укажите название сегмента",
+    )
+    kind = models.CharField(
+        max_length=20,
+        choices=SEGMENT_KIND,
+        default="all",
+        verbose_name="Вид сегмента:",
+        help_text="Укажите правило отбора получателей",
+    )
+    value = models.CharField(
+        max_length=200,
+        blank=True,
+        default="",
+        verbose_name="Значение:",
+        help_text="Домен email (например, gmail.com) или тег без # (например, vip)",
+    )
+    owner = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="segments",
+        verbose_name="Создатель сегмента:",
+        help_text="Пользователь, создавший этот сегмент",
+    )
+
+    def __str__(self):
+        """Метод определяет строковое представление объекта. Полезно для отображения объектов в админке/консоли."""
+        return self.name
+
+    def clean(self):
+        """Проверка значения сегмента: для доменов и тегов значение обязательно и без лишних символов
+        (тег подставляется в регулярное выражение, поэтому разрешены только буквы, цифры, "_" и "-")."""
+        self.value = self.value.strip().lstrip("@#").lower()
+        if self.kind == "all":
+            self.value = ""
+        elif not self.value:
+            raise ValidationError({"value": "Для этого вида сегмента нужно указать значение."})
+        elif self.kind == "comment_tag" and not re.fullmatch(r"[\w-]+", self.value):
+            raise ValidationError({"value": 'Тег может содержать только буквы, цифры, "_" и "-".'})
+        elif self.kind == "domain" and not re.fullmatch(r"[\w.-]+\.[\w-]+", self.value):
+            raise ValidationError({"value": "Укажите домен, например: gmail.com"})
+
+    def get_filter(self):
+        """Возвращает условие отбора получателей сегмента (Q-объект) - для использования в запросах к Recipient."""
+        condition = Q(owner_id=self.owner_id)
+        if self.kind == "domain":
+            condition &= Q(email__endswith=f"@{self.value}")  # email получателей хранится в нижнем регистре
+        elif self.kind == "comment_tag":
+            condition &= Q(comment__iregex=rf"(^|[^\w#-])#{self.value}([^\w-]|$)")
+        return condition
+
+    def get_recipients(self):
+        """Возвращает queryset получателей, входящих в сегмент на текущий момент."""
+        return Recipient.objects.filter(self.get_filter())
+
+    class Meta:
+        verbose_name = "Сегмент получателей"
+        verbose_name_plural = "Сегменты получателей"
+        ordering = ["name"]
+        db_table = "tb_segment"
 
 
 class Message(models.Model):
@@ -91,6 +204,23 @@ class Message(models.Model):
         verbose_name_plural = "Сообщения"
         ordering = ["message_subject"]
         db_table = "tb_message"
+        # Составной индекс под список сообщений: фильтр по owner + сортировка по теме письма (MessageListView).
+        indexes = [
+            models.Index(fields=["owner", "message_subject"], name="message_owner_subject_idx"),
+        ]
+
+
+# Порядок рассылок в списке (MailingListView): запущена → создана → завершена, внутри статуса - по дате окончания
+# отправки по убыванию (рассылки без даты окончания - в конце статуса). Выражения общие для запроса списка и
+# индексов по ним (индекс-выражение используется, только если выражение в запросе совпадает с ним).
+MAILING_STATUS_PRIORITY = Case(
+    When(status="launched", then=Value(0)),
+    When(status="created", then=Value(1)),
+    When(status="accomplished", then=Value(2)),
+    default=Value(3),
+    output_field=IntegerField(),
+)
+MAILING_END_SORT = Coalesce("end_message_sending", Value(datetime(1970, 1, 1, tzinfo=timezone.utc)))
 
 
 class Mailing(models.Model):
@@ -143,6 +273,23 @@ class Mailing(models.Model):
         verbose_name="Получатели для рассылки:",
         help_text="Укажите получателей для рассылки",
     )
+    # Рассылка может быть нацелена на сегмент: его получатели вычисляются только в момент отправки (вместе с явно
+    # выбранными получателями из recipients). При snapshot_recipients=True вычисленный состав сегмента
+    # сохраняется в recipients при запуске - для последующего аудита "кому именно ушла рассылка".
+    segment = models.ForeignKey(
+        to=Segment,
+        on_delete=models.PROTECT,  # Нельзя удалить сегмент, на который нацелены рассылки
+        null=True,
+        blank=True,
+        related_name="mailings",
+        verbose_name="Сегмент получателей:",
+        help_text="Укажите сегмент получателей (вычисляется в момент отправки)",
+    )
+    snapshot_recipients = models.BooleanField(
+        default=False,
+        verbose_name="Зафиксировать получателей сегмента при запуске",
+        help_text="Сохранить состав сегмента на момент запуска в списке получателей рассылки",
+    )
     owner = models.ForeignKey(
         null=True,
         blank=True,
@@ -153,6 +300,42 @@ class Mailing(models.Model):
         verbose_name="Создатель рассылки:",
         help_text="Пользователь, запустивший эту рассылку"
     )
+    # Денормализованные счетчики рассылки. Обновляются атомарно (F()-выражениями) из сервисных функций отправки
+    # и остановки рассылки, а также сигналами при изменении списка получателей (app_mailing/signals.py).
+    # Пересчитать их заново из исходных таблиц можно командой "python manage.py recount_mailings".
+    recipient_count = models.IntegerField(
+        default=0,
+        verbose_name="Количество получателей:",
+        help_text="Количество получателей рассылки",
+    )
+    success_count = models.IntegerField(
+        default=0,
+        verbose_name="Успешных попыток:",
+        help_text="Количество успешных попыток рассылки",
+    )
+    failed_count = models.IntegerField(
+        default=0,
+        verbose_name="Неуспешных попыток:",
+        help_text="Количество неуспешных попыток рассылки",
+    )
+    suppressed_count = models.IntegerField(
+        default=0,
+        verbose_name="Пропущено (исключения):",
+        help_text="Количество получателей, пропущенных из-за списка исключений",
+    )
+    pending_count = models.IntegerField(
+        default=0,
+        verbose_name="Ожидают отправки:",
+        help_text="Количество получателей, по которым еще не было попытки рассылки",
+    )
+
+    # Время последнего изменения рассылки - входит в ключ кэша строки таблицы в списке рассылок. Изменения через
+    # update() (счетчики) и save(update_fields=...) должны обновлять его явно (auto_now там не срабатывает).
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name="Изменена:",
+        help_text="Дата и время последнего изменения рассылки",
+    )
 
     def __str__(self):
         """Метод определяет строковое представление объекта. Полезно для отображения объектов в админке/консоли."""
@@ -163,15 +346,68 @@ class Mailing(models.Model):
         verbose_name_plural = "Рассылки"
         ordering = ["message"]
         db_table = "tb_mailing"
+        indexes = [
+            # Частичный индекс только по "созданным" рассылкам: планировщик каждую минуту ищет
+            # status='created' AND first_message_sending <= now(), а таких строк в таблице всегда немного.
+            models.Index(
+                fields=["first_message_sending"],
+                condition=Q(status="created"),
+                name="mailing_created_due_idx",
+            ),
+            # Подсчеты на главной странице и остановка рассылок при блокировке пользователя (owner + status).
+            models.Index(fields=["owner", "status"], name="mailing_owner_status_idx"),
+            # Постраничный вывод списка рассылок в порядке MAILING_STATUS_PRIORITY, MAILING_END_SORT по убыванию:
+            # для списка пользователя (фильтр по owner) и для Менеджера сервиса.
+            models.Index(
+                F("owner"), MAILING_STATUS_PRIORITY, MAILING_END_SORT.desc(), F("id"), name="mailing_owner_list_idx"
+            ),
+            models.Index(MAILING_STATUS_PRIORITY, MAILING_END_SORT.desc(), F("id"), name="mailing_list_idx"),
+        ]
+
+
+class ServerResponse(models.Model):
+    """Модель *ServerResponse* представляет "Ответ почтового сервера" - справочник различных текстов ответов.
+    Большинство попыток рассылки получают один из нескольких десятков одинаковых ответов ("OK" или типовые ошибки
+    SMTP), поэтому текст хранится один раз, а *Попытка рассылки* ссылается на него. Адреса, ID писем, даты и
+    длинные числа в тексте заменяются метками (app_mailing/managers.py, normalize_response_text)."""
+
+    digest = models.CharField(
+        max_length=64,
+        unique=True,
+        verbose_name="Хэш ответа:",
+        help_text="SHA-256 текста ответа (для быстрого поиска)",
+    )
+    text = models.TextField(
+        verbose_name="Текст ответа:",
+        help_text="Текст ответа почтового сервера",
+    )
+
+    objects = ServerResponseManager()  # Менеджер с LRU-кэшем "текст ответа → ID"
+
+    def __str__(self):
+        """Метод определяет строковое представление объекта. Полезно для отображения объектов в админке/консоли."""
+        return self.text
+
+    def save(self, *args, **kwargs):
+        """Текст нормализуется, а его хэш вычисляется автоматически (в т.ч. при создании ответа через админку)."""
+        self.text = normalize_response_text(self.text)
+        self.digest = ServerResponse.objects.make_digest(self.text)
+        super().save(*args, **kwargs)
+
+    class Meta:
+        verbose_name = "Ответ почтового сервера"
+        verbose_name_plural = "Ответы почтового сервера"
+        db_table = "tb_server_response"
 
 
 class Attempt(models.Model):
     """Модель *Attempt* представляет "Попытка рассылки" в сервисе управления рассылками.
-    Статусы попытки: успешно / не успешно."""
+    Статусы попытки: успешно / не успешно / пропущено (адрес в списке исключений)."""
 
     ATTEMPT_STATUS = [
         ("success", "Успешно"),
         ("failed", "Не успешно"),
+        ("suppressed", "Пропущено (в списке исключений)"),
     ]
 
     attempt_time = models.DateTimeField(
@@ -185,9 +421,14 @@ class Attempt(models.Model):
         verbose_name="Статус попытки рассылки:",
         help_text="Укажите статус попытки рассылки",
     )
-    server_response = models.TextField(
-        blank=True,
+    # Текст ответа хранится один раз в справочнике ServerResponse, а в попытке - только ссылка на него.
+    # Читать/записывать текст можно как раньше через свойство server_response (см. ниже).
+    response = models.ForeignKey(
+        to=ServerResponse,
+        on_delete=models.PROTECT,
         null=True,
+        blank=True,
+        related_name="attempts",
         verbose_name="Ответ почтового сервера:",
         help_text="Укажите ответ почтового сервера",
     )
@@ -216,6 +457,17 @@ class Attempt(models.Model):
         help_text="Пользователь, которому принадлежит эта попытка"
     )
 
+    @property
+    def server_response(self):
+        """Текст ответа почтового сервера (из справочника ServerResponse)."""
+        return self.response.text if self.response_id else None
+
+    @server_response.setter
+    def server_response(self, text):
+        """Запись текста ответа: текст заменяется ID записи справочника (через LRU-кэш менеджера, без лишнего
+        запроса к БД для уже встречавшихся ответов). Работает и в Attempt.objects.create(server_response=...)."""
+        self.response_id = ServerResponse.objects.get_id_for(text) if text is not None else None
+
     def __str__(self):
         """Метод определяет строковое представление объекта. Полезно для отображения объектов в админке/консоли."""
         return f"{self.attempt_time:%d.%m.%Y %H:%M} | {self.recipient.email} | {self.get_status_display()}"
@@ -224,4 +476,175 @@ class Attempt(models.Model):
         verbose_name = "Попытка рассылки"
         verbose_name_plural = "Попытки рассылок"
         ordering = ["-attempt_time"]
+        # В PostgreSQL таблица секционирована по месяцам attempt_time (миграция 0011_partition_attempt,
+        # управление партициями - app_mailing/partitions.py). Для ORM это обычная таблица.
         db_table = "tb_attempt"
+        indexes = [
+            # Подсчет успешных/неуспешных попыток пользователя на главной странице (MainPageView).
+            models.Index(fields=["owner", "status"], name="attempt_owner_status_idx"),
+            # stop_mailing() выбирает recipient_id по попыткам конкретной рассылки - индекс покрывает запрос целиком.
+            models.Index(fields=["mailing", "recipient"], name="attempt_mailing_recipient_idx"),
+        ]
+
+
+class AttemptArchive(models.Model):
+    """Модель *AttemptArchive* представляет "Архив попыток рассылок" - запись об архивированной месячной партиции
+    tb_attempt (команда archive_attempts, app_mailing/partitions.py). Строки партиции из БД удалены, поэтому
+    пересчеты из исходных таблиц (recount_mailings, backfill_daily_stats) не трогают счетчики рассылок с
+    архивированными попытками и дневную статистику за архивированные дни."""
+
+    partition = models.CharField(
+        max_length=63,
+        unique=True,
+        verbose_name="Партиция:",
+        help_text="Имя архивированной партиции tb_attempt",
+    )
+    archived_before = models.DateTimeField(
+        verbose_name="Попытки до:",
+        help_text="Граница партиции: попытки раньше этого времени (в пределах партиции) удалены из БД",
+    )
+    path = models.CharField(
+        max_length=500,
+        verbose_name="Файл архива:",
+        help_text="Путь к сжатому CSV-файлу со строками партиции",
+    )
+    mailing_ids = models.JSONField(
+        default=list,
+        verbose_name="Рассылки:",
+        help_text="ID рассылок, попытки которых были в партиции",
+    )
+    archived_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Архивирована:",
+        help_text="Дата и время архивирования партиции",
+    )
+
+    def __str__(self):
+        """Метод определяет строковое представление объекта. Полезно для отображения объектов в админке/консоли."""
+        return self.partition
+
+    class Meta:
+        verbose_name = "Архив попыток рассылок"
+        verbose_name_plural = "Архивы попыток рассылок"
+        ordering = ["-archived_before"]
+        db_table = "tb_attempt_archive"
+
+
+class OwnerDailyStats(models.Model):
+    """Модель *OwnerDailyStats* представляет "Дневную статистику пользователя" - заранее посчитанные агрегаты
+    по рассылкам и попыткам рассылок одного пользователя за один день.
+    Обновляется инкрементально сервисными функциями отправки/остановки рассылок (services.py), поэтому главная
+    страница читает O(дней) строк вместо подсчета по всей таблице tb_attempt.
+    Построить статистику по уже существующей истории: "python manage.py backfill_daily_stats"."""
+
+    owner = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="daily_stats",
+        verbose_name="Пользователь:",
+        help_text="Пользователь, к которому относится статистика",
+    )
+    day = models.DateField(
+        verbose_name="День:",
+        help_text="День, за который посчитана статистика",
+    )
+    successful_attempts = models.IntegerField(
+        default=0,
+        verbose_name="Успешных попыток:",
+        help_text="Количество успешных попыток рассылок за день",
+    )
+    failed_attempts = models.IntegerField(
+        default=0,
+        verbose_name="Неуспешных попыток:",
+        help_text="Количество неуспешных попыток рассылок за день",
+    )
+    launched_mailings = models.IntegerField(
+        default=0,
+        verbose_name="Запущено рассылок:",
+        help_text="Количество рассылок, запущенных за день",
+    )
+    accomplished_mailings = models.IntegerField(
+        default=0,
+        verbose_name="Завершено рассылок:",
+        help_text="Количество рассылок, завершенных (или остановленных) за день",
+    )
+    sent_mailings = models.IntegerField(
+        default=0,
+        verbose_name="Отправлено рассылок:",
+        help_text="Количество рассылок, по которым за день впервые были сделаны попытки отправки",
+    )
+
+    def __str__(self):
+        """Метод определяет строковое представление объекта. Полезно для отображения объектов в админке/консоли."""
+        return f"{self.owner} | {self.day:%d.%m.%Y}"
+
+    class Meta:
+        verbose_name = "Дневная статистика"
+        verbose_name_plural = "Дневная статистика"
+        ordering = ["-day"]
+        db_table = "tb_owner_daily_stats"
+        constraints = [
+            models.UniqueConstraint(fields=["owner", "day"], name="unique_daily_stats_per_owner")
+        ]
+
+
+class Suppression(models.Model):
+    """Модель *Suppression* представляет запись "Списка исключений" - адрес, на который нельзя отправлять рассылки
+    (жесткий отказ почтового сервера, отписка получателя или ручное исключение).
+    Запись без владельца (owner=None) действует глобально - для рассылок всех пользователей, запись с владельцем -
+    только для рассылок этого пользователя. Адрес хранится в нижнем регистре."""
+
+    SUPPRESSION_REASON = [
+        ("hard_bounce", "Жесткий отказ (адрес не существует)"),
+        ("unsubscribe", "Отписка получателя"),
+        ("manual", "Исключен вручную"),
+    ]
+
+    email = models.EmailField(
+        verbose_name="Почта:",
+        help_text="Адрес, на который нельзя отправлять рассылки",
+    )
+    owner = models.ForeignKey(
+        to=settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="suppressions",
+        verbose_name="Владелец:",
+        help_text="Пользователь, для рассылок которого действует исключение (пусто - для всех пользователей)",
+    )
+    reason = models.CharField(
+        max_length=20,
+        choices=SUPPRESSION_REASON,
+        default="manual",
+        verbose_name="Причина:",
+        help_text="Причина исключения адреса",
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Дата и время добавления:",
+    )
+
+    def __str__(self):
+        """Метод определяет строковое представление объекта. Полезно для отображения объектов в админке/консоли."""
+        return f"{self.email} ({self.get_reason_display()})"
+
+    def save(self, *args, **kwargs):
+        """Адрес нормализуется (нижний регистр, без пробелов) - так он ищется при отправке рассылок."""
+        self.email = self.email.strip().lower()
+        super().save(*args, **kwargs)
+
+    class Meta:
+        verbose_name = "Исключение из рассылок"
+        verbose_name_plural = "Список исключений"
+        ordering = ["-created_at"]
+        db_table = "tb_suppression"
+        constraints = [
+            models.UniqueConstraint(fields=["owner", "email"], name="unique_suppression_per_owner"),
+            # NULL в owner не участвует в уникальности, поэтому для глобальных исключений - отдельный частичный индекс
+            models.UniqueConstraint(
+                fields=["email"],
+                condition=Q(owner__isnull=True),
+                name="unique_global_suppression",
+            ),
+        ]
@@ -0,0 +1,160 @@
+"""Постраничный вывод списков по ключу (keyset / cursor pagination).
+
+Вместо номера страницы и OFFSET (БД читает и отбрасывает все строки предыдущих страниц) страница задается курсором -
+значениями ключа сортировки последней (или первой) строки соседней страницы. Следующая страница выбирается условием
+"ключ больше курсора" по индексу, поэтому время ответа не зависит от размера таблицы и номера страницы.
+
+Ключ сортировки должен быть уникальным (последним полем обычно идет id) и не содержать NULL (для полей с NULL
+сортирую по аннотации с Coalesce)."""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(Exception):
+    """Курсор страницы поврежден или не подходит к ключу сортировки списка."""
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        return datetime.fromisoformat(value["dt"])
+    return value
+
+
+class KeysetPage:
+    """Страница списка: объекты и курсоры соседних страниц (None, если соседней страницы нет)."""
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Пагинатор по ключу сортировки.
+    :param queryset: queryset списка (с аннотациями, если ключ сортировки их использует).
+    :param ordering: поля ключа сортировки в формате order_by ("full_name", "-end", "id"); значения читаются
+    атрибутами объектов, поэтому поля связанных моделей нужно предварительно аннотировать.
+    :param per_page: размер страницы."""
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = list(ordering)
+        self.per_page = per_page
+        self.fields = [(name.lstrip("-"), name.startswith("-")) for name in self.ordering]
+
+    def encode_cursor(self, obj, direction):
+        """Курсор - base64 от JSON: направление ("n" - следующая, "p" - предыдущая) и значения ключа объекта."""
+        values = [_encode_value(getattr(obj, name)) for name, _ in self.fields]
+        data = json.dumps({"d": direction, "v": values}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+
+    def decode_cursor(self, cursor):
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            direction, values = data["d"], [_decode_value(value) for value in data["v"]]
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise InvalidCursor(cursor)
+        if direction not in ("n", "p") or len(values) != len(self.fields):
+            raise InvalidCursor(cursor)
+        return direction, values
+
+    def _seek_filter(self, values, forward):
+        """Условие "строка после курсора" (forward) или "строка перед курсором" для составного ключа:
+        f1 > v1 OR (f1 = v1 AND f2 > v2) OR ... (для полей по убыванию сравнение обратное).
+        Дополнительное условие f1 >= v1 не меняет результат, но позволяет БД начать чтение индекса с курсора."""
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self.fields, values):
+            lookup = "lt" if descending == forward else "gt"
+            condition |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        first_name, first_descending = self.fields[0]
+        first_lookup = "lte" if first_descending == forward else "gte"
+        return Q(**{f"{first_name}__{first_lookup}": values[0]}) & condition
+
+    def page(self, cursor=None):
+        """Страница по курсору (без курсора - первая страница).
+        Читаю на одну строку больше размера страницы, чтобы узнать, есть ли следующая (предыдущая) страница."""
+        if not cursor:
+            direction, queryset = "n", self.queryset.order_by(*self.ordering)
+        else:
+            direction, values = self.decode_cursor(cursor)
+            try:
+                queryset = self.queryset.filter(self._seek_filter(values, forward=direction == "n"))
+            except (ValueError, TypeError, ValidationError):
+                # Значение курсора не приводится к типу поля ключа (например, строка вместо id) - поля проверяют
+                # и приводят значения при построении условия
+                raise InvalidCursor(cursor)
+            if direction == "n":
+                queryset = queryset.order_by(*self.ordering)
+            else:
+                reverse = [name[1:] if name.startswith("-") else f"-{name}" for name in self.ordering]
+                queryset = queryset.order_by(*reverse)
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == "p":
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, bool(cursor)
+
+        next_cursor = self.encode_cursor(rows[-1], "n") if rows and has_next else None
+        previous_cursor = self.encode_cursor(rows[0], "p") if rows and has_previous else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+class KeysetPaginationMixin:
+    """Миксин для ListView: постраничный вывод по ключу keyset_ordering вместо номеров страниц.
+    Параметры запроса: cursor - курсор страницы, page_size - размер страницы (от 1 до MAX_PAGE_SIZE).
+    В шаблоне доступны page_obj (KeysetPage) и is_paginated, ссылки выводит app_mailing/includes/pagination.html."""
+
+    paginate_by = DEFAULT_PAGE_SIZE
+    max_paginate_by = MAX_PAGE_SIZE
+    keyset_ordering = ("id",)
+
+    def get_paginate_by(self, queryset):
+        try:
+            page_size = int(self.request.GET.get("page_size", self.paginate_by))
+        except ValueError:
+            page_size = self.paginate_by
+        return min(max(page_size, 1), self.max_paginate_by)
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, self.keyset_ordering, page_size)
+        try:
+            page = paginator.page(self.request.GET.get("cursor"))
+        except InvalidCursor:
+            raise Http404("Некорректный курсор страницы")
+        return paginator, page, page.object_list, page.has_other_pages()
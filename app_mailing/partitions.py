@@ -0,0 +1,178 @@
+"""Управление месячными партициями таблицы *Попыток рассылок* (tb_attempt).
+
+В PostgreSQL таблица tb_attempt секционирована по диапазону attempt_time (declarative partitioning, см. миграцию
+0011_partition_attempt): одна партиция на календарный месяц (tb_attempt_2025_05, tb_attempt_2025_06, ...) плюс
+партиция по умолчанию tb_attempt_default для строк вне созданных диапазонов. Модель Attempt при этом работает
+как обычно - партиции прозрачны для ORM.
+
+На других СУБД (SQLite в тестах/CI) секционирования нет, и все функции модуля ничего не делают.
+
+Архивированные партиции записываются в AttemptArchive: по границе архива (get_archive_cutoff) и ID рассылок с
+архивированными попытками (get_archived_mailing_ids) пересчеты из исходных таблиц (services.recount_mailing_counters,
+services.rebuild_daily_stats) пропускают данные, которых в tb_attempt уже нет."""
+import gzip
+import os
+import re
+from datetime import date, datetime
+from datetime import timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.db.models import Max
+
+from app_mailing.models import AttemptArchive
+
+ATTEMPT_TABLE = "tb_attempt"
+DEFAULT_PARTITION = f"{ATTEMPT_TABLE}_default"
+PARTITION_NAME_RE = re.compile(rf"^{ATTEMPT_TABLE}_(\d{{4}})_(\d{{2}})$")
+
+
+def is_supported():
+    """Секционирование доступно только в PostgreSQL."""
+    return connection.vendor == "postgresql"
+
+
+def month_start(value):
+    """Возвращает первый день месяца для даты/даты-времени."""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    """Сдвигает первый день месяца на count месяцев вперед (или назад при отрицательном count)."""
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    """Имя партиции для месяца, например: tb_attempt_2025_05."""
+    return f"{ATTEMPT_TABLE}_{month:%Y_%m}"
+
+
+def partition_bounds(month):
+    """Границы партиции [начало месяца, начало следующего месяца) в UTC - в виде строк для SQL."""
+    start = datetime.combine(month, datetime.min.time(), tzinfo=dt_timezone.utc)
+    end = datetime.combine(add_months(month, 1), datetime.min.time(), tzinfo=dt_timezone.utc)
+    return start.isoformat(), end.isoformat()
+
+
+def list_attempt_partitions():
+    """Возвращает список месячных партиций tb_attempt в виде пар (месяц, имя партиции), отсортированных по месяцу.
+    Партиция по умолчанию в список не входит."""
+    if not is_supported():
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            """,
+            [ATTEMPT_TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME_RE.match(name)
+        if match:
+            partitions.append((date(int(match.group(1)), int(match.group(2)), 1), name))
+    return sorted(partitions)
+
+
+def create_attempt_partition(month):
+    """Создает партицию tb_attempt для месяца, если её еще нет.
+    Если строки этого месяца уже успели попасть в партицию по умолчанию, PostgreSQL не даст создать партицию -
+    поэтому такие строки в одной транзакции переносятся во временную таблицу и возвращаются после создания.
+    :return: True, если партиция была создана."""
+    name = partition_name(month)
+    if name in {existing for _, existing in list_attempt_partitions()}:
+        return False
+
+    start, end = partition_bounds(month)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"CREATE TEMP TABLE attempt_moving (LIKE {ATTEMPT_TABLE}) ON COMMIT DROP")
+        cursor.execute(
+            f"""
+            WITH moved AS (
+                DELETE FROM {DEFAULT_PARTITION}
+                WHERE attempt_time >= %s AND attempt_time < %s
+                RETURNING *
+            )
+            INSERT INTO attempt_moving SELECT * FROM moved
+            """,
+            [start, end],
+        )
+        cursor.execute(
+            f"CREATE TABLE {name} PARTITION OF {ATTEMPT_TABLE} FOR VALUES FROM (%s) TO (%s)",
+            [start, end],
+        )
+        cursor.execute(f"INSERT INTO {ATTEMPT_TABLE} SELECT * FROM attempt_moving")
+    return True
+
+
+def ensure_attempt_partitions(months_ahead=3):
+    """Создает партиции tb_attempt для текущего месяца и months_ahead следующих месяцев.
+    Вызывается планировщиком раз в сутки и командой "create_attempt_partitions".
+    :return: список имен созданных партиций."""
+    if not is_supported():
+        return []
+    current = month_start(datetime.now(dt_timezone.utc))
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if create_attempt_partition(month):
+            created.append(partition_name(month))
+    return created
+
+
+def record_attempt_archive(month, name, path, mailing_ids):
+    """Записывает архивированную партицию в AttemptArchive: границу архива (начало следующего месяца) и ID рассылок,
+    попытки которых были в партиции."""
+    return AttemptArchive.objects.create(
+        partition=name,
+        archived_before=datetime.combine(add_months(month, 1), datetime.min.time(), tzinfo=dt_timezone.utc),
+        path=path,
+        mailing_ids=sorted(mailing_ids),
+    )
+
+
+def get_archive_cutoff():
+    """Граница архива: попытки раньше этого времени архивированы и удалены из БД (None - архивов нет)."""
+    return AttemptArchive.objects.aggregate(cutoff=Max("archived_before"))["cutoff"]
+
+
+def get_archived_mailing_ids():
+    """ID рассылок, часть попыток которых архивирована (их счетчики не пересчитываются из tb_attempt)."""
+    return {pk for ids in AttemptArchive.objects.values_list("mailing_ids", flat=True) for pk in ids}
+
+
+def archive_attempt_partition(name, output_dir):
+    """Архивирует одну месячную партицию tb_attempt:
+    1) Отсоединяет партицию от tb_attempt (DETACH PARTITION) - её строки сразу пропадают из всех запросов.
+    2) Выгружает строки партиции в сжатый CSV-файл (COPY ... TO STDOUT → gzip) в output_dir.
+    3) Записывает архив в AttemptArchive (см. record_attempt_archive) и удаляет отсоединенную таблицу.
+    Файл сначала пишется во временный и переименовывается только после успешной выгрузки, поэтому при ошибке
+    таблица не удаляется и её можно снова подключить (ATTACH PARTITION).
+    :return: путь к созданному архиву."""
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"{name}.csv.gz")
+    tmp_path = f"{path}.part"
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {ATTEMPT_TABLE} DETACH PARTITION {name}")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as archive:
+            cursor.copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER true)", archive)
+        os.replace(tmp_path, path)
+        cursor.execute(f"SELECT DISTINCT mailing_id FROM {name}")
+        mailing_ids = [row[0] for row in cursor.fetchall()]
+        match = PARTITION_NAME_RE.match(name)
+        record_attempt_archive(date(int(match.group(1)), int(match.group(2)), 1), name, path, mailing_ids)
+        cursor.execute(f"DROP TABLE {name}")
+    return path
+
+
+def get_partitions_to_archive(keep_months):
+    """Возвращает партиции, целиком более старые, чем keep_months последних месяцев (включая текущий)."""
+    oldest_kept = add_months(month_start(datetime.now(dt_timezone.utc)), -(keep_months - 1))
+    return [(month, name) for month, name in list_attempt_partitions() if month < oldest_kept]
@@ -4,7 +4,10 @@ from django.utils.timezone import now
 from django_apscheduler.jobstores import DjangoJobStore
 
 from app_mailing.models import Mailing
+from app_mailing.partitions import ensure_attempt_partitions
 from app_mailing.services import send_mailing_cli
+from users.services import (purge_transactional_emails,
+                            send_transactional_emails)
 
 
 # Планировщик существует как глобальный объект - один на всё приложение! ПОЭТОМУ создание Планировщика и подключение
@@ -24,6 +27,23 @@ def my_scheduled_job():
         send_mailing_cli(mailing)
 
 
+def attempt_partitions_job():
+    """Функция заранее создает месячные партиции таблицы попыток рассылок (tb_attempt) на ближайшие месяцы, чтобы
+    новые попытки не попадали в партицию по умолчанию (только для PostgreSQL)."""
+    ensure_attempt_partitions(months_ahead=3)
+
+
+def transactional_emails_job():
+    """Функция отправляет служебные письма (подтверждение email, восстановление пароля), которые не удалось
+    отправить сразу после регистрации/запроса (ошибка SMTP, перезапуск процесса), и повторяет неудачные попытки."""
+    send_transactional_emails()
+
+
+def purge_transactional_emails_job():
+    """Функция удаляет из очереди служебных писем старые отправленные и неотправленные письма."""
+    purge_transactional_emails()
+
+
 def start():
     """Инициализация и запуск планировщика: регистрация события, добавление задачи на повторяющийся запуск и сам
     запуск планировщика в фоновом режиме."""
@@ -35,5 +55,33 @@ def start():
         id="tech_id",  # мой уникальный ID (оно должно быть чтоб все корректно работало, могу указать любое значение)
         replace_existing=True,  # перезаписываю, если уже есть задача с таким ID
     )
+    # Добавляю задачу: раз в сутки проверять, что партиции tb_attempt на ближайшие месяцы созданы
+    mailing_scheduler.add_job(
+        attempt_partitions_job,
+        trigger="interval",
+        hours=24,
+        next_run_time=now(),  # первый запуск - сразу при старте планировщика
+        id="attempt_partitions",
+        replace_existing=True,
+    )
+    # Добавляю задачу: каждые 10 секунд отправлять служебные письма из очереди. Отдельная задача (не в tech_id),
+    # поэтому долгая массовая рассылка не задерживает письма подтверждения и восстановления пароля
+    mailing_scheduler.add_job(
+        transactional_emails_job,
+        trigger="interval",
+        seconds=10,
+        max_instances=1,  # следующий запуск не стартует, пока не закончен предыдущий
+        coalesce=True,
+        id="transactional_emails",
+        replace_existing=True,
+    )
+    # Добавляю задачу: раз в сутки удалять старые служебные письма из очереди
+    mailing_scheduler.add_job(
+        purge_transactional_emails_job,
+        trigger="interval",
+        hours=24,
+        id="purge_transactional_emails",
+        replace_existing=True,
+    )
     mailing_scheduler.start()
     print("✅ APScheduler успешно запущен.")
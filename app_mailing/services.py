@@ -1,11 +1,309 @@
+import csv
+import io
+import json
 import os
+import smtplib
+from itertools import islice
 
 from django.contrib import messages
+from django.core.exceptions import ValidationError
 from django.core.mail import send_mail
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.validators import validate_email
+from django.db import connection, transaction
+from django.db.models import (Case, CharField, Count, Exists,
+                              ExpressionWrapper, F, Min, OuterRef, Q, Subquery,
+                              Sum, TextField, Value, When)
+from django.db.models.functions import Coalesce, Concat, Now, TruncDate
+from django.db.models.lookups import EndsWith, IRegex
 from django.shortcuts import redirect
 from django.utils import timezone
 
-from app_mailing.models import Attempt
+from app_mailing.cache import bump_generation, get_generations, get_or_rebuild
+from app_mailing.models import (Attempt, Mailing, OwnerDailyStats, Recipient,
+                                Suppression)
+from app_mailing.partitions import get_archive_cutoff, get_archived_mailing_ids
+from app_mailing.suppression import SuppressionChecker
+from config.routers import use_replica
+
+# Через сколько попыток рассылки накопленные изменения счетчиков сбрасываются в БД одним UPDATE
+COUNTERS_FLUSH_EVERY = 100
+
+
+def update_mailing_counters(mailing_id, **deltas):
+    """Сервисная функция для атомарного изменения денормализованных счетчиков Рассылки одним UPDATE через
+    F()-выражения (без чтения строки в Python и без гонок между процессами).
+    :param mailing_id: ID рассылки (Mailing), счетчики которой нужно изменить.
+    :param deltas: изменения счетчиков, например: success_count=5, pending_count=-5."""
+    changes = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if changes:
+        Mailing.objects.filter(pk=mailing_id).update(**changes, updated_at=Now())
+
+
+def update_daily_stats(owner_id, **deltas):
+    """Сервисная функция для атомарного изменения *Дневной статистики* пользователя за сегодня (строка создается
+    при первом обращении за день, дальше - только UPDATE через F()-выражения).
+    :param owner_id: ID пользователя (владельца рассылок). Для рассылок без владельца статистика не ведется.
+    :param deltas: изменения агрегатов, например: successful_attempts=5, launched_mailings=1."""
+    changes = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if owner_id is None or not changes:
+        return
+    stats, _ = OwnerDailyStats.objects.get_or_create(owner_id=owner_id, day=timezone.localdate())
+    OwnerDailyStats.objects.filter(pk=stats.pk).update(**changes)
+
+
+# Статистика для *Главной страницы* хранится в кэше одним объектом на пользователя
+DASHBOARD_CACHE_KEY = "dashboard:{owner_id}"
+DASHBOARD_CACHE_TIMEOUT = 60 * 5
+DASHBOARD_GENERATION = "dashboard"  # Имя поколения статистики (app_mailing/cache.py)
+
+
+def _active_audience_condition(owner):
+    """Условие для запроса к Recipient: получатель входит в аудиторию хотя бы одной запущенной рассылки владельца -
+    выбран в рассылке явно (или зафиксирован из сегмента) либо подходит под правило сегмента рассылки (правила
+    те же, что в Segment.get_filter, но значение сегмента сравнивается с полями получателя внутри подзапроса)."""
+    active_mailings = Mailing.objects.filter(owner=owner, status="launched")
+    recipient_email = ExpressionWrapper(OuterRef("email"), output_field=CharField())
+    recipient_comment = ExpressionWrapper(OuterRef("comment"), output_field=TextField())
+    return (
+        Exists(Mailing.recipients.through.objects.filter(recipient_id=OuterRef("pk"), mailing__in=active_mailings))
+        | Exists(active_mailings.filter(segment__kind="all"))
+        | Exists(active_mailings.filter(
+            EndsWith(recipient_email, Concat(Value("@"), "segment__value")),
+            segment__kind="domain",
+        ))
+        | Exists(active_mailings.filter(
+            IRegex(recipient_comment, Concat(Value(r"(^|[^\w#-])#"), "segment__value", Value(r"([^\w-]|$)"))),
+            segment__kind="comment_tag",
+        ))
+    )
+
+
+def compute_dashboard_stats(owner):
+    """Сервисная функция для подсчета статистики *Главной страницы* пользователя условными агрегатами - по одному
+    запросу к каждой таблице (рассылки, получатели, дневная статистика), без запросов на каждую рассылку:
+    - total_mailings / active_mailings - все рассылки и запущенные (статус "launched").
+    - unique_recipients - все получатели пользователя.
+    - active_recipients_count - уникальные получатели запущенных рассылок (получатель, который есть в нескольких
+    рассылках, считается один раз).
+    - successful_attempts / failed_attempts / total_sent_messages / unique_sent_messages - из *Дневной статистики*.
+    :param owner: пользователь (владелец рассылок).
+    :return: словарь со статистикой."""
+    stats = Mailing.objects.filter(owner=owner).aggregate(
+        total_mailings=Count("id"),
+        active_mailings=Count("id", filter=Q(status="launched")),
+    )
+    stats |= Recipient.objects.filter(owner=owner).aggregate(
+        unique_recipients=Count("id"),
+        active_recipients_count=Count("id", filter=_active_audience_condition(owner)),
+    )
+    stats |= OwnerDailyStats.objects.filter(owner=owner).aggregate(
+        successful_attempts=Coalesce(Sum("successful_attempts"), 0),
+        failed_attempts=Coalesce(Sum("failed_attempts"), 0),
+        unique_sent_messages=Coalesce(Sum("sent_mailings"), 0),
+    )
+    stats["total_sent_messages"] = stats["successful_attempts"] + stats["failed_attempts"]
+    return stats
+
+
+def get_dashboard_version(owner_id):
+    """Текущая версия статистики *Главной страницы* пользователя - поколение "dashboard" владельца."""
+    return get_generations([DASHBOARD_GENERATION], owner_id)[0]
+
+
+def get_dashboard_stats(owner, with_version=False):
+    """Сервисная функция, возвращающая статистику *Главной страницы* пользователя из кэша (при отсутствии - считает
+    ее и кладет в кэш). Версия статистики - поколение "dashboard" владельца, его увеличивает
+    invalidate_dashboard_stats при изменении рассылок, получателей и статистики отправок. Пока один запрос
+    пересчитывает статистику, остальные получают прежнюю (get_or_rebuild - защита от одновременного пересчета).
+    Статистика считается по основной базе, даже внутри контроллера на реплике: иначе данные отстающей реплики
+    были бы сохранены под только что увеличенной версией.
+    :param with_version: вернуть пару (статистика, ее версия) - для ETag главной страницы."""
+
+    def compute():
+        with use_replica(False):
+            return compute_dashboard_stats(owner)
+
+    return get_or_rebuild(
+        DASHBOARD_CACHE_KEY.format(owner_id=owner.pk),
+        compute,
+        DASHBOARD_CACHE_TIMEOUT,
+        version=get_dashboard_version(owner.pk),
+        with_version=with_version,
+    )
+
+
+def invalidate_dashboard_stats(owner_id):
+    """Сервисная функция для сброса кэша статистики *Главной страницы* пользователя: увеличивает поколение
+    статистики (после коммита транзакции, чтобы статистика не была посчитана заново по еще не закоммиченным
+    данным). Прежняя статистика остается в кэше как устаревшая - до пересчета."""
+    bump_generation(DASHBOARD_GENERATION, owner_id)
+
+
+class MailingCountersBuffer:
+    """Буфер изменений счетчиков Рассылки: копит результаты попыток в памяти и сбрасывает их в БД пачкой
+    (каждые COUNTERS_FLUSH_EVERY попыток и в конце рассылки), вместо отдельного UPDATE на каждое письмо.
+    Вместе со счетчиками рассылки обновляется и *Дневная статистика* владельца рассылки."""
+
+    def __init__(self, mailing):
+        self.mailing_id = mailing.pk
+        self.owner_id = mailing.owner_id
+        self.total = 0  # Всего учтено попыток за время жизни буфера
+        self.success = 0
+        self.failed = 0
+        self.suppressed = 0
+
+    def add(self, status):
+        """Учитывает одну попытку рассылки со статусом "success", "failed" или "suppressed"."""
+        self.total += 1
+        if status == "success":
+            self.success += 1
+        elif status == "suppressed":
+            self.suppressed += 1
+        else:
+            self.failed += 1
+        if self.success + self.failed + self.suppressed >= COUNTERS_FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        """Сбрасывает накопленные изменения в БД: каждая попытка уменьшает количество ожидающих получателей.
+        Пропущенные получатели (список исключений) в дневную статистику попыток не входят - письма не было."""
+        update_mailing_counters(
+            self.mailing_id,
+            success_count=self.success,
+            failed_count=self.failed,
+            suppressed_count=self.suppressed,
+            pending_count=-(self.success + self.failed + self.suppressed),
+        )
+        update_daily_stats(self.owner_id, successful_attempts=self.success, failed_attempts=self.failed)
+        bump_generation(Mailing, self.owner_id)  # Счетчики выводятся в списке рассылок
+        invalidate_dashboard_stats(self.owner_id)  # Дневная статистика - на главной странице (и в ее ETag)
+        self.success = 0
+        self.failed = 0
+        self.suppressed = 0
+
+
+def _count_subquery(queryset):
+    """Оборачивает queryset в подзапрос COUNT(*) по рассылке (для UPDATE ... SET field = (SELECT COUNT(*) ...))."""
+    return Coalesce(
+        Subquery(queryset.order_by().values("mailing_id").annotate(n=Count("*")).values("n")),
+        0,
+    )
+
+
+def recount_mailing_counters(mailings=None):
+    """Сервисная функция для пересчета денормализованных счетчиков Рассылок из исходных таблиц (связи с
+    получателями и *Попытки рассылок*). Выполняется одним UPDATE с подзапросами, без загрузки рассылок в Python.
+    Рассылки, часть попыток которых архивирована (команда archive_attempts), пропускаются: этих попыток в
+    tb_attempt уже нет, и пересчет обнулил бы историю - их счетчики остаются прежними.
+    :param mailings: queryset рассылок для пересчета (по умолчанию - все рассылки).
+    :return: количество обновленных рассылок."""
+    if mailings is None:
+        mailings = Mailing.objects.all()
+    archived_mailing_ids = get_archived_mailing_ids()
+    if archived_mailing_ids:
+        mailings = mailings.exclude(pk__in=archived_mailing_ids)
+
+    links = Mailing.recipients.through.objects.filter(mailing_id=OuterRef("pk"))
+    attempts = Attempt.objects.filter(mailing_id=OuterRef("pk"))
+    # Получатели рассылки, по которым еще нет ни одной попытки
+    not_attempted_links = links.filter(
+        ~Exists(Attempt.objects.filter(mailing_id=OuterRef("mailing_id"), recipient_id=OuterRef("recipient_id")))
+    )
+
+    # Завершенные рассылки по сегменту без снимка не хранят получателей в связи recipients - их аудиторией
+    # считаю получателей, по которым были попытки
+    segment_done = Q(segment__isnull=False, snapshot_recipients=False, status="accomplished")
+    attempted_recipients = Coalesce(
+        Subquery(attempts.order_by()
+                 .values("mailing_id")
+                 .annotate(n=Count("recipient_id", distinct=True))
+                 .values("n")),
+        0,
+    )
+
+    return mailings.update(
+        recipient_count=Case(When(segment_done, then=attempted_recipients), default=_count_subquery(links)),
+        success_count=_count_subquery(attempts.filter(status="success")),
+        failed_count=_count_subquery(attempts.filter(status="failed")),
+        suppressed_count=_count_subquery(attempts.filter(status="suppressed")),
+        pending_count=Case(When(segment_done, then=0), default=_count_subquery(not_attempted_links)),
+        updated_at=Now(),
+    )
+
+
+# Пачка для потокового чтения получателей рассылки из БД (.iterator) и для записи снимка сегмента
+AUDIENCE_CHUNK_SIZE = 2000
+
+
+def get_mailing_recipients(mailing):
+    """Сервисная функция, возвращающая получателей Рассылки: явно выбранные получатели (связь recipients) плюс,
+    если рассылка нацелена на сегмент, получатели сегмента на текущий момент. Результат - один запрос к
+    tb_recipient (без материализации сегмента), который при отправке читается потоком через .iterator().
+    :param mailing: объект рассылки (Mailing)."""
+    if not mailing.segment_id:
+        return mailing.recipients.order_by("pk")
+    links = Mailing.recipients.through.objects.filter(mailing_id=mailing.pk).values("recipient_id")
+    return Recipient.objects.filter(Q(pk__in=links) | mailing.segment.get_filter()).order_by("pk")
+
+
+def prepare_mailing_audience(mailing):
+    """Сервисная функция, фиксирующая аудиторию Рассылки, нацеленной на сегмент, в момент запуска:
+    - snapshot_recipients=True - состав сегмента записывается в связь recipients (пачками, без сигналов m2m_changed),
+    после чего счетчики рассылки пересчитываются из исходных таблиц.
+    - иначе - в счетчики recipient_count/pending_count записывается только размер аудитории (один COUNT).
+    Для рассылок без сегмента ничего не делает (счетчики поддерживаются сигналами при изменении recipients).
+    :param mailing: объект рассылки (Mailing).
+    :return: queryset получателей рассылки (см. get_mailing_recipients)."""
+    recipients = get_mailing_recipients(mailing)
+    if not mailing.segment_id:
+        return recipients
+
+    if mailing.snapshot_recipients:
+        through = Mailing.recipients.through
+        recipient_ids = recipients.values_list("pk", flat=True).iterator(chunk_size=AUDIENCE_CHUNK_SIZE)
+        while batch := list(islice(recipient_ids, AUDIENCE_CHUNK_SIZE)):
+            through.objects.bulk_create(
+                [through(mailing_id=mailing.pk, recipient_id=recipient_id) for recipient_id in batch],
+                ignore_conflicts=True,
+            )
+        recount_mailing_counters(Mailing.objects.filter(pk=mailing.pk))
+    else:
+        audience = recipients.count()
+        Mailing.objects.filter(pk=mailing.pk).update(
+            recipient_count=audience, pending_count=audience, updated_at=Now()
+        )
+    return recipients
+
+
+def record_suppressed_attempt(mailing, recipient):
+    """Фиксирует *Попытку рассылки* со статусом "suppressed" - получатель пропущен, т.к. его адрес в списке
+    исключений (письмо не отправлялось)."""
+    Attempt.objects.create(
+        mailing=mailing,
+        recipient=recipient,
+        status="suppressed",
+        server_response="Адрес в списке исключений",
+        owner=mailing.owner,
+    )
+
+
+def suppress_on_hard_bounce(email, error):
+    """Сервисная функция: если почтовый сервер окончательно отверг адрес (постоянная ошибка SMTP 5xx для
+    получателя), адрес добавляется в глобальный список исключений - повторные рассылки на него не отправляются.
+    :param email: адрес получателя.
+    :param error: исключение, полученное при отправке письма.
+    :return: True, если адрес был исключен."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+    elif isinstance(error, smtplib.SMTPResponseException):
+        codes = [error.smtp_code]
+    else:
+        return False
+    if not codes or not all(500 <= code < 600 for code in codes):
+        return False
+    Suppression.objects.get_or_create(owner=None, email=email.strip().lower(), defaults={"reason": "hard_bounce"})
+    return True
 
 
 def send_mailing(request, mailing):
@@ -17,7 +315,7 @@ def send_mailing(request, mailing):
         messages.warning(request, "Эту рассылку нельзя повторно запустить.")
         return redirect("app_mailing:mailing_list_page")
 
-    recipients = mailing.recipients.all()
+    recipients = get_mailing_recipients(mailing)
 
     if not recipients.exists():
         messages.warning(request, "У этой рассылки нет получателей.")
@@ -29,11 +327,23 @@ def send_mailing(request, mailing):
 
     mailing.status = "launched"  # Меняю статус рассылки, что она запущена
     mailing.first_message_sending = timezone.now()  # Фиксирую дату начала
-    mailing.save()
+    # Сохраняю только изменённые поля, чтоб не затереть счетчики, которые обновляются в БД через F()-выражения
+    mailing.save(update_fields=["status", "first_message_sending", "updated_at"])
+    update_daily_stats(mailing.owner_id, launched_mailings=1)
+    prepare_mailing_audience(mailing)
+    invalidate_dashboard_stats(mailing.owner_id)
+    bump_generation(Mailing, mailing.owner_id)
 
     success_count = 0
+    counters = MailingCountersBuffer(mailing)
+    suppression = SuppressionChecker(mailing.owner_id)
 
-    for recipient in recipients:  # Запускаю рассылку по всем получателям
+    # Запускаю рассылку по всем получателям (читаю их из БД потоком, пачками, а не всем списком сразу)
+    for recipient in recipients.iterator(chunk_size=AUDIENCE_CHUNK_SIZE):
+        if suppression.is_suppressed(recipient.email):  # Адрес в списке исключений - письмо не отправляю
+            record_suppressed_attempt(mailing, recipient)
+            counters.add("suppressed")
+            continue
         try:
             send_mail(
                 subject=subject,
@@ -50,18 +360,27 @@ def send_mailing(request, mailing):
                 owner=mailing.owner  # Важно!!! Чтоб автоматически во "owner попытки" записывался "owner рассылки"
             )
             success_count += 1
+            counters.add("success")
         except Exception as e:
             Attempt.objects.create(
                 mailing=mailing,
                 recipient=recipient,
                 status="failed",
-                server_response=str(e)
+                server_response=str(e),
+                owner=mailing.owner  # Важно!!! Чтоб автоматически во "owner попытки" записывался "owner рассылки"
             )
+            suppress_on_hard_bounce(recipient.email, e)
+            counters.add("failed")
             print(f"Ошибка при отправке письма на {recipient.email}: {e}")
 
+    counters.flush()  # Сбрасываю в БД остаток накопленных изменений счетчиков
+
     mailing.end_message_sending = timezone.now()  # Фиксирую дату окончания
     mailing.status = "accomplished"  # Меняю статус рассылки после завершения
-    mailing.save()
+    mailing.save(update_fields=["status", "end_message_sending", "updated_at"])
+    update_daily_stats(mailing.owner_id, accomplished_mailings=1, sent_mailings=1)
+    invalidate_dashboard_stats(mailing.owner_id)
+    bump_generation(Mailing, mailing.owner_id)
 
     messages.success(request, f"Рассылка успешно отправлена {success_count} получателям.")
 
@@ -80,7 +399,7 @@ def send_mailing_cli(mailing):
             "failed": 0,
         }
 
-    recipients = mailing.recipients.all()
+    recipients = get_mailing_recipients(mailing)
 
     if not recipients.exists():
         return {
@@ -96,12 +415,25 @@ def send_mailing_cli(mailing):
 
     mailing.status = "launched"  # Меняю статус рассылки, что она запущена
     mailing.first_message_sending = timezone.now()  # Фиксирую дату начала
-    mailing.save()
+    mailing.save(update_fields=["status", "first_message_sending", "updated_at"])
+    update_daily_stats(mailing.owner_id, launched_mailings=1)
+    prepare_mailing_audience(mailing)
+    invalidate_dashboard_stats(mailing.owner_id)
+    bump_generation(Mailing, mailing.owner_id)
 
     success_count = 0
     failed_count = 0
+    suppressed_count = 0
+    counters = MailingCountersBuffer(mailing)
+    suppression = SuppressionChecker(mailing.owner_id)
 
-    for recipient in recipients:  # Запускаю рассылку по всем получателям
+    # Запускаю рассылку по всем получателям (читаю их из БД потоком, пачками, а не всем списком сразу)
+    for recipient in recipients.iterator(chunk_size=AUDIENCE_CHUNK_SIZE):
+        if suppression.is_suppressed(recipient.email):  # Адрес в списке исключений - письмо не отправляю
+            record_suppressed_attempt(mailing, recipient)
+            suppressed_count += 1
+            counters.add("suppressed")
+            continue
         try:
             send_mail(
                 subject=subject,
@@ -118,6 +450,7 @@ def send_mailing_cli(mailing):
                 owner=mailing.owner  # Важно!!! Чтоб автоматически во "owner попытки" записывался "owner рассылки"
             )
             success_count += 1
+            counters.add("success")
         except Exception as e:
             Attempt.objects.create(
                 mailing=mailing,
@@ -126,17 +459,25 @@ def send_mailing_cli(mailing):
                 server_response=str(e),
                 owner=mailing.owner  # Важно!!! Чтоб автоматически во "owner попытки" записывался "owner рассылки"
             )
+            suppress_on_hard_bounce(recipient.email, e)
             failed_count += 1
+            counters.add("failed")
+
+    counters.flush()  # Сбрасываю в БД остаток накопленных изменений счетчиков
 
     mailing.end_message_sending = timezone.now()  # Фиксирую дату окончания
     mailing.status = "accomplished"  # Меняю статус рассылки после завершения
-    mailing.save()
+    mailing.save(update_fields=["status", "end_message_sending", "updated_at"])
+    update_daily_stats(mailing.owner_id, accomplished_mailings=1, sent_mailings=1)
+    invalidate_dashboard_stats(mailing.owner_id)
+    bump_generation(Mailing, mailing.owner_id)
 
     return {
         "status": "ok",
         "message": "Рассылка завершена",
         "success": success_count,
         "failed": failed_count,
+        "suppressed": suppressed_count,
     }
 
 
@@ -151,16 +492,21 @@ def stop_mailing(mailing, reason="Рассылка остановлена вру
     :param mailing: объект рассылки (Mailing), которую нужно остановить.
     :param reason: пояснение причины остановки (сохраняется в server_response)."""
 
-    # ШАГ 1. Нахожу всех Получателей останавливаемой Рассылки
-    all_recipients = mailing.recipients.all()
+    # ШАГ 1. Нахожу всех Получателей останавливаемой Рассылки (если рассылка еще не запускалась, аудитория
+    # сегмента фиксируется сейчас - так же, как при запуске)
+    if mailing.status == "created":
+        all_recipients = prepare_mailing_audience(mailing)
+    else:
+        all_recipients = get_mailing_recipients(mailing)
 
     # ШАГ 2. Получаю ID получателей, которым уже отправлено Сообщение (есть записи Attempt)
     sent_recipient_ids = set(
         mailing.attempts.values_list("recipient_id", flat=True)
     )
 
-    # ШАГ 3. Создаю "failed" попытки по тем, кому еще не отправлено
-    for recipient in all_recipients:
+    # ШАГ 3. Создаю "failed" попытки по тем, кому еще не отправлено (с учетом в счетчиках рассылки)
+    counters = MailingCountersBuffer(mailing)
+    for recipient in all_recipients.iterator(chunk_size=AUDIENCE_CHUNK_SIZE):
         if recipient.id not in sent_recipient_ids:
             Attempt.objects.create(
                 mailing=mailing,
@@ -169,8 +515,341 @@ def stop_mailing(mailing, reason="Рассылка остановлена вру
                 server_response=reason,
                 owner=mailing.owner,
             )
+            counters.add("failed")
+    counters.flush()
 
     # ШАГ 4. Завершаю рассылку
     mailing.status = "accomplished"
     mailing.end_message_sending = timezone.now()
-    mailing.save()
+    mailing.save(update_fields=["status", "end_message_sending", "updated_at"])
+    # Рассылка считается "отправленной" в статистике, если попытки по ней появились впервые именно сейчас
+    first_attempts = not sent_recipient_ids and counters.total > 0
+    update_daily_stats(mailing.owner_id, accomplished_mailings=1, sent_mailings=int(first_attempts))
+    invalidate_dashboard_stats(mailing.owner_id)
+    bump_generation(Mailing, mailing.owner_id)
+
+
+def rebuild_daily_stats(owner_ids=None):
+    """Сервисная функция для построения *Дневной статистики* по уже существующей истории рассылок: удаляет
+    текущие строки статистики и заново собирает их агрегирующими запросами по Attempt и Mailing.
+    Если часть попыток архивирована (команда archive_attempts), строки статистики по день границы архива
+    включительно остаются прежними (попыток этих дней в tb_attempt уже нет), пересобираются только более поздние дни.
+    :param owner_ids: список ID пользователей для пересчета (по умолчанию - все пользователи).
+    :return: количество созданных строк статистики."""
+    attempts = Attempt.objects.filter(owner__isnull=False)
+    mailings = Mailing.objects.filter(owner__isnull=False)
+    if owner_ids:
+        attempts = attempts.filter(owner_id__in=owner_ids)
+        mailings = mailings.filter(owner_id__in=owner_ids)
+    cutoff = get_archive_cutoff()
+    kept_until = timezone.localdate(cutoff) if cutoff else None  # Последний день, статистика которого не меняется
+
+    rows = {}  # (owner_id, day) → объект OwnerDailyStats
+
+    def get_row(owner_id, day):
+        if (owner_id, day) not in rows:
+            rows[(owner_id, day)] = OwnerDailyStats(owner_id=owner_id, day=day)
+        return rows[(owner_id, day)]
+
+    # ШАГ 1. Попытки рассылок по статусам - один GROUP BY (owner, день)
+    attempts_by_day = (attempts
+                       .annotate(day=TruncDate("attempt_time"))
+                       .values("owner_id", "day")
+                       .annotate(success=Count("id", filter=Q(status="success")),
+                                 failed=Count("id", filter=Q(status="failed")))
+                       .order_by()
+                       )
+    for item in attempts_by_day:
+        row = get_row(item["owner_id"], item["day"])
+        row.successful_attempts = item["success"]
+        row.failed_attempts = item["failed"]
+
+    # ШАГ 2. Рассылки, по которым впервые были сделаны попытки (день первой попытки рассылки). Первая попытка
+    # рассылки с архивированными попытками - в архиве, то есть в дне, статистика которого не меняется
+    first_attempts = (attempts
+                      .exclude(mailing_id__in=get_archived_mailing_ids())
+                      .values("mailing_id", "owner_id")
+                      .annotate(first_time=Min("attempt_time"))
+                      .order_by()
+                      )
+    for item in first_attempts:
+        get_row(item["owner_id"], timezone.localdate(item["first_time"])).sent_mailings += 1
+
+    # ШАГ 3. Запущенные и завершенные рассылки (по датам первой отправки и окончания)
+    launched = (mailings
+                .exclude(status="created")
+                .filter(first_message_sending__isnull=False)
+                .annotate(day=TruncDate("first_message_sending"))
+                .values("owner_id", "day")
+                .annotate(n=Count("id"))
+                .order_by()
+                )
+    for item in launched:
+        get_row(item["owner_id"], item["day"]).launched_mailings = item["n"]
+
+    accomplished = (mailings
+                    .filter(status="accomplished", end_message_sending__isnull=False)
+                    .annotate(day=TruncDate("end_message_sending"))
+                    .values("owner_id", "day")
+                    .annotate(n=Count("id"))
+                    .order_by()
+                    )
+    for item in accomplished:
+        get_row(item["owner_id"], item["day"]).accomplished_mailings = item["n"]
+
+    if kept_until:
+        rows = {key: row for key, row in rows.items() if key[1] > kept_until}
+
+    # ШАГ 4. Полностью заменяю статистику (после границы архива) в одной транзакции
+    with transaction.atomic():
+        stats = OwnerDailyStats.objects.all()
+        if owner_ids:
+            stats = stats.filter(owner_id__in=owner_ids)
+        if kept_until:
+            stats = stats.filter(day__gt=kept_until)
+        stats.delete()
+        OwnerDailyStats.objects.bulk_create(rows.values(), batch_size=1000)
+
+    return len(rows)
+
+
+# Сколько строк файла импорта обрабатывается за один раз (один запрос проверки + один INSERT ... ON CONFLICT)
+IMPORT_CHUNK_SIZE = 2000
+IMPORT_FORMATS = ("csv", "ndjson")
+IMPORT_FIELDS = ("email", "full_name", "comment")
+IMPORT_MAX_ERRORS = 20  # Сколько первых отклоненных строк (с причиной) возвращать в отчете
+
+
+def _read_import_rows(stream, fmt):
+    """Построчно читает файл импорта, не загружая его в память целиком.
+    :param stream: бинарный файловый объект (загруженный файл или открытый на диске).
+    :param fmt: формат файла - "csv" (с заголовком) или "ndjson" (один JSON-объект на строку).
+    :return: генератор пар (номер строки, словарь значений или None, если строку не удалось разобрать)."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        for line_number, row in enumerate(csv.DictReader(text), start=2):
+            yield line_number, row
+        return
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+def _clean_import_row(row):
+    """Проверяет и нормализует одну строку импорта.
+    :return: пара (словарь полей получателя, текст ошибки) - одно из значений всегда None."""
+    if row is None:
+        return None, "не удалось разобрать строку"
+    values = {}
+    for field in IMPORT_FIELDS:
+        if field in row:
+            value = row[field]
+            values[field] = str(value).strip() if value not in (None, "") else None
+
+    email = values.get("email")
+    if not email:
+        return None, "не указан email"
+    email = Recipient.normalize_email(email)
+    try:
+        validate_email(email)
+    except ValidationError:
+        return None, f"некорректный email: {email}"
+    values["email"] = email
+
+    for field in ("email", "full_name"):
+        max_length = Recipient._meta.get_field(field).max_length
+        if values.get(field) and len(values[field]) > max_length:
+            return None, f"значение поля {field} длиннее {max_length} символов"
+    return values, None
+
+
+def _upsert_recipients_chunk(owner, rows):
+    """Записывает пачку проверенных получателей одним INSERT ... ON CONFLICT (owner, email) на каждый набор колонок:
+    новые получатели добавляются, у существующих обновляются только те поля, которые были в файле.
+    :param rows: словарь email → поля получателя (дубликаты внутри пачки уже схлопнуты).
+    :return: пара (добавлено, обновлено)."""
+    existing = set(Recipient.objects.filter(owner=owner, email__in=list(rows)).values_list("email", flat=True))
+
+    # Строки NDJSON могут содержать разный набор полей - группирую их, чтобы не затирать отсутствующие поля
+    groups = {}
+    for values in rows.values():
+        groups.setdefault(tuple(sorted(set(values) - {"email"})), []).append(Recipient(owner=owner, **values))
+
+    with transaction.atomic():
+        for update_fields, recipients in groups.items():
+            if update_fields:
+                Recipient.objects.bulk_create(
+                    recipients,
+                    update_conflicts=True,
+                    unique_fields=["owner", "email"],
+                    update_fields=list(update_fields),
+                )
+            else:
+                Recipient.objects.bulk_create(recipients, ignore_conflicts=True)
+    return len(rows) - len(existing), len(existing)
+
+
+def import_recipients(owner, stream, fmt="csv", chunk_size=IMPORT_CHUNK_SIZE):
+    """Сервисная функция для массового импорта *Получателей рассылки* из CSV- или NDJSON-файла.
+    Файл читается потоком и обрабатывается пачками по chunk_size строк: email проверяется и нормализуется,
+    дубликаты внутри пачки схлопываются (побеждает последняя строка), затем пачка записывается в tb_recipient
+    upsert-запросом по ограничению unique_recipient_per_owner. Каждая пачка - отдельная транзакция, поэтому
+    при ошибке посередине файла уже загруженные пачки сохраняются.
+    Поддерживаемые колонки (ключи): email (обязательно), full_name, comment.
+    :param owner: пользователь, которому будут принадлежать получатели.
+    :param stream: бинарный файловый объект с данными.
+    :param fmt: формат файла - "csv" или "ndjson".
+    :param chunk_size: размер пачки.
+    :return: словарь с количеством добавленных (inserted), обновленных (updated) и отклоненных (rejected) строк
+    и списком первых ошибок (errors) в виде "строка N: причина"."""
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Неподдерживаемый формат импорта: {fmt}")
+
+    report = {"inserted": 0, "updated": 0, "rejected": 0, "errors": []}
+    chunk = {}
+
+    def flush():
+        inserted, updated = _upsert_recipients_chunk(owner, chunk)
+        report["inserted"] += inserted
+        report["updated"] += updated
+        chunk.clear()
+
+    for line_number, row in _read_import_rows(stream, fmt):
+        values, error = _clean_import_row(row)
+        if error:
+            report["rejected"] += 1
+            if len(report["errors"]) < IMPORT_MAX_ERRORS:
+                report["errors"].append(f"строка {line_number}: {error}")
+            continue
+        chunk.pop(values["email"], None)  # Повтор email в пачке - оставляю последнюю версию строки
+        chunk[values["email"]] = values
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    invalidate_dashboard_stats(owner.pk)
+    bump_generation(Recipient, owner.pk)
+    return report
+
+
+# Сколько строк за раз забирается из серверного курсора БД при экспорте
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+class Echo:
+    """Псевдо-файл для csv.writer: вместо записи в буфер просто возвращает строку, чтобы её можно было сразу
+    отдать в StreamingHttpResponse."""
+
+    def write(self, value):
+        return value
+
+
+def iter_export_rows(queryset, columns, fmt="csv"):
+    """Сервисная функция для потоковой выгрузки данных (экспорт в CSV или NDJSON).
+    Строки читаются из БД через .iterator() (в PostgreSQL - серверный курсор) пачками по EXPORT_CHUNK_SIZE и сразу
+    превращаются в текст, поэтому расход памяти не зависит от количества выгружаемых строк.
+    :param queryset: выборка для экспорта (уже ограниченная по владельцу).
+    :param columns: список пар (поле/lookup для values_list, заголовок колонки).
+    :param fmt: формат выгрузки - "csv" или "ndjson".
+    :return: генератор строк выгрузки (для StreamingHttpResponse)."""
+    lookups = [lookup for lookup, _ in columns]
+    headers = [header for _, header in columns]
+    rows = queryset.values_list(*lookups).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    if fmt == "csv":
+        writer = csv.writer(Echo())
+        yield writer.writerow(headers)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(headers, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + "\n"
+
+
+def merge_duplicate_recipients(owner_ids=None):
+    """Сервисная функция для слияния дубликатов *Получателей рассылки* - получателей одного владельца, email которых
+    отличается только регистром или пробелами (Foo@x.ru и foo@x.ru). Всё выполняется set-based SQL-запросами в одной
+    транзакции, без загрузки получателей в Python:
+    1) Временная таблица "дубликат → оставляемый получатель" (MIN(id) по группе owner + LOWER(TRIM(email))).
+    2) *Попытки рассылок* дубликатов переносятся на оставляемого получателя.
+    3) Связи рассылок с дубликатами переносятся на оставляемого получателя (INSERT ... ON CONFLICT DO NOTHING - если
+    он уже есть в рассылке), затем связи дубликатов удаляются.
+    4) Дубликаты удаляются, оставшиеся email приводятся к нижнему регистру.
+    5) Счетчики затронутых рассылок пересчитываются, кэш статистики и списков сбрасывается у владельцев, чьи
+    получатели изменились (и при слиянии по всем пользователям).
+    :param owner_ids: список ID пользователей (по умолчанию - все пользователи).
+    :return: пара (количество удаленных дубликатов, количество нормализованных email)."""
+    recipients = Recipient._meta.db_table
+    attempts = Attempt._meta.db_table
+    links = Mailing.recipients.through._meta.db_table
+    owner_filter, params = "", []
+    if owner_ids:
+        owner_filter = f"WHERE owner_id IN ({', '.join(['%s'] * len(owner_ids))})"
+        params = list(owner_ids)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            CREATE TEMPORARY TABLE recipient_merge AS
+            SELECT id AS dup_id, keep_id
+            FROM (
+                SELECT id, MIN(id) OVER (PARTITION BY owner_id, LOWER(TRIM(email))) AS keep_id
+                FROM {recipients} {owner_filter}
+            ) grouped
+            WHERE id <> keep_id
+            """,
+            params,
+        )
+        cursor.execute(
+            f"SELECT DISTINCT mailing_id FROM {links} WHERE recipient_id IN (SELECT dup_id FROM recipient_merge)"
+        )
+        mailing_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            f"SELECT DISTINCT owner_id FROM {recipients} WHERE id IN (SELECT dup_id FROM recipient_merge)"
+        )
+        affected_owner_ids = {row[0] for row in cursor.fetchall()}
+
+        cursor.execute(
+            f"""
+            UPDATE {attempts} SET recipient_id = recipient_merge.keep_id
+            FROM recipient_merge WHERE {attempts}.recipient_id = recipient_merge.dup_id
+            """
+        )
+        # "WHERE true" нужен SQLite, чтобы отличить ON CONFLICT от условия JOIN
+        cursor.execute(
+            f"""
+            INSERT INTO {links} (mailing_id, recipient_id)
+            SELECT DISTINCT link.mailing_id, recipient_merge.keep_id
+            FROM {links} link JOIN recipient_merge ON link.recipient_id = recipient_merge.dup_id
+            WHERE true
+            ON CONFLICT (mailing_id, recipient_id) DO NOTHING
+            """
+        )
+        cursor.execute(f"DELETE FROM {links} WHERE recipient_id IN (SELECT dup_id FROM recipient_merge)")
+        cursor.execute(f"DELETE FROM {recipients} WHERE id IN (SELECT dup_id FROM recipient_merge)")
+        merged = cursor.rowcount
+
+        normalize_filter = f"{owner_filter} AND" if owner_filter else "WHERE"
+        cursor.execute(
+            f"SELECT DISTINCT owner_id FROM {recipients} {normalize_filter} email <> LOWER(TRIM(email))", params
+        )
+        affected_owner_ids.update(row[0] for row in cursor.fetchall())
+        cursor.execute(
+            f"UPDATE {recipients} SET email = LOWER(TRIM(email)) {normalize_filter} email <> LOWER(TRIM(email))",
+            params,
+        )
+        normalized = cursor.rowcount
+        cursor.execute("DROP TABLE recipient_merge")
+
+        if mailing_ids:
+            recount_mailing_counters(Mailing.objects.filter(pk__in=mailing_ids))
+        for owner_id in affected_owner_ids:
+            invalidate_dashboard_stats(owner_id)
+            bump_generation(Recipient, owner_id)
+    return merged, normalized
@@ -0,0 +1,121 @@
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from app_mailing.cache import bump_generation
+from app_mailing.models import (Attempt, Mailing, Message, Recipient, Segment,
+                                Suppression)
+from app_mailing.services import (invalidate_dashboard_stats,
+                                  update_mailing_counters)
+from app_mailing.suppression import invalidate_suppression_filter
+
+
+def _count_links(links):
+    """Количество связей рассылка-получатель по рассылкам: всего и без попыток рассылки по получателю (ожидающие)."""
+    attempted = Attempt.objects.filter(mailing_id=OuterRef("mailing_id"), recipient_id=OuterRef("recipient_id"))
+    rows = links.order_by().values("mailing_id").annotate(
+        total=Count("id"),
+        pending=Count("id", filter=~Exists(attempted)),
+    )
+    return {row["mailing_id"]: (row["total"], row["pending"]) for row in rows}
+
+
+@receiver(m2m_changed, sender=Mailing.recipients.through)
+def update_counters_on_recipients_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Сигнал поддерживает счетчики recipient_count/pending_count Рассылки при изменении списка получателей:
+    - post_add - увеличивает счетчики на количество добавленных связей (Django передает в pk_set только реально
+    добавленные получатели, уже существующие связи не учитываются).
+    - pre_remove / pre_clear - до удаления считает по рассылкам связи, которые действительно будут удалены (в pk_set
+    при remove() есть и ID, которые не были связаны), и сколько из них без попыток рассылки; post_remove /
+    post_clear - уменьшает recipient_count на удаленные связи, а pending_count - только на удаленные связи без
+    попыток (по получателю с попыткой письмо уже не ожидается).
+    Изменения возможны с обеих сторон связи: mailing.recipients.add(...) и recipient.mailings.add(...)."""
+    if action == "post_add":
+        if not reverse:  # instance - это рассылка, pk_set - ID получателей
+            update_mailing_counters(instance.pk, recipient_count=len(pk_set), pending_count=len(pk_set))
+        else:  # instance - это получатель, pk_set - ID рассылок
+            for mailing_id in pk_set:
+                update_mailing_counters(mailing_id, recipient_count=1, pending_count=1)
+
+    elif action in ("pre_remove", "pre_clear"):
+        links = sender.objects.filter(recipient_id=instance.pk) if reverse else sender.objects.filter(
+            mailing_id=instance.pk
+        )
+        if action == "pre_remove":
+            links = links.filter(**{"mailing_id__in" if reverse else "recipient_id__in": pk_set})
+        instance._removed_recipient_links = _count_links(links)
+
+    elif action in ("post_remove", "post_clear"):
+        for mailing_id, (total, pending) in instance.__dict__.pop("_removed_recipient_links", {}).items():
+            update_mailing_counters(mailing_id, recipient_count=-total, pending_count=-pending)
+
+    if action in ("post_add", "post_remove", "post_clear"):
+        # Рассылка и ее получатели принадлежат одному владельцу - сбрасываю кэш его списка рассылок
+        bump_generation(Mailing, instance.owner_id)
+
+
+@receiver(pre_delete, sender=Recipient)
+def update_counters_on_recipient_delete(sender, instance, **kwargs):
+    """Сигнал поддерживает счетчики Рассылок при удалении Получателя. Связи с рассылками и его *Попытки рассылок*
+    удаляются каскадно (без сигнала m2m_changed), поэтому счетчики корректирую заранее, до удаления:
+    - recipient_count уменьшается во всех рассылках получателя.
+    - pending_count уменьшается в тех рассылках, где по получателю еще не было попыток.
+    - success_count/failed_count уменьшаются на количество удаляемых попыток получателя."""
+    mailing_ids = list(
+        Mailing.recipients.through.objects.filter(recipient_id=instance.pk).values_list("mailing_id", flat=True)
+    )
+    attempts = (Attempt.objects
+                .filter(recipient_id=instance.pk)
+                .values("mailing_id", "status")
+                .annotate(n=Count("id"))
+                )
+    attempted_mailing_ids = set()
+
+    for row in attempts:
+        attempted_mailing_ids.add(row["mailing_id"])
+        update_mailing_counters(row["mailing_id"], **{f"{row['status']}_count": -row["n"]})
+
+    for mailing_id in mailing_ids:
+        pending_delta = 0 if mailing_id in attempted_mailing_ids else -1
+        update_mailing_counters(mailing_id, recipient_count=-1, pending_count=pending_delta)
+
+
+@receiver(post_save, sender=Suppression)
+def reset_filter_on_suppression_change(sender, instance, created, **kwargs):
+    """Сигнал сбрасывает фильтр Блума при изменении исключения (например, смене адреса) - старый адрес из фильтра
+    не удалить. Новые исключения фильтр дочитывает из БД сам при следующей отправке (get_suppression_filter)."""
+    if not created:
+        transaction.on_commit(invalidate_suppression_filter)
+
+
+@receiver(post_delete, sender=Suppression)
+def reset_filter_on_suppression_delete(sender, instance, **kwargs):
+    """Сигнал сбрасывает фильтр Блума при удалении исключения (из фильтра нельзя удалить элемент) - при следующей
+    отправке рассылки фильтр будет построен заново."""
+    transaction.on_commit(invalidate_suppression_filter)
+
+
+@receiver(post_save, sender=Mailing)
+@receiver(post_delete, sender=Mailing)
+@receiver(post_save, sender=Recipient)
+@receiver(post_delete, sender=Recipient)
+def invalidate_dashboard_on_change(sender, instance, **kwargs):
+    """Сигнал сбрасывает кэш статистики *Главной страницы* владельца при добавлении, изменении и удалении
+    рассылок и получателей (массовые операции сервисных функций сбрасывают его явно)."""
+    invalidate_dashboard_stats(instance.owner_id)
+
+
+@receiver(post_save, sender=Recipient)
+@receiver(post_delete, sender=Recipient)
+@receiver(post_save, sender=Message)
+@receiver(post_delete, sender=Message)
+@receiver(post_save, sender=Mailing)
+@receiver(post_delete, sender=Mailing)
+@receiver(post_save, sender=Segment)
+@receiver(post_delete, sender=Segment)
+def bump_generation_on_change(sender, instance, **kwargs):
+    """Сигнал сбрасывает кэш страниц со списками владельца (поколение модели, app_mailing/cache.py) при
+    добавлении, изменении и удалении получателей, сообщений, рассылок и сегментов."""
+    bump_generation(sender, instance.owner_id)
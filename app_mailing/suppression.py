@@ -0,0 +1,127 @@
+"""Проверка адресов по *Списку исключений* (модель Suppression) при отправке рассылок.
+
+Проверять каждого получателя запросом к tb_suppression - это лишний запрос к БД на каждое письмо. Поэтому при
+отправке используется фильтр Блума - компактное вероятностное множество всех исключенных адресов:
+- если адреса в фильтре нет - его точно нет в списке исключений (запроса к БД нет);
+- если адрес в фильтре "есть" - это может быть ложное срабатывание, поэтому попадание подтверждается запросом к БД.
+
+Фильтр хранится в кэше (Redis) и общий для всех процессов. Новые исключения (например, жесткие отказы при
+отправке) в кэш по одному не дописываются - это запись всего фильтра (мегабайты) на каждое исключение. Вместо
+этого каждая рассылка один раз загружает фильтр из кэша и дочитывает из БД исключения, добавленные после его
+сохранения (по ID, с запасом SUPPRESSION_FILTER_ID_OVERLAP на транзакции, закоммиченные не по порядку ID), и, если
+что-то добавилось, один раз сохраняет фильтр обратно. При изменении и удалении исключения фильтр сбрасывается и
+при следующей отправке строится заново (из фильтра Блума нельзя удалить элемент)."""
+import hashlib
+import math
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from app_mailing.models import Suppression
+
+SUPPRESSION_FILTER_CACHE_KEY = "suppression:bloom"
+SUPPRESSION_FILTER_TIMEOUT = 60 * 60 * 6  # Раз в 6 часов фильтр строится заново (и под актуальный размер)
+SUPPRESSION_FILTER_ERROR_RATE = 0.001  # Доля ложных срабатываний (каждое стоит одного запроса к БД)
+SUPPRESSION_FILTER_MIN_CAPACITY = 10000
+# Сколько последних ID исключений дочитывается повторно: исключение с меньшим ID может быть закоммичено позже
+# исключения с большим ID (одновременные транзакции) - повторное добавление адреса в фильтр ничего не меняет
+SUPPRESSION_FILTER_ID_OVERLAP = 1000
+GLOBAL_OWNER = "*"  # Метка владельца для глобальных исключений в ключах фильтра
+
+
+class BloomFilter:
+    """Фильтр Блума на битовом массиве (bytearray). Позиции битов вычисляются двойным хешированием
+    (Кирш - Митценмахер) по одному хешу BLAKE2b."""
+
+    def __init__(self, capacity, error_rate=SUPPRESSION_FILTER_ERROR_RATE, bits=None, max_id=0):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # Оптимальный размер массива и количество хеш-функций для заданной емкости и доли ложных срабатываний
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray(bits) if bits is not None else bytearray((self.size + 7) // 8)
+        self.max_id = max_id  # Максимальный ID исключения, уже добавленного в фильтр
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "big"), int.from_bytes(digest[8:], "big") | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def to_dict(self):
+        """Состояние фильтра для хранения в кэше."""
+        return {
+            "capacity": self.capacity,
+            "error_rate": self.error_rate,
+            "bits": bytes(self.bits),
+            "max_id": self.max_id,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["capacity"], data["error_rate"], bits=data["bits"], max_id=data["max_id"])
+
+
+def suppression_key(owner_id, email):
+    """Ключ адреса в фильтре: "<ID владельца>:<email>" или "*:<email>" для глобальных исключений."""
+    return f"{GLOBAL_OWNER if owner_id is None else owner_id}:{email.strip().lower()}"
+
+
+def _add_suppressions(bloom, queryset):
+    """Добавляет исключения из queryset в фильтр (потоком, по возрастанию ID) и сдвигает max_id."""
+    for pk, owner_id, email in queryset.order_by("pk").values_list("pk", "owner_id", "email").iterator():
+        bloom.add(suppression_key(owner_id, email))
+        bloom.max_id = max(bloom.max_id, pk)
+
+
+def build_suppression_filter():
+    """Строит фильтр заново по всей таблице исключений и сохраняет его в кэш."""
+    capacity = max(SUPPRESSION_FILTER_MIN_CAPACITY, Suppression.objects.count() * 2)
+    bloom = BloomFilter(capacity)
+    _add_suppressions(bloom, Suppression.objects.all())
+    cache.set(SUPPRESSION_FILTER_CACHE_KEY, bloom.to_dict(), SUPPRESSION_FILTER_TIMEOUT)
+    return bloom
+
+
+def get_suppression_filter():
+    """Возвращает актуальный фильтр: из кэша (или построенный заново), дополненный исключениями, которые были
+    добавлены после сохранения фильтра в кэш (один запрос по индексу первичного ключа). В кэш фильтр
+    сохраняется, только если в нем появились новые исключения."""
+    data = cache.get(SUPPRESSION_FILTER_CACHE_KEY)
+    if data is None:
+        return build_suppression_filter()
+    bloom = BloomFilter.from_dict(data)
+    max_id = bloom.max_id
+    _add_suppressions(bloom, Suppression.objects.filter(pk__gt=max_id - SUPPRESSION_FILTER_ID_OVERLAP))
+    if bloom.max_id != max_id:
+        cache.set(SUPPRESSION_FILTER_CACHE_KEY, bloom.to_dict(), SUPPRESSION_FILTER_TIMEOUT)
+    return bloom
+
+
+def invalidate_suppression_filter():
+    """Сбрасывает фильтр в кэше (после удаления исключений): он будет построен заново при следующей отправке."""
+    cache.delete(SUPPRESSION_FILTER_CACHE_KEY)
+
+
+class SuppressionChecker:
+    """Проверка получателей одной рассылки по списку исключений: фильтр загружается один раз на рассылку,
+    к БД обращаемся только при попадании в фильтр."""
+
+    def __init__(self, owner_id):
+        self.owner_id = owner_id
+        self.bloom = get_suppression_filter()
+
+    def is_suppressed(self, email):
+        """True, если адрес исключен глобально или владельцем рассылки."""
+        email = email.strip().lower()
+        owner_key = suppression_key(self.owner_id, email) if self.owner_id is not None else None
+        if suppression_key(None, email) not in self.bloom and (owner_key is None or owner_key not in self.bloom):
+            return False
+        # Возможное ложное срабатывание фильтра - подтверждаю по БД
+        return Suppression.objects.filter(Q(owner__isnull=True) | Q(owner_id=self.owner_id), email=email).exists()
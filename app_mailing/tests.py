@@ -1,3 +1,768 @@
-# from django.test import TestCase
+import base64
+import json
+import queue
+import re
+import time
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.forms import modelform_factory
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils.timezone import now
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+
+from app_mailing.cache import (REBUILD_LOCK_KEY, acquire_rebuild_lock,
+                               get_generations)
+from app_mailing.models import (Attempt, Mailing, Message, OwnerDailyStats,
+                                Recipient, Segment, ServerResponse,
+                                Suppression)
+from app_mailing.pagination import KeysetPaginator
+from app_mailing.partitions import (add_months, month_start, partition_name,
+                                    record_attempt_archive)
+from app_mailing.services import (MailingCountersBuffer, get_dashboard_stats,
+                                  get_dashboard_version,
+                                  merge_duplicate_recipients,
+                                  rebuild_daily_stats,
+                                  recount_mailing_counters,
+                                  update_mailing_counters)
+from app_mailing.suppression import (SUPPRESSION_FILTER_CACHE_KEY,
+                                     SuppressionChecker)
+from app_mailing.views import (MailingListView, MessageListView,
+                               RecipientListView)
+from config import routers
+from config.cache_backends import ResilientRedisCache, TwoTierRedisCache
+from users.authz import get_authz
+from users.models import AppUser
+
+
+def clear_caches():
+    """Кэши в памяти процесса живут между тестами - очищаю перед каждым тестом."""
+    for alias in ("default", "hot"):
+        caches[alias].clear()
+
+
+def build_list_view(view_class, user, query=None):
+    """Контроллер списка, подготовленный как при обработке GET-запроса пользователя (без вызова dispatch())."""
+    request = RequestFactory().get("/", query or {})
+    request.user = user
+    request.authz = get_authz(user)
+    view = view_class()
+    view.setup(request)
+    return view
+
+
+def find_full_scans(plan, table_names):
+    """Ищет в тексте плана (результат EXPLAIN) последовательное сканирование наших таблиц.
+    - PostgreSQL: строка вида "Seq Scan on tb_attempt".
+    - SQLite: строка вида "SCAN tb_attempt" без "USING INDEX" / "USING COVERING INDEX"."""
+    full_scans = []
+    for line in plan.splitlines():
+        for table in table_names:
+            if f"Seq Scan on {table}" in line:
+                full_scans.append(line.strip())
+            elif f"SCAN {table}" in line and "USING" not in line:
+                full_scans.append(line.strip())
+    return full_scans
+
+
+def find_sorts(plan):
+    """Ищет в тексте плана сортировку выборки (ORDER BY не по индексу).
+    - PostgreSQL: узел "Sort" или "Incremental Sort".
+    - SQLite: строка "USE TEMP B-TREE FOR ORDER BY" (или "... FOR RIGHT PART OF ORDER BY")."""
+    return [
+        line.strip() for line in plan.splitlines()
+        if re.search(r"\bSort\b", line) or ("TEMP B-TREE" in line and "ORDER BY" in line)
+    ]
+
+
+class FakeRedisBus:
+    """Каналы pub/sub фейкового Redis: сообщение доставляется всем подписчикам канала."""
+
+    def __init__(self):
+        self.subscribers = []
+
+    def publish(self, channel, message):
+        for subscribed_channel, messages in self.subscribers:
+            if subscribed_channel == channel:
+                messages.put({"type": "message", "data": message.encode("utf-8")})
+
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.messages = queue.Queue()
+
+    def subscribe(self, channel):
+        self.redis.bus.subscribers.append((channel, self.messages))
+
+    def get_message(self, timeout=0.0):
+        self.redis.check()
+        try:
+            return self.messages.get(timeout=min(timeout, 0.05))
+        except queue.Empty:
+            self.redis.check()  # Разрыв соединения во время ожидания сообщения
+            return None
+
+
+class FakeRedis:
+    """Фейковый Redis вместо клиента RedisCache (RedisCacheClient): данные в словаре, pub/sub через FakeRedisBus.
+    error - исключение, которым завершается каждое обращение (через latency секунд, как таймаут сокета)."""
+
+    def __init__(self, store=None, bus=None):
+        self.store = {} if store is None else store
+        self.bus = bus or FakeRedisBus()
+        self.calls = 0
+        self.error = None
+        self.latency = 0
+
+    def check(self):
+        if self.error is not None:
+            time.sleep(self.latency)
+            raise self.error
+
+    def call(self):
+        self.calls += 1
+        self.check()
+
+    def get_client(self, write=False):
+        return self
+
+    def pubsub(self, **kwargs):
+        self.check()
+        return FakePubSub(self)
+
+    def publish(self, channel, message):
+        self.call()
+        self.bus.publish(channel, message)
+
+    def get(self, key, default):
+        self.call()
+        return self.store.get(key, default)
+
+    def get_many(self, keys):
+        self.call()
+        return {key: self.store[key] for key in keys if key in self.store}
+
+    def has_key(self, key):
+        self.call()
+        return key in self.store
+
+    def set(self, key, value, timeout):
+        self.call()
+        self.store[key] = value
+
+    def set_many(self, data, timeout):
+        self.call()
+        self.store.update(data)
+
+    def add(self, key, value, timeout):
+        self.call()
+        if key in self.store:
+            return False
+        self.store[key] = value
+        return True
+
+    def touch(self, key, timeout):
+        self.call()
+        return key in self.store
+
+    def incr(self, key, delta):
+        self.call()
+        if key not in self.store:
+            raise ValueError(f"Key '{key}' not found.")
+        self.store[key] += delta
+        return self.store[key]
+
+    def delete(self, key):
+        self.call()
+        return self.store.pop(key, None) is not None
+
+    def delete_many(self, keys):
+        self.call()
+        for key in keys:
+            self.store.pop(key, None)
+
+    def clear(self):
+        self.call()
+        self.store.clear()
+        return True
+
+
+def wait_until(condition, timeout=2):
+    """Ждет выполнения условия (изменения, которые делает фоновый поток-подписчик)."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class QueryPlanTests(TestCase):
+    """Проверка, что "горячие" запросы сервиса используют индексы (EXPLAIN каждого запроса). Запросы списков
+    строятся так же, как их строят контроллеры (get_queryset() + ключ постраничного вывода), поэтому изменение
+    запроса контроллера без подходящего индекса сразу ломает тест."""
+
+    table_names = [model._meta.db_table for model in (Attempt, Mailing, Message, Recipient)]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = AppUser.objects.create_user("owner@example.com", "password")
+        cls.manager = AppUser.objects.create_user("manager@example.com", "password")
+        cls.manager.groups.create(name="Менеджер сервиса")
+
+    def setUp(self):
+        clear_caches()
+
+    def explain(self, queryset):
+        """План запроса (EXPLAIN) в виде текста."""
+        if connection.vendor == "postgresql":
+            with transaction.atomic():
+                # На маленьких (тестовых/пустых) таблицах PostgreSQL честно выберет Seq Scan как самый дешевый.
+                # Отключаю его на время транзакции, чтобы проверить именно наличие подходящего индекса.
+                with connection.cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+                return queryset.explain()
+        # SQLite сопоставляет запрос с индексом по выражению (Coalesce, Case), только если константы выражения -
+        # литералы, а не параметры "?". В PostgreSQL параметры подставляются в текст запроса на стороне клиента
+        # (psycopg), поэтому для такого же плана подставляю их в текст запроса и здесь.
+        sql, params = queryset.query.sql_with_params()
+        sql %= connection.ops._quote_params_for_last_executed_query(params)
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return "\n".join(str(row[-1]) for row in cursor.fetchall())
+
+    def assertUsesIndexes(self, queryset, ordered=False):
+        """Запрос без последовательного сканирования таблиц; ordered=True - и без сортировки выборки (порядок
+        строк дает индекс, страница читается без чтения всей выборки)."""
+        plan = self.explain(queryset)
+        self.assertEqual(find_full_scans(plan, self.table_names), [], plan)
+        if ordered:
+            self.assertEqual(find_sorts(plan), [], plan)
+
+    def list_page_querysets(self, view_class, user):
+        """Запросы первой и следующей страницы списка - как их выполняет KeysetPaginationMixin."""
+        view = build_list_view(view_class, user)
+        paginator = KeysetPaginator(view.get_queryset(), view.keyset_ordering, view.paginate_by)
+        first_page = paginator.queryset.order_by(*paginator.ordering)[:paginator.per_page + 1]
+        values = [now() if name == "end_sort" else 1 for name, _ in paginator.fields]
+        next_page = paginator.queryset.filter(paginator._seek_filter(values, forward=True)).order_by(
+            *paginator.ordering
+        )[:paginator.per_page + 1]
+        return first_page, next_page
+
+    def test_scheduler_due_mailings(self):
+        """Планировщик (scheduler.my_scheduled_job) - частичный индекс mailing_created_due_idx."""
+        self.assertUsesIndexes(Mailing.objects.filter(status="created", first_message_sending__lte=now()))
+
+    def test_stop_mailing_sent_recipients(self):
+        """Остановка рассылки (services.stop_mailing) - индекс attempt_mailing_recipient_idx."""
+        self.assertUsesIndexes(Attempt.objects.filter(mailing_id=1).values_list("recipient_id", flat=True))
+
+    def test_dashboard_mailings(self):
+        """Главная страница (compute_dashboard_stats) - рассылки пользователя по статусу."""
+        self.assertUsesIndexes(Mailing.objects.filter(owner=self.user, status="launched"))
+
+    def test_list_pages(self):
+        """Списки получателей, сообщений и рассылок: первая и следующая страницы пользователя и Менеджера
+        сервиса."""
+        cases = [
+            (RecipientListView, self.user), (RecipientListView, self.manager),
+            (MessageListView, self.user),
+            (MailingListView, self.user), (MailingListView, self.manager),
+        ]
+        for view_class, user in cases:
+            for queryset in self.list_page_querysets(view_class, user):
+                with self.subTest(view=view_class.__name__, user=user.email):
+                    self.assertUsesIndexes(queryset, ordered=True)
+
+
+class MailingCountersSignalTests(TestCase):
+    """Счетчики recipient_count/pending_count Рассылки при изменении списка получателей (app_mailing/signals.py)
+    совпадают с пересчетом из исходных таблиц (recount_mailing_counters)."""
+
+    def setUp(self):
+        clear_caches()
+        self.user = AppUser.objects.create_user("owner@example.com", "password")
+        message = Message.objects.create(message_subject="Тема", message_body="Текст", owner=self.user)
+        self.mailing = Mailing.objects.create(message=message, owner=self.user)
+        self.recipients = [
+            Recipient.objects.create(email=f"r{i}@example.com", owner=self.user) for i in range(4)
+        ]
+        self.mailing.recipients.add(*self.recipients[:3])
+        # По первому получателю уже была попытка рассылки
+        Attempt.objects.create(mailing=self.mailing, recipient=self.recipients[0], status="success", owner=self.user)
+        update_mailing_counters(self.mailing.pk, success_count=1, pending_count=-1)
+
+    def assertCounters(self, recipient_count, pending_count):
+        self.mailing.refresh_from_db()
+        self.assertEqual((self.mailing.recipient_count, self.mailing.pending_count), (recipient_count, pending_count))
+        recount_mailing_counters(Mailing.objects.filter(pk=self.mailing.pk))
+        self.mailing.refresh_from_db()
+        self.assertEqual((self.mailing.recipient_count, self.mailing.pending_count), (recipient_count, pending_count))
+
+    def test_add(self):
+        self.assertCounters(3, 2)
+        self.mailing.recipients.add(self.recipients[0])  # Уже связан - счетчики не меняются
+        self.assertCounters(3, 2)
+
+    def test_remove_counts_only_linked_and_unattempted(self):
+        # Первый получатель с попыткой, четвертый не связан с рассылкой
+        self.mailing.recipients.remove(self.recipients[0], self.recipients[3])
+        self.assertCounters(2, 2)
+
+    def test_reverse_remove(self):
+        self.recipients[1].mailings.remove(self.mailing)
+        self.assertCounters(2, 1)
+
+    def test_clear(self):
+        self.recipients[1].mailings.clear()
+        self.assertCounters(2, 1)
+        self.mailing.recipients.clear()
+        self.assertCounters(0, 0)
+
+
+class AttemptArchiveTests(TestCase):
+    """Пересчеты из исходных таблиц после архивации старой партиции tb_attempt (archive_attempts): счетчики
+    рассылок с архивированными попытками и дневная статистика до границы архива не обнуляются."""
+
+    def setUp(self):
+        self.user = AppUser.objects.create_user("owner@example.com", "password")
+        message = Message.objects.create(message_subject="Тема", message_body="Текст", owner=self.user)
+        recipients = [Recipient.objects.create(email=f"r{i}@example.com", owner=self.user) for i in range(2)]
+        self.old_mailing = Mailing.objects.create(message=message, owner=self.user)
+        self.new_mailing = Mailing.objects.create(message=message, owner=self.user)
+        for mailing in (self.old_mailing, self.new_mailing):
+            mailing.recipients.add(*recipients)
+            for recipient in recipients:
+                Attempt.objects.create(mailing=mailing, recipient=recipient, status="success", owner=self.user)
+            update_mailing_counters(mailing.pk, success_count=2, pending_count=-2)
+
+        # Попытки первой рассылки - два месяца назад, в партиции, которая будет архивирована
+        self.month = add_months(month_start(now()), -2)
+        self.old_time = datetime.combine(self.month, datetime.min.time(), tzinfo=dt_timezone.utc) + timedelta(days=1)
+        Attempt.objects.filter(mailing=self.old_mailing).update(attempt_time=self.old_time)
+        rebuild_daily_stats()
+
+    def archive(self):
+        """Архивация партиции месяца (как archive_attempt_partition в PostgreSQL): строки удалены из tb_attempt,
+        архив записан в AttemptArchive."""
+        attempts = Attempt.objects.filter(attempt_time__lt=self.old_time + timedelta(days=1))
+        mailing_ids = set(attempts.values_list("mailing_id", flat=True))
+        attempts.delete()
+        record_attempt_archive(self.month, partition_name(self.month), "archive.csv.gz", mailing_ids)
+
+    def test_recount_after_archive(self):
+        self.archive()
+        Mailing.objects.filter(pk=self.new_mailing.pk).update(success_count=0)  # Счетчик разошелся с попытками
+        self.assertEqual(recount_mailing_counters(), 1)
+        self.old_mailing.refresh_from_db()
+        self.new_mailing.refresh_from_db()
+        self.assertEqual((self.old_mailing.success_count, self.old_mailing.pending_count), (2, 0))
+        self.assertEqual((self.new_mailing.success_count, self.new_mailing.pending_count), (2, 0))
+
+    def test_rebuild_daily_stats_after_archive(self):
+        stats = {row.day: (row.successful_attempts, row.sent_mailings) for row in OwnerDailyStats.objects.all()}
+        self.archive()
+        rebuild_daily_stats()
+        self.assertEqual(
+            {row.day: (row.successful_attempts, row.sent_mailings) for row in OwnerDailyStats.objects.all()}, stats
+        )
+
+
+class SuppressionFilterTests(TestCase):
+    """Фильтр Блума *Списка исключений* (app_mailing/suppression.py): новые исключения не переписывают фильтр в
+    кэше, а дочитываются из БД при следующей отправке."""
+
+    def setUp(self):
+        clear_caches()
+        self.user = AppUser.objects.create_user("owner@example.com", "password")
+        Suppression.objects.create(email="old@example.com", reason="manual")
+        SuppressionChecker(self.user.pk)  # Фильтр построен и сохранен в кэш
+
+    def test_new_suppressions_are_read_at_next_send(self):
+        cached = caches["default"].get(SUPPRESSION_FILTER_CACHE_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            Suppression.objects.create(email="bounce@example.com", reason="hard_bounce")
+            Suppression.objects.create(owner=self.user, email="own@example.com", reason="manual")
+        self.assertEqual(caches["default"].get(SUPPRESSION_FILTER_CACHE_KEY), cached)
+
+        checker = SuppressionChecker(self.user.pk)
+        self.assertTrue(checker.is_suppressed("Bounce@Example.com"))
+        self.assertTrue(checker.is_suppressed("own@example.com"))
+        self.assertTrue(checker.is_suppressed("old@example.com"))
+        self.assertFalse(checker.is_suppressed("other@example.com"))
+        self.assertFalse(SuppressionChecker(None).is_suppressed("own@example.com"))
+
+    def test_change_resets_filter(self):
+        suppression = Suppression.objects.get(email="old@example.com")
+        suppression.email = "new@example.com"
+        with self.captureOnCommitCallbacks(execute=True):
+            suppression.save()
+        self.assertIsNone(caches["default"].get(SUPPRESSION_FILTER_CACHE_KEY))
+        self.assertFalse(SuppressionChecker(self.user.pk).is_suppressed("old@example.com"))
+
+
+class RecipientEmailTests(TestCase):
+    """Email получателя хранится в нижнем регистре (ограничение recipient_email_lowercase) - адрес в другом
+    регистре нормализуется уже при валидации формы (как в админке), а не отклоняется."""
+
+    def test_model_form_normalizes_email(self):
+        user = AppUser.objects.create_user("owner@example.com", "password")
+        form_class = modelform_factory(Recipient, fields=["email", "full_name", "owner"])
+        form = form_class(data={"email": " Foo@Example.RU ", "full_name": "", "owner": user.pk})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.save().email, "foo@example.ru")
+
+
+class ServerResponseTests(TestCase):
+    """Справочник ответов почтового сервера (ServerResponseManager.get_id_for): ответы, отличающиеся только
+    адресом, ID письма или временем, хранятся одной записью."""
+
+    def setUp(self):
+        ServerResponse.objects.clear_cache()
+
+    def test_errors_differing_by_address_share_row(self):
+        first = ServerResponse.objects.get_id_for(
+            "{'a@example.com': (550, b'5.1.1 <a@example.com>: Recipient address rejected: User unknown')}"
+        )
+        second = ServerResponse.objects.get_id_for(
+            "{'b.c@example.org': (550, b'5.1.1 <b.c@example.org>: Recipient address rejected: User unknown')}"
+        )
+        self.assertEqual(first, second)
+        self.assertEqual(
+            ServerResponse.objects.get(pk=first).text,
+            "{'<email>': (550, b'5.1.1 <email>: Recipient address rejected: User unknown')}",
+        )
+
+    def test_variable_parts(self):
+        self.assertEqual(
+            ServerResponse.objects.get_id_for("250 2.0.0 Ok: queued as 4F3A2B1C0D at 2025-05-01 12:00:01"),
+            ServerResponse.objects.get_id_for("250 2.0.0 Ok: queued as 9E8D7C6B5A at 2025-05-02 08:30:00"),
+        )
+        # Коды ответа различают ответы
+        self.assertNotEqual(
+            ServerResponse.objects.get_id_for("550 5.1.1 User unknown"),
+            ServerResponse.objects.get_id_for("552 5.2.2 User unknown"),
+        )
+
+
+class ReadReplicaTests(TestCase):
+    """Контроллеры на реплике (ReadReplicaMixin): страницы списков открываются, а страница для кэша и статистика
+    главной страницы читаются из основной базы. Если рендер страницы для кэша упал, блокировка пересчета снята."""
+
+    def setUp(self):
+        clear_caches()
+        self.user = AppUser.objects.create_user("owner@example.com", "password")
+        self.client.force_login(self.user)
+        # Страница кэшируется, только если у клиента уже есть CSRF-cookie (get_viewer_cache_key)
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = "a" * 32
+
+    def test_pages_render(self):
+        for name in ("recipient_list_page", "message_list_page", "mailing_list_page", "segment_list_page",
+                     "main_page"):
+            with self.subTest(page=name):
+                self.assertEqual(self.client.get(reverse(f"app_mailing:{name}")).status_code, 200)
+
+    def test_cached_page_is_rebuilt_on_primary(self):
+        with mock.patch("app_mailing.mixins.use_replica", wraps=routers.use_replica) as replica:
+            self.client.get(reverse("app_mailing:mailing_list_page"))  # Пересчет страницы для кэша
+            replica.assert_not_called()
+            del self.client.cookies[settings.CSRF_COOKIE_NAME]
+            self.client.get(reverse("app_mailing:mailing_list_page"))  # Без кэша - на реплике
+            replica.assert_called_once_with()
+
+    def test_rebuild_lock_is_released_when_render_fails(self):
+        with mock.patch("app_mailing.cache.acquire_rebuild_lock", wraps=acquire_rebuild_lock) as acquire, \
+                mock.patch("django.template.response.SimpleTemplateResponse.rendered_content",
+                           new_callable=mock.PropertyMock, side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.get(reverse("app_mailing:mailing_list_page"))
+        key = acquire.call_args.args[0]
+        self.assertIsNone(caches["default"].get(REBUILD_LOCK_KEY.format(key=key)))
+
+    def test_dashboard_stats_are_computed_on_primary(self):
+        used_replica = []
+
+        def compute(owner):
+            used_replica.append(routers._use_replica.get())
+            return {}
+
+        with mock.patch("app_mailing.services.compute_dashboard_stats", compute), routers.use_replica():
+            get_dashboard_stats(self.user)
+        self.assertEqual(used_replica, [False])
+
+
+class MailingListQueriesTests(TestCase):
+    """Количество запросов страницы списка рассылок (MailingListView) не зависит от количества рассылок на
+    странице: сессия, пользователь, его группа и права (5 запросов), страница рассылок (сообщение и сегмент -
+    JOIN-ом) и получатели для popover - один запрос на страницу."""
+
+    def setUp(self):
+        self.user = AppUser.objects.create_user("owner@example.com", "password")
+        self.client.force_login(self.user)
+        self.message = Message.objects.create(message_subject="Тема", message_body="Текст", owner=self.user)
+        self.segment = Segment.objects.create(name="Сегмент", owner=self.user)
+        self.recipients = [
+            Recipient.objects.create(email=f"r{i}@example.com", full_name=f"Получатель {i}", owner=self.user)
+            for i in range(3)
+        ]
+
+    def create_mailings(self, count):
+        for i in range(count):
+            mailing = Mailing.objects.create(
+                message=self.message, segment=self.segment if i % 2 else None, owner=self.user
+            )
+            mailing.recipients.add(*self.recipients)
+
+    def test_queries_do_not_depend_on_page_size(self):
+        for count in (2, 12):
+            with self.subTest(mailings=count):
+                Mailing.objects.all().delete()
+                self.create_mailings(count)
+                clear_caches()
+                with self.assertNumQueries(7):
+                    response = self.client.get(reverse("app_mailing:mailing_list_page"))
+                self.assertEqual(len(response.context["mailings"]), count)
+
+    def test_segment_mailing_popover(self):
+        """Рассылка по сегменту без снимка: получателей сегмента в связи recipients нет - в popover выводится
+        сегмент и количество получателей сверх выбранных явно."""
+        created = Mailing.objects.create(message=self.message, segment=self.segment, owner=self.user)
+        launched = Mailing.objects.create(message=self.message, segment=self.segment, owner=self.user)
+        launched.recipients.add(self.recipients[0])
+        Mailing.objects.filter(pk=launched.pk).update(status="launched", recipient_count=5)
+        clear_caches()
+        response = self.client.get(reverse("app_mailing:mailing_list_page"))
+        mailings = {mailing.pk: mailing for mailing in response.context["mailings"]}
+        self.assertEqual(mailings[created.pk].popover_segment, self.segment)
+        self.assertEqual(mailings[launched.pk].popover_more, 4)
+        self.assertContains(response, "Сегмент «Сегмент» (состав вычисляется при отправке)")
+        self.assertContains(response, "Получатель 0<br>Сегмент «Сегмент»: +4")
+
+
+class KeysetPaginationTests(TestCase):
+    """Постраничный вывод по курсору (KeysetPaginationMixin): поврежденный или подделанный курсор - 404, а не
+    ошибка сервера."""
+
+    def setUp(self):
+        self.user = AppUser.objects.create_user("owner@example.com", "password")
+        self.client.force_login(self.user)
+        Recipient.objects.create(email="r@example.com", full_name="Получатель", owner=self.user)
+
+    def get_page(self, data):
+        cursor = base64.urlsafe_b64encode(json.dumps(data).encode("utf-8")).decode("ascii").rstrip("=")
+        return self.client.get(reverse("app_mailing:recipient_list_page"), {"cursor": cursor})
+
+    def test_valid_cursor(self):
+        self.assertEqual(self.get_page({"d": "n", "v": ["a", 1]}).status_code, 200)
+
+    def test_invalid_cursor(self):
+        cases = [
+            {"d": "n", "v": ["a", "xyz"]},  # Строка вместо id
+            {"d": "n", "v": ["a", [1]]},
+            {"d": "n", "v": ["a", None]},
+            {"d": "n", "v": ["a"]},
+            {"d": "x", "v": ["a", 1]},
+        ]
+        for data in cases:
+            with self.subTest(cursor=data):
+                self.assertEqual(self.get_page(data).status_code, 404)
+        response = self.client.get(reverse("app_mailing:recipient_list_page"), {"cursor": "не base64"})
+        self.assertEqual(response.status_code, 404)
+
+
+class MergeDuplicateRecipientsTests(TestCase):
+    """Слияние дубликатов получателей (merge_duplicate_recipients) сбрасывает кэш статистики и списков у
+    владельцев, чьи получатели изменились, - и при слиянии по всем пользователям (команда без аргументов)."""
+
+    def setUp(self):
+        clear_caches()
+        self.user = AppUser.objects.create_user("owner@example.com", "password")
+        self.other_user = AppUser.objects.create_user("other@example.com", "password")
+        Recipient.objects.create(email="r@example.com", owner=self.user)
+        duplicate = Recipient.objects.create(email="r2@example.com", owner=self.user)
+        # Дубликат, загруженный в БД напрямую (в обход нормализации при сохранении)
+        Recipient.objects.filter(pk=duplicate.pk).update(email=" r@example.com ")
+        Recipient.objects.create(email="r@example.com", owner=self.other_user)
+
+    def get_versions(self, owner_id):
+        return get_dashboard_version(owner_id), get_generations([Recipient], owner_id)[0]
+
+    def test_merge_all_owners_invalidates_affected_owners(self):
+        versions, other_versions = self.get_versions(self.user.pk), self.get_versions(self.other_user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(merge_duplicate_recipients(), (1, 0))
+        self.assertNotEqual(self.get_versions(self.user.pk)[0], versions[0])
+        self.assertNotEqual(self.get_versions(self.user.pk)[1], versions[1])
+        self.assertEqual(self.get_versions(self.other_user.pk), other_versions)
+
+
+class TwoTierRedisCacheTests(TestCase):
+    """Двухуровневый кэш (config/cache_backends.py) поверх фейкового Redis: два "процесса" (узла) с общим Redis
+    и своими первыми уровнями (L1) в памяти."""
+
+    def setUp(self):
+        self.redis = FakeRedis()
+        self.node = self.make_node("node-a")
+        self.other_node = self.make_node("node-b")
+
+    def make_node(self, name):
+        """Кэш отдельного процесса: свой первый уровень (общий для процесса по серверам и каналу) и свой
+        поток-подписчик, Redis и каналы - общие."""
+        node = TwoTierRedisCache(f"redis://{name}-{self.id()}", {"OPTIONS": {"CHANNEL": "test:invalidate"}})
+        node._cache = FakeRedis(self.redis.store, self.redis.bus)
+        return node
+
+    def test_repeated_reads_hit_l1(self):
+        self.node.set("key", 1)
+        self.assertEqual(self.other_node.get("key"), 1)
+        reads = self.other_node._cache.calls
+        self.assertEqual(self.other_node.get("key"), 1)
+        self.assertEqual(self.other_node.get_many(["key"]), {"key": 1})
+        self.assertEqual(self.other_node._cache.calls, reads)
+
+    def test_write_on_other_node_evicts_l1(self):
+        self.node.set("key", 1)
+        self.assertEqual(self.other_node.get("key"), 1)
+        self.node.incr("key")
+        self.assertTrue(wait_until(lambda: self.other_node.get("key") == 2))
+        self.node.delete("key")
+        self.assertTrue(wait_until(lambda: self.other_node.get("key") is None))
+        self.node.set("other", 1)
+        self.assertEqual(self.other_node.get("other"), 1)
+        self.node.clear()
+        self.assertTrue(wait_until(lambda: self.other_node.get("other") is None))
+
+    def test_l1_is_cleared_on_reconnect(self):
+        self.node.set("key", 1)
+        self.assertEqual(self.other_node.get("key"), 1)
+        # Изменение, сообщение о котором потеряно (например, за время разрыва подписки)
+        self.redis.store[self.node.make_key("key")] = 2
+        with self.assertLogs("config.cache_backends", "WARNING") as logs:
+            self.other_node._cache.error = RedisConnectionError("Connection reset by peer")
+            self.assertTrue(wait_until(lambda: logs.records))
+        self.other_node._cache.error = None
+        # Без сброса первого уровня прежнее значение читалось бы из него еще L1_TIMEOUT (5) секунд
+        self.assertTrue(wait_until(lambda: self.other_node.get("key") == 2))
+
+    def test_l1_is_cleared_after_fork(self):
+        self.node.set("key", 1)
+        self.assertEqual(self.other_node.get("key"), 1)
+        self.redis.store[self.node.make_key("key")] = 2
+        # Значения первого уровня, унаследованные дочерним процессом (воркером Gunicorn) от родительского
+        self.other_node._listener["pid"] = None
+        self.assertEqual(self.other_node.get("key"), 2)
+
+
+class CircuitBreakerCacheTests(TestCase):
+    """Кэш на Redis при таймаутах Redis (CircuitBreakerCacheMixin, config/cache_backends.py): работает в памяти
+    процесса, перестает ждать таймаутов после FAILURE_THRESHOLD ошибок, а после восстановления Redis удаляет из
+    него ключи, измененные за время аварии."""
+
+    redis_timeout = 0.05  # Время ожидания ответа Redis до ошибки таймаута (socket_timeout)
+
+    def setUp(self):
+        self.cache = ResilientRedisCache(f"redis://breaker-{self.id()}", {"OPTIONS": {
+            "FAILURE_THRESHOLD": 2,
+            "RECOVERY_TIMEOUT": 0.2,
+            "METRICS_KEY": f"test:metrics:{self.id()}",
+        }})
+        self.redis = self.cache._cache = FakeRedis()
+        self.cache.set("gen", 1)
+
+    def break_redis(self):
+        self.redis.error = RedisTimeoutError("Timeout reading from socket")
+        self.redis.latency = self.redis_timeout
+
+    def repair_redis(self):
+        self.redis.error = None
+        time.sleep(0.2)  # RECOVERY_TIMEOUT - следующее обращение будет пробным
+
+    def test_fallback_and_open_breaker(self):
+        self.break_redis()
+        with self.assertLogs("config.cache_backends", "WARNING"):
+            self.cache.set("gen", 2)
+            self.assertEqual(self.cache.get("gen"), 2)  # Из памяти процесса
+        self.assertEqual(self.cache.breaker.state, "open")
+
+        calls, started = self.redis.calls, time.monotonic()
+        for i in range(20):
+            self.cache.set(f"key{i}", i)
+            self.assertEqual(self.cache.get(f"key{i}"), i)
+        # Пока выключатель разомкнут, Redis не опрашивается - запросы не ждут таймаутов
+        self.assertEqual(self.redis.calls, calls)
+        self.assertLess(time.monotonic() - started, self.redis_timeout)
+
+    def test_recovery_purges_dirty_keys(self):
+        self.cache.set("untouched", 1)
+        self.break_redis()
+        with self.assertLogs("config.cache_backends", "WARNING"):
+            self.cache.set("gen", 2)
+            self.cache.get("gen")
+        self.repair_redis()
+        with self.assertLogs("config.cache_backends", "WARNING") as logs:
+            self.assertFalse(self.cache.has_key("probe"))  # Пробное обращение
+        self.assertIn("сброшено ключей: 1", logs.output[0])
+        self.assertEqual(self.cache.breaker.state, "closed")
+        # В Redis оставалось прежнее значение (без изменения за время аварии) - оно удалено, а не отдается
+        self.assertIsNone(self.cache.get("gen"))
+        self.assertEqual(self.cache.get("untouched"), 1)
+
+    def test_failed_probe_opens_breaker_again(self):
+        self.break_redis()
+        with self.assertLogs("config.cache_backends", "WARNING"):
+            self.cache.get("gen")
+            self.cache.get("gen")
+        time.sleep(0.2)
+        calls = self.redis.calls
+        self.assertIsNone(self.cache.get("gen"))  # Пробное обращение - снова таймаут
+        self.assertEqual((self.redis.calls, self.cache.breaker.state), (calls + 1, "open"))
+
+
+class MainPageConditionalGetTests(TestCase):
+    """Условный GET главной страницы (ETag - версия статистики пользователя): после отправки писем и изменения
+    профиля (email и аватар в меню) браузер получает новую страницу, а не 304."""
+
+    def setUp(self):
+        clear_caches()
+        self.user = AppUser.objects.create_user("owner@example.com", "password")
+        self.client.force_login(self.user)
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = "a" * 32
+        self.url = reverse("app_mailing:main_page")
+
+    def get_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        return response["ETag"]
+
+    def assertPageChanged(self, etag):
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_sent_attempts_change_etag(self):
+        etag = self.get_etag()
+        message = Message.objects.create(message_subject="Тема", message_body="Текст", owner=self.user)
+        mailing = Mailing.objects.create(message=message, owner=self.user)
+        etag = self.get_etag()
+        buffer = MailingCountersBuffer(mailing)
+        buffer.add("success")
+        with self.captureOnCommitCallbacks(execute=True):
+            buffer.flush()
+        self.assertPageChanged(etag)
+
+    def test_profile_change_changes_etag(self):
+        etag = self.get_etag()
+        self.user.email = "new-owner@example.com"
+        self.user.save()
+        self.assertPageChanged(etag)
+        etag = self.get_etag()
+        self.user.avatar = "user_avatar/new.png"
+        self.user.save()
+        self.assertPageChanged(etag)
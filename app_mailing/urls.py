@@ -9,8 +9,14 @@ app_name = AppMailingConfig.name
 urlpatterns = [
     path("recipients/", views.RecipientListView.as_view(), name="recipient_list_page"),
     path("recipients/add/", views.RecipientCreateView.as_view(), name="recipient_add_page"),
+    path("recipients/import/", views.RecipientImportView.as_view(), name="recipient_import_page"),
+    path("recipients/export/", views.RecipientExportView.as_view(), name="recipient_export"),
     path("recipients/<int:pk>/update/", views.RecipientUpdateView.as_view(), name="recipient_update_page"),
     path("recipients/<int:pk>/delete/", views.RecipientDeleteView.as_view(), name="recipient_delete_page"),
+    path("segments/", views.SegmentListView.as_view(), name="segment_list_page"),
+    path("segments/add/", views.SegmentCreateView.as_view(), name="segment_add_page"),
+    path("segments/<int:pk>/update/", views.SegmentUpdateView.as_view(), name="segment_update_page"),
+    path("segments/<int:pk>/delete/", views.SegmentDeleteView.as_view(), name="segment_delete_page"),
     path("messages/", views.MessageListView.as_view(), name="message_list_page"),
     path("messages/add/", views.MessageCreateView.as_view(), name="message_add_page"),
     path("messages/<int:pk>/update/", views.MessageUpdateView.as_view(), name="message_update_page"),
@@ -22,5 +28,7 @@ urlpatterns = [
     path("start-mailing/<int:pk>/", views.SendMailingView.as_view(), name="start_mailing_page"),
     path("stop-mailing/<int:pk>/", views.StopMailingView.as_view(), name="stop_mailing_page"),
     path("mailings/<int:pk>/schedule/", views.ScheduleMailingModalView.as_view(), name="schedule_mailing_page"),
+    path("attempts/export/", views.AttemptExportView.as_view(), name="attempt_export"),
     path("main/", views.MainPageView.as_view(), name="main_page"),
+    path("metrics/cache/", views.CacheMetricsView.as_view(), name="cache_metrics"),
 ]
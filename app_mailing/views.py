@@ -1,44 +1,55 @@
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.core.cache import cache
-from django.http import HttpResponseForbidden
+from django.db.models import Prefetch, ProtectedError, Value
+from django.db.models.functions import Coalesce
+from django.http import (HttpResponseBadRequest, HttpResponseForbidden,
+                         JsonResponse, StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect
-from django.urls import reverse, reverse_lazy
+from django.urls import reverse_lazy
 from django.utils import timezone
-from django.utils.cache import _generate_cache_key
-from django.utils.decorators import method_decorator
 from django.views import generic
-from django.views.decorators.cache import cache_page
 
+from app_mailing.cache import (ConditionalGetMixin, GenerationCacheMixin,
+                               get_cache_scope, get_generations,
+                               get_viewer_cache_key)
 from app_mailing.forms import (AddNewMailingForm, AddNewMessageForm,
-                               AddNewRecipientForm)
-from app_mailing.models import Attempt, Mailing, Message, Recipient
-from app_mailing.services import send_mailing, stop_mailing
+                               AddNewRecipientForm, ImportRecipientsForm,
+                               SegmentForm)
+from app_mailing.mixins import OwnerRequiredMixin, ReadReplicaMixin
+from app_mailing.models import (MAILING_END_SORT, MAILING_STATUS_PRIORITY,
+                                Attempt, Mailing, Message, Recipient, Segment)
+from app_mailing.pagination import KeysetPaginationMixin
+from app_mailing.services import (EXPORT_FORMATS, get_dashboard_stats,
+                                  get_dashboard_version,
+                                  get_mailing_recipients, import_recipients,
+                                  iter_export_rows, send_mailing, stop_mailing)
+from config.cache_backends import get_cache_metrics
 
 # 1. Контроллеры для "Управление клиентами"
 
 
-# Использую декоратор для создания кеша для всей страницы с параметром key_prefix, который потом нужен для
-# сброса кэша страницы при добавлении/редактировании/удалении данных какого-либо объекта (получателя)
-@method_decorator(cache_page(60 * 15, key_prefix="recipients_list"), name="dispatch")
-class RecipientListView(LoginRequiredMixin, generic.ListView):
-    """Представление для отображения списка Получателей рассылки."""
+class RecipientListView(LoginRequiredMixin, GenerationCacheMixin, ReadReplicaMixin, KeysetPaginationMixin,
+                        generic.ListView):
+    """Представление для отображения списка Получателей рассылки (постранично, по курсору)."""
 
     model = Recipient
     template_name = "app_mailing/recipient/recipient_list.html"
     context_object_name = "recipients"
+    cache_models = (Recipient,)
+    # Ключ сортировки страниц: ФИО (пустое ФИО - как пустая строка) + id для уникальности ключа
+    keyset_ordering = ("sort_name", "id")
 
     def get_queryset(self):
-        """1) Сортировка по ФИО (в алфавитном порядке).
+        """1) Сортировка по ФИО (в алфавитном порядке) - ключ постраничного вывода, см. keyset_ordering.
         2) Ограничение данных по owner, т.е. выводим только те данные, где user==owner.
         3) Если пользователь входит в группу 'Менеджер сервиса', то выводим абсолютно все данные из БД."""
-        qs = Recipient.objects.all()
+        qs = Recipient.objects.annotate(sort_name=Coalesce("full_name", Value("")))
 
         # Если у пользователя НЕТ системного разрешения на просмотр всех объектов - показываем только его объекты.
-        if not self.request.user.groups.filter(name="Менеджер сервиса").exists():
-            qs = qs.filter(owner=self.request.user).order_by("full_name")
+        if not self.request.authz.is_manager:
+            qs = qs.filter(owner=self.request.user)
         # Иначе показываем все.
-        return qs.order_by("full_name")
+        return qs
 
 
 class RecipientCreateView(LoginRequiredMixin, generic.CreateView):
@@ -59,47 +70,15 @@ class RecipientCreateView(LoginRequiredMixin, generic.CreateView):
 
     def form_valid(self, form):
         """1) Отправка пользователю уведомления об успешном добавлении нового Получателя в список рассылки.
-        2) Автоматическое заполнение текущим пользователем поля 'owner' при создании нового *Получателя рассылки*.
-        3) Сброс кэша при добавлении нового Получателя."""
+        2) Автоматическое заполнение текущим пользователем поля 'owner' при создании нового *Получателя рассылки*."""
         messages.success(self.request, "Новый получатель успешно добавлен")
 
         form.instance.owner = self.request.user  # Привязываю текущего пользователя как owner
 
-        # Формирую новый объект запроса с путём до списка всех получателей "recipient_list_page".
-        # Сейчас выполняя запрос CreateView мы находимся внутри формы создания нового получателя
-        # (например: /recipients/add/), а значит: self.request.path  ➝  "/mailing/recipients/add/".
-        # Но, необходимо сбросить кэш списка всех получателей (именно в "/mailing/recipients/"), поэтому подменяю путь:
-        # ШАГ 1: Здесь я запрашиваю у Django URL для именованного пути "app_mailing:recipient_list_page", что вернёт
-        # нужную строку "/mailing/recipients/":
-        list_path = reverse("app_mailing:recipient_list_page")
-        # ШАГ 2: Здесь делаю так, чтоб Django временно сделал вид, что текущий запрос был к списку получателей.
-        # Это нужно только на момент вызова _generate_cache_key() - чтобы он сгенерировал правильный ключ кэша
-        # именно для страницы списка, а не формы редактирования:
-        self.request.path = list_path
-        # Далее задача: получить точное имя ключа кэша, по которому Django сохранил страницу "/mailing/recipients/",
-        # то есть список получателей.
-        # Django кэширует не просто по URL, а использует внутренний алгоритм для генерации ключа.
-        # Вызываю внутреннюю Django-функцию _generate_cache_key(), которая создаёт имя кэша, которое Django использует
-        # при сохранении страницы:
-        cache_key = _generate_cache_key(
-            # Передаю наш request - чтобы Django знал, какой путь учитывать при удалении кэша (в этом request.path уже
-            # подменён выше!)
-            request=self.request,
-            # Кэш всегда создаётся для GET-запросов (POST и другие - нет)
-            method="GET",
-            # Если бы у меня были какие-то особые заголовки (Vary: Header), я бы указал их тут. Но нет ничего такого,
-            # поэтому просто передаю пустой список
-            headerlist=[],
-            # Это префикс, который указывал в @cache_page(...) на RecipientListView. Очень важно, чтобы здесь было
-            # точно то же самое. Иначе ключ не совпадёт - и кэш не удалится
-            key_prefix="recipients_list"
-        )
-        cache.delete(cache_key)
-
         return super().form_valid(form)
 
 
-class RecipientUpdateView(LoginRequiredMixin, generic.UpdateView):
+class RecipientUpdateView(LoginRequiredMixin, OwnerRequiredMixin, generic.UpdateView):
     """Представление для редактирования существующего Получателя рассылки."""
 
     model = Recipient
@@ -107,19 +86,10 @@ class RecipientUpdateView(LoginRequiredMixin, generic.UpdateView):
     template_name = "app_mailing/recipient/recipient_add_update.html"
     success_url = reverse_lazy("app_mailing:recipient_list_page")
 
-    def dispatch(self, request, *args, **kwargs):
-        """Метод выполняет проверку прав пользователя на редактирование *Получателя рассылки* (создатель получателя),
-        заранее до выполнения любого запроса (GET, POST и т.д.)."""
-        recipient = get_object_or_404(Recipient, pk=self.kwargs["pk"])
-        if not request.user == recipient.owner:
-            return HttpResponseForbidden(
-                f"У вас нет прав для редактирования Получателя рассылки. Обратитесь к владельцу: {recipient.owner}"
-            )
-        return super().dispatch(request, *args, **kwargs)
+    owner_forbidden_message = "У вас нет прав для редактирования Получателя рассылки."
 
     def form_valid(self, form):
-        """1) Отправка пользователю уведомления об успешном редактировании данных Получателя из списка рассылки.
-        2) Сброс кэша при обновлении данных какого-либо Получателя из списка."""
+        """Отправка пользователю уведомления об успешном редактировании данных Получателя из списка рассылки."""
         response = super().form_valid(form)
 
         # # ВАРИАНТ 1: через параметр самого объекта recipient с получением его через get_object():
@@ -128,41 +98,10 @@ class RecipientUpdateView(LoginRequiredMixin, generic.UpdateView):
         # ВАРИАНТ 2: обращаясь к параметру объекта через саму форму - form.instance.email:
         messages.success(self.request, f"Вы успешно обновили данные клиента: {form.instance.email}")
 
-        # Формирую новый объект запроса с путём до списка всех получателей "recipient_list_page".
-        # Сейчас выполняя запрос UpdateView мы находимся внутри формы редактирования какого-то одного получателя
-        # (например: /mailing/recipients/24/update/), а значит: self.request.path  ➝  "/mailing/recipients/24/update/".
-        # Но, необходимо сбросить кэш списка всех получателей (именно в "/mailing/recipients/"), поэтому подменяю путь:
-        # ШАГ 1: Здесь я запрашиваю у Django URL для именованного пути "app_mailing:recipient_list_page", что вернёт
-        # нужную строку "/mailing/recipients/":
-        list_path = reverse("app_mailing:recipient_list_page")
-        # ШАГ 2: Здесь делаю так, чтоб Django временно сделал вид, что текущий запрос был к списку получателей.
-        # Это нужно только на момент вызова _generate_cache_key() - чтобы он сгенерировал правильный ключ кэша
-        # именно для страницы списка, а не формы редактирования:
-        self.request.path = list_path
-        # Далее задача: получить точное имя ключа кэша, по которому Django сохранил страницу "/mailing/recipients/",
-        # то есть список получателей.
-        # Django кэширует не просто по URL, а использует внутренний алгоритм для генерации ключа.
-        # Вызываю внутреннюю Django-функцию _generate_cache_key(), которая создаёт имя кэша, которое Django использует
-        # при сохранении страницы:
-        cache_key = _generate_cache_key(
-            # Передаю наш request - чтобы Django знал, какой путь учитывать при удалении кэша (в этом request.path уже
-            # подменён выше!)
-            request=self.request,
-            # Кэш всегда создаётся для GET-запросов (POST и другие - нет)
-            method="GET",
-            # Если бы у меня были какие-то особые заголовки (Vary: Header), я бы указал их тут. Но нет ничего такого,
-            # поэтому просто передаю пустой список
-            headerlist=[],
-            # Это префикс, который указывал в @cache_page(...) на RecipientListView. Очень важно, чтобы здесь было
-            # точно то же самое. Иначе ключ не совпадёт - и кэш не удалится
-            key_prefix="recipients_list"
-        )
-        cache.delete(cache_key)
-
         return response
 
 
-class RecipientDeleteView(LoginRequiredMixin, generic.DeleteView):
+class RecipientDeleteView(LoginRequiredMixin, OwnerRequiredMixin, generic.DeleteView):
     """Представление для удаления Получателя рассылки."""
 
     model = Recipient
@@ -170,32 +109,38 @@ class RecipientDeleteView(LoginRequiredMixin, generic.DeleteView):
     context_object_name = "recipient"
     success_url = reverse_lazy("app_mailing:recipient_list_page")
 
-    def dispatch(self, request, *args, **kwargs):
-        """Метод выполняет проверку прав пользователя на удаление *Получателя рассылки* (создатель получателя),
-        заранее до выполнения любого запроса (GET, POST и т.д.)."""
-        recipient = get_object_or_404(Recipient, pk=self.kwargs["pk"])
-        if not request.user == recipient.owner:
-            return HttpResponseForbidden(
-                f"У вас нет прав для удаления Получателя рассылки. Обратитесь к владельцу: {recipient.owner}"
-            )
-        return super().dispatch(request, *args, **kwargs)
+    owner_forbidden_message = "У вас нет прав для удаления Получателя рассылки."
 
     def form_valid(self, form):
-        """1) Отправка пользователю уведомления об успешном удалении Получателя из списка рассылки.
-        2) Сброс кэша при удалении какого-либо Получателя из списка."""
-        recipient = self.get_object()
-
-        messages.success(self.request, f"Вы удалили клиента: {recipient.email}")
-
-        list_path = reverse("app_mailing:recipient_list_page")
-        self.request.path = list_path
-        cache_key = _generate_cache_key(
-            request=self.request,
-            method="GET",
-            headerlist=[],
-            key_prefix="recipients_list"
+        """Отправка пользователю уведомления об успешном удалении Получателя из списка рассылки."""
+        messages.success(self.request, f"Вы удалили клиента: {self.object.email}")
+
+        return super().form_valid(form)
+
+
+class RecipientImportView(LoginRequiredMixin, generic.FormView):
+    """Представление для массового импорта Получателей рассылки из CSV- или NDJSON-файла."""
+
+    form_class = ImportRecipientsForm
+    template_name = "app_mailing/recipient/recipient_import.html"
+    success_url = reverse_lazy("app_mailing:recipient_list_page")
+
+    def form_valid(self, form):
+        """1) Потоковый импорт получателей из загруженного файла (сервисная функция import_recipients).
+        2) Отправка пользователю отчета об импорте: добавлено/обновлено/отклонено и первые ошибки."""
+        report = import_recipients(
+            owner=self.request.user,
+            stream=form.cleaned_data["file"],
+            fmt=form.cleaned_data["file_format"],
         )
-        cache.delete(cache_key)
+
+        messages.success(
+            self.request,
+            f"Импорт завершен: добавлено {report['inserted']}, обновлено {report['updated']}, "
+            f"отклонено {report['rejected']}",
+        )
+        if report["errors"]:
+            messages.warning(self.request, "Отклоненные строки: " + "; ".join(report["errors"]))
 
         return super().form_valid(form)
 
@@ -203,15 +148,15 @@ class RecipientDeleteView(LoginRequiredMixin, generic.DeleteView):
 # 2. Контроллеры для "Управление сообщениями"
 
 
-# Использую декоратор для создания кеша для всей страницы с параметром key_prefix, который потом нужен для
-# сброса кэша страницы при добавлении/редактировании/удалении данных какого-либо объекта (сообщения)
-@method_decorator(cache_page(60 * 15, key_prefix="messages_list"), name="dispatch")
-class MessageListView(LoginRequiredMixin, generic.ListView):
-    """Представление для отображения списка Сообщений для рассылок."""
+class MessageListView(LoginRequiredMixin, GenerationCacheMixin, ReadReplicaMixin, KeysetPaginationMixin,
+                      generic.ListView):
+    """Представление для отображения списка Сообщений для рассылок (постранично, по курсору)."""
 
     model = Message
     template_name = "app_mailing/message/message_list.html"
     context_object_name = "app_messages"
+    cache_models = (Message,)
+    keyset_ordering = ("message_subject", "id")
 
     def get_queryset(self):
         """Ограничение данных по owner, т.е. выводим только те данные, где user==owner."""
@@ -228,26 +173,15 @@ class MessageCreateView(LoginRequiredMixin, generic.CreateView):
 
     def form_valid(self, form):
         """1) Отправка пользователю уведомления об успешном добавлении нового Сообщения в список рассылки.
-        2) Автоматическое заполнение текущим пользователем поля 'owner' при создании нового *Сообщения рассылки*.
-        3) Сброс кэша при добавлении нового Сообщения."""
+        2) Автоматическое заполнение текущим пользователем поля 'owner' при создании нового *Сообщения рассылки*."""
         messages.success(self.request, "Новое сообщение успешно добавлено")
 
         form.instance.owner = self.request.user  # Привязываю текущего пользователя как owner
 
-        list_path = reverse("app_mailing:message_list_page")
-        self.request.path = list_path
-        cache_key = _generate_cache_key(
-            request=self.request,
-            method="GET",
-            headerlist=[],
-            key_prefix="messages_list"
-        )
-        cache.delete(cache_key)
-
         return super().form_valid(form)
 
 
-class MessageUpdateView(LoginRequiredMixin, generic.UpdateView):
+class MessageUpdateView(LoginRequiredMixin, OwnerRequiredMixin, generic.UpdateView):
     """Представление для редактирования существующего Сообщения рассылки."""
 
     model = Message
@@ -255,37 +189,18 @@ class MessageUpdateView(LoginRequiredMixin, generic.UpdateView):
     template_name = "app_mailing/message/message_add_update.html"
     success_url = reverse_lazy("app_mailing:message_list_page")
 
-    def dispatch(self, request, *args, **kwargs):
-        """Метод выполняет проверку прав пользователя на редактирование *Сообщения рассылки* (создатель сообщения),
-        заранее до выполнения любого запроса (GET, POST и т.д.)."""
-        message = get_object_or_404(Message, pk=self.kwargs["pk"])
-        if not request.user == message.owner:
-            return HttpResponseForbidden(
-                f"У вас нет прав для редактирования Сообщения рассылки. Обратитесь к владельцу: {message.owner}"
-            )
-        return super().dispatch(request, *args, **kwargs)
+    owner_forbidden_message = "У вас нет прав для редактирования Сообщения рассылки."
 
     def form_valid(self, form):
-        """1) Отправка пользователю уведомления об успешном редактировании данных Сообщения из списка рассылки.
-        2) Сброс кэша при обновлении данных какого-либо Сообщения из списка."""
+        """Отправка пользователю уведомления об успешном редактировании данных Сообщения из списка рассылки."""
         response = super().form_valid(form)
 
         messages.success(self.request, f"Вы успешно обновили данные сообщения: {form.instance.id}")
 
-        list_path = reverse("app_mailing:message_list_page")
-        self.request.path = list_path
-        cache_key = _generate_cache_key(
-            request=self.request,
-            method="GET",
-            headerlist=[],
-            key_prefix="messages_list"
-        )
-        cache.delete(cache_key)
-
         return response
 
 
-class MessageDeleteView(LoginRequiredMixin, generic.DeleteView):
+class MessageDeleteView(LoginRequiredMixin, OwnerRequiredMixin, generic.DeleteView):
     """Представление для удаления Сообщения рассылки."""
 
     model = Message
@@ -293,87 +208,83 @@ class MessageDeleteView(LoginRequiredMixin, generic.DeleteView):
     context_object_name = "app_message"
     success_url = reverse_lazy("app_mailing:message_list_page")
 
-    def dispatch(self, request, *args, **kwargs):
-        """Метод выполняет проверку прав пользователя на удаление *Сообщения рассылки* (создатель сообщения),
-        заранее до выполнения любого запроса (GET, POST и т.д.)."""
-        message = get_object_or_404(Message, pk=self.kwargs["pk"])
-        if not request.user == message.owner:
-            return HttpResponseForbidden(
-                f"У вас нет прав для удаления Сообщения рассылки. Обратитесь к владельцу: {message.owner}"
-            )
-        return super().dispatch(request, *args, **kwargs)
+    owner_forbidden_message = "У вас нет прав для удаления Сообщения рассылки."
 
     def form_valid(self, form):
-        """1) Отправка пользователю уведомления об успешном удалении Сообщения из списка рассылки.
-        2) Сброс кэша при удалении какого-либо Сообщения из списка."""
+        """Отправка пользователю уведомления об успешном удалении Сообщения из списка рассылки."""
         messages.success(self.request, "Вы удалили сообщение.")
 
-        list_path = reverse("app_mailing:message_list_page")
-        self.request.path = list_path
-        cache_key = _generate_cache_key(
-            request=self.request,
-            method="GET",
-            headerlist=[],
-            key_prefix="messages_list"
-        )
-        cache.delete(cache_key)
-
         return super().form_valid(form)
 
 
 # 3. Контроллеры для "Управление рассылками"
 
 
-# Использую декоратор для создания кеша для всей страницы с параметром key_prefix, который потом нужен для
-# сброса кэша страницы при редактировании/изменении данных какого-либо объекта (рассылки)
-@method_decorator(cache_page(60 * 15, key_prefix="mailings_list"), name="dispatch")
-class MailingListView(LoginRequiredMixin, generic.ListView):
-    """Представление для отображения списка Рассылок."""
+class MailingListView(LoginRequiredMixin, GenerationCacheMixin, ReadReplicaMixin, KeysetPaginationMixin,
+                      generic.ListView):
+    """Представление для отображения списка Рассылок (постранично, по курсору)."""
 
     model = Mailing
     template_name = "app_mailing/mailing/mailing_list.html"
     context_object_name = "mailings"
+    # На странице выводятся тема сообщения, сегмент и ФИО получателей рассылки - кэш зависит и от этих моделей
+    cache_models = (Mailing, Message, Segment, Recipient)
+    # Ключ сортировки страниц: статус (запущена → создана → завершена), дата окончания по убыванию (без даты - в
+    # конце статуса), id. Ключ совпадает с индексами mailing_owner_list_idx/mailing_list_idx - и сортировка, и
+    # условие курсора выполняются по индексу (тема сообщения в ключе - это JOIN и сортировка всей выборки)
+    keyset_ordering = ("status_priority", "-end_sort", "id")
+    popover_recipients_limit = 10  # Сколько ФИО получателей показывать в popover (остальные - "+k еще")
+    row_cache_timeout = 60 * 15  # Сколько хранить в кэше отрендеренную строку таблицы рассылок
+    # На странице есть текущее время (минимальная дата в окне планирования) - ETag живет не дольше кэша страницы
+    etag_lifetime = 60 * 15
 
     def get_queryset(self):
-        """1) Сортировка по статусу Рассылки: запущена → создана → завершена, внутри по дате окончания.
+        """1) Сортировка по статусу Рассылки: запущена → создана → завершена, внутри по дате окончания - в БД,
+        выражениями MAILING_STATUS_PRIORITY и MAILING_END_SORT (по ним построены индексы), см. keyset_ordering.
         2) Ограничение данных по owner, т.е. выводим только те данные, где user==owner.
         3) Если пользователь входит в группу 'Менеджер сервиса', то выводим абсолютно все данные из БД."""
-        # Определяю порядок статусов
-        status_order = {
-            "launched": 0,
-            "created": 1,
-            "accomplished": 2,
-        }
-
-        # Получаю весь объем данных из БД
-        qs = Mailing.objects.all()
-
-        def sort_key(mailing):
-            # Получаю приоритет статуса (если статус не найден - ставлю 3, чтоб он был точно в самом конце списка)
-            status_priority = status_order.get(mailing.status, 3)
-            # Получаю timestamp окончания рассылки с преобразованием времени в секунды
-            # для оптимизации процесса сравнения (если None - то ставлю 0)
-            if mailing.end_message_sending:
-                timestamp = mailing.end_message_sending.timestamp()
-            else:
-                timestamp = 0
-            return (status_priority, -timestamp)  # Возвращаю кортеж: сначала статус, потом минус время (для убывания)
+        # Сообщение и сегмент - сразу JOIN-ом (выводятся в списке), количество получателей - денормализованный счетчик
+        # recipient_count, а для popover одним запросом на страницу подгружаю только первых получателей каждой рассылки
+        # (Prefetch со срезом - оконная функция в БД), а не всех получателей.
+        popover_recipients = Recipient.objects.only("id", "full_name").order_by("email", "id")
+        qs = Mailing.objects.select_related("message", "segment").prefetch_related(
+            Prefetch(
+                "recipients",
+                queryset=popover_recipients[:self.popover_recipients_limit],
+                to_attr="popover_recipients",
+            )
+        ).annotate(
+            status_priority=MAILING_STATUS_PRIORITY,
+            end_sort=MAILING_END_SORT,
+        )
 
         # Если у пользователя НЕТ системного разрешения на просмотр всех объектов - показываем только его объекты.
-        if not self.request.user.groups.filter(name="Менеджер сервиса").exists():
-            # 1) Выбираю с помощью фильтра данные, где пользователь является владельцем (owner=self.request.user)
-            # 2) Сортирую с помощью созданного sort_key() и возвращаю отсортированный список
-            sorted_mailings = sorted(qs.filter(owner=self.request.user), key=sort_key)
-            return sorted_mailings
-            # Иначе показываем все с сортировкой с помощью созданного sort_key()
-        sorted_mailings = sorted(qs, key=sort_key)
-        return sorted_mailings
+        if not self.request.authz.is_manager:
+            qs = qs.filter(owner=self.request.user)
+        # Иначе показываем все.
+        return qs
 
     def get_context_data(self, **kwargs):
-        """Добавление в контекст шаблона текущую дату и время, чтобы потом
-        использовать её в *min="{{now|date:'Y-m-d/TH:i'}}"* в шаблоне *mailing_list.html*"""
+        """1) Добавление в контекст шаблона текущую дату и время, чтобы потом
+        использовать её в *min="{{now|date:'Y-m-d/TH:i'}}"* в шаблоне *mailing_list.html* (один раз на страницу,
+        вне кэшируемых строк таблицы).
+        2) Для каждой рассылки - сколько получателей не поместилось в popover (popover_more) и сегмент для popover
+        (popover_segment): получатели рассылки по сегменту без снимка (или до запуска) не хранятся в связи
+        recipients, поэтому вместо их ФИО в popover выводится сегмент.
+        3) Параметры кэша строк таблицы: ключ строки - id и updated_at рассылки + row_cache_vary (пользователь, его
+        права и CSRF-секрет, поколения сообщений, сегментов и получателей, выводимых в строке). Без CSRF-cookie
+        строки не кэшируются (row_cache_timeout=0)."""
         context = super().get_context_data(**kwargs)
         context["now"] = timezone.now()  # добавлено: текущая дата и время
+        for mailing in context["mailings"]:
+            mailing.popover_more = mailing.recipient_count - len(mailing.popover_recipients)
+            snapshot_taken = mailing.snapshot_recipients and mailing.status != "created"
+            mailing.popover_segment = mailing.segment if mailing.segment_id and not snapshot_taken else None
+
+        viewer = get_viewer_cache_key(self.request)
+        generations = get_generations((Message, Segment, Recipient), get_cache_scope(self.request))
+        context["row_cache_vary"] = f"{viewer}:{'.'.join(str(generation) for generation in generations)}"
+        context["row_cache_timeout"] = self.row_cache_timeout if viewer else 0
         return context
 
 
@@ -394,26 +305,15 @@ class MailingCreateView(LoginRequiredMixin, generic.CreateView):
 
     def form_valid(self, form):
         """1) Отправка пользователю уведомления об успешном добавлении новой Рассылки в список.
-        2) Автоматическое заполнение текущим пользователем поля 'owner' при создании нового *Рассылки*.
-        3) Сброс кэша при добавлении новой Рассылки."""
+        2) Автоматическое заполнение текущим пользователем поля 'owner' при создании нового *Рассылки*."""
         messages.success(self.request, "Новая рассылка успешно добавлена")
 
         form.instance.owner = self.request.user  # Привязываю текущего пользователя как owner
 
-        list_path = reverse("app_mailing:mailing_list_page")
-        self.request.path = list_path
-        cache_key = _generate_cache_key(
-            request=self.request,
-            method="GET",
-            headerlist=[],
-            key_prefix="mailings_list"
-        )
-        cache.delete(cache_key)
-
         return super().form_valid(form)
 
 
-class MailingUpdateView(LoginRequiredMixin, generic.UpdateView):
+class MailingUpdateView(LoginRequiredMixin, OwnerRequiredMixin, generic.UpdateView):
     """Представление для редактирования существующей Рассылки в списке."""
 
     model = Mailing
@@ -421,15 +321,7 @@ class MailingUpdateView(LoginRequiredMixin, generic.UpdateView):
     template_name = "app_mailing/mailing/mailing_add_update.html"
     success_url = reverse_lazy("app_mailing:mailing_list_page")
 
-    def dispatch(self, request, *args, **kwargs):
-        """Метод выполняет проверку прав пользователя на редактирование *Рассылки* (создатель рассылки),
-        заранее до выполнения любого запроса (GET, POST и т.д.)."""
-        mailing = get_object_or_404(Mailing, pk=self.kwargs["pk"])
-        if not request.user == mailing.owner:
-            return HttpResponseForbidden(
-                f"У вас нет прав для редактирования Рассылки. Обратитесь к владельцу: {mailing.owner}"
-            )
-        return super().dispatch(request, *args, **kwargs)
+    owner_forbidden_message = "У вас нет прав для редактирования Рассылки."
 
     def get_form_kwargs(self):
         """Метод для передачи request.user в форму для дальнейшего ограничения выбора доступных объектов из БД
@@ -439,26 +331,15 @@ class MailingUpdateView(LoginRequiredMixin, generic.UpdateView):
         return kwargs
 
     def form_valid(self, form):
-        """1) Отправка пользователю уведомления об успешном редактировании данных Рассылки из списка.
-        2) Сброс кэша при обновлении данных какой-либо Рассылки из списка."""
+        """Отправка пользователю уведомления об успешном редактировании данных Рассылки из списка."""
         response = super().form_valid(form)
 
         messages.success(self.request, f"Вы успешно обновили данные рассылки: {form.instance.id}")
 
-        list_path = reverse("app_mailing:mailing_list_page")
-        self.request.path = list_path
-        cache_key = _generate_cache_key(
-            request=self.request,
-            method="GET",
-            headerlist=[],
-            key_prefix="mailings_list"
-        )
-        cache.delete(cache_key)
-
         return response
 
 
-class MailingDeleteView(LoginRequiredMixin, generic.DeleteView):
+class MailingDeleteView(LoginRequiredMixin, OwnerRequiredMixin, generic.DeleteView):
     """Представление для удаления Рассылки."""
 
     model = Mailing
@@ -466,31 +347,12 @@ class MailingDeleteView(LoginRequiredMixin, generic.DeleteView):
     context_object_name = "mailing"
     success_url = reverse_lazy("app_mailing:mailing_list_page")
 
-    def dispatch(self, request, *args, **kwargs):
-        """Метод выполняет проверку прав пользователя на удаление *Рассылки* (создатель рассылки),
-        заранее до выполнения любого запроса (GET, POST и т.д.)."""
-        mailing = get_object_or_404(Mailing, pk=self.kwargs["pk"])
-        if not request.user == mailing.owner:
-            return HttpResponseForbidden(
-                f"У вас нет прав для удаления Рассылки. Обратитесь к владельцу: {mailing.owner}"
-            )
-        return super().dispatch(request, *args, **kwargs)
+    owner_forbidden_message = "У вас нет прав для удаления Рассылки."
 
     def form_valid(self, form):
-        """1) Отправка пользователю уведомления об успешном удалении Рассылки.
-        2) Сброс кэша при удалении какой-либо Рассылки из списка."""
+        """Отправка пользователю уведомления об успешном удалении Рассылки."""
         messages.success(self.request, "Вы удалили рассылку")
 
-        list_path = reverse("app_mailing:mailing_list_page")
-        self.request.path = list_path
-        cache_key = _generate_cache_key(
-            request=self.request,
-            method="GET",
-            headerlist=[],
-            key_prefix="mailings_list"
-        )
-        cache.delete(cache_key)
-
         return super().form_valid(form)
 
 
@@ -502,21 +364,10 @@ class SendMailingView(LoginRequiredMixin, generic.View):
         """1) Метод запускает сервисную функцию *send_mailing()* из services.py, которая:
             - отправляет email всем получателям в выбранной *Рассылке*.
             - фиксирует *Попытки рассылок* по каждому получателю.
-        2) Сброс кэша при запуске какой-либо Рассылки из списка.
-        3) Информирование пользователя об успешном запуске Рассылки."""
+        2) Информирование пользователя об успешном запуске Рассылки."""
         mailing = get_object_or_404(Mailing, pk=pk)
         send_mailing(request, mailing)
 
-        list_path = reverse("app_mailing:mailing_list_page")
-        request.path = list_path
-        cache_key = _generate_cache_key(
-            request=request,
-            method="GET",
-            headerlist=[],
-            key_prefix="mailings_list"
-        )
-        cache.delete(cache_key)
-
         messages.success(request, "Рассылка была успешно запущена.")
         return redirect("app_mailing:mailing_list_page")
 
@@ -530,23 +381,12 @@ class StopMailingView(LoginRequiredMixin, generic.View):
             - завершает рассылку.
             - фиксирует "неудачные" попытки рассылки по оставшимся получателям.
             - возвращает пользователя на список рассылок.
-        2) Сброс кэша при остановке какой-либо Рассылки из списка.
-        3) Информирование пользователя об успешной остановке запущенной ранее Рассылки."""
+        2) Информирование пользователя об успешной остановке запущенной ранее Рассылки."""
         mailing = get_object_or_404(Mailing, pk=pk)
         if request.user != mailing.owner:
             return HttpResponseForbidden("Вы не можете останавливать чужую рассылку.")
         stop_mailing(mailing, reason="Пользователь вручную остановил рассылку")
 
-        list_path = reverse("app_mailing:mailing_list_page")
-        request.path = list_path
-        cache_key = _generate_cache_key(
-            request=request,
-            method="GET",
-            headerlist=[],
-            key_prefix="mailings_list"
-        )
-        cache.delete(cache_key)
-
         messages.success(request, "Рассылка была успешно остановлена.")
         return redirect("app_mailing:mailing_list_page")
 
@@ -559,7 +399,6 @@ class ScheduleMailingModalView(LoginRequiredMixin, generic.View):
         - Переводит рассылку в статус "created" (готова к отправке).
         - Планировщик APScheduler обработает эту рассылку в нужный момент.
         - Выполняется проверка прав (только владелец рассылки может её планировать).
-        - Очищает кеш списка рассылок для мгновенного отображения изменений.
         - Показывает пользователю уведомление об успехе или ошибке."""
         mailing = get_object_or_404(Mailing, pk=pk)
 
@@ -570,18 +409,12 @@ class ScheduleMailingModalView(LoginRequiredMixin, generic.View):
         # Проверка: уже запущена или завершена
         if mailing.status != "created" and mailing.first_message_sending:
             messages.warning(request, "Эта рассылка уже была запланирована или отправлена.")
-            # ВАЖНО! Чтобы messages.warning(...) не "залипал" из-за кэширования страницы и корректно отображался
-            # на странице, нам нужно вместо стандартного *return redirect("app_mailing:mailing_list_page")*
-            # написать редирект на URL с ***?nocache={{ timestamp }}***, чтобы обойти @cache_page
-            return redirect(f"{reverse('app_mailing:mailing_list_page')}?nocache={timezone.now().timestamp()}")
+            return redirect("app_mailing:mailing_list_page")
 
         # Проверка: есть ли получатели
-        if not mailing.recipients.exists():
+        if not get_mailing_recipients(mailing).exists():
             messages.warning(request, "У этой рассылки нет получателей.")
-            # ВАЖНО! Чтобы messages.warning(...) не "залипал" из-за кэширования страницы и корректно отображался
-            # на странице, нам нужно вместо стандартного *return redirect("app_mailing:mailing_list_page")*
-            # написать редирект на URL с ***?nocache={{ timestamp }}***, чтобы обойти @cache_page
-            return redirect(f"{reverse('app_mailing:mailing_list_page')}?nocache={timezone.now().timestamp()}")
+            return redirect("app_mailing:mailing_list_page")
 
         # Получение даты из формы
         first_message_sending = request.POST.get("first_message_sending")
@@ -589,17 +422,8 @@ class ScheduleMailingModalView(LoginRequiredMixin, generic.View):
         if first_message_sending:
             mailing.first_message_sending = first_message_sending
             mailing.status = "created"
-            mailing.save()
-
-            list_path = reverse("app_mailing:mailing_list_page")
-            request.path = list_path
-            cache_key = _generate_cache_key(
-                request=request,
-                method="GET",
-                headerlist=[],
-                key_prefix="mailings_list"
-            )
-            cache.delete(cache_key)
+            # Сохраняю только изменённые поля, чтоб не затереть счетчики рассылки, обновляемые через F()-выражения
+            mailing.save(update_fields=["first_message_sending", "status", "updated_at"])
 
             messages.success(
                 request,
@@ -608,62 +432,191 @@ class ScheduleMailingModalView(LoginRequiredMixin, generic.View):
         else:
             messages.error(request, "Не указана дата и время!")
 
-        # ВАЖНО! Чтобы messages.success(...) не "залипал" из-за кэширования страницы и корректно отображался
-        # на странице, нам нужно вместо стандартного *return redirect("app_mailing:mailing_list_page")*
-        # написать редирект на URL с ***?nocache={{ timestamp }}***, чтобы обойти @cache_page
-        return redirect(f"{reverse('app_mailing:mailing_list_page')}?nocache={timezone.now().timestamp()}")
+        return redirect("app_mailing:mailing_list_page")
 
 
 # 4. Контроллеры для "Главная страница"
 
 
-class MainPageView(LoginRequiredMixin, generic.TemplateView):
-    """Представление для отображения *Главной страницы* со статистикой рассылок."""
+class MainPageView(LoginRequiredMixin, ConditionalGetMixin, ReadReplicaMixin, generic.TemplateView):
+    """Представление для отображения *Главной страницы* со статистикой рассылок. Версия страницы для условного GET
+    (ETag) - версия статистики пользователя: пока статистика не изменилась, браузер получает 304."""
 
     template_name = "app_mailing/main/main.html"
 
+    def get_cache_version(self, request):
+        return get_dashboard_version(request.user.pk)
+
     def get_context_data(self, **kwargs):
         """Добавляем в контекст данные для отображения на *Главной странице*.
         ЧАСТЬ 1: Основная статистика по рассылкам из Mailing и получателям из Recipient:
             - Общее количество рассылок.
             - Количество активных рассылок (статус 'Запущена') + количество получателей именно по активным рассылкам.
             - Общее количество уникальных получателей.
-        ЧАСТЬ 2: Статистика по отправкам из Attempt:
+        ЧАСТЬ 2: Статистика по отправкам из OwnerDailyStats (агрегаты по Attempt за каждый день):
             - Количество успешных попыток рассылок.
             - Количество неуспешных попыток рассылок.
             - Общее количество отправленных сообщений + сколько из них именно уникальных текстов сообщений."""
         context = super().get_context_data(**kwargs)
+        # Вся статистика считается условными агрегатами (по одному запросу к таблице) и хранится в кэше одним
+        # объектом на пользователя - см. get_dashboard_stats() в services.py
+        stats, self.rendered_version = get_dashboard_stats(self.request.user, with_version=True)
+        context.update(stats)
+        return context
 
-        user = self.request.user  # Определил в переменную нашего владельца, чтоб ниже просто указывать "owner=user"
-
-        # ЧАСТЬ 1: Основная статистика по рассылкам из Mailing и получателям из Recipient
-        launched_mailings = Mailing.objects.filter(status="launched", owner=user)
-        # Кол-во всех существующих рассылок во всех статусах
-        context["total_mailings"] = Mailing.objects.filter(owner=user).count()
-        # Кол-во активных рассылок + подсчет итогового кол-ва получателей именно по активным рассылкам
-        context["active_mailings"] = launched_mailings.count()
-        context["active_recipients_count"] = sum(m.recipients.count() for m in launched_mailings)
-        # Кол-во всех получателей
-        context["unique_recipients"] = Recipient.objects.filter(owner=user).count()
-
-        # ЧАСТЬ 2: Статистика по отправкам из Attempt
-        successful_attempts = Attempt.objects.filter(status="success", owner=user).count()
-        failed_attempts = Attempt.objects.filter(status="failed", owner=user).count()
-        # Кол-во успешных попыток рассылок
-        context["successful_attempts"] = successful_attempts
-        # Кол-во неуспешных попыток рассылок
-        context["failed_attempts"] = failed_attempts
-        # Кол-во отправленных сообщений + сколько из них именно уникальных текстов сообщений (например, мы можем
-        # отправить 25 сообщений, но эти сообщения только по двум тематикам из "Сообщения")
-        # !!!! Технически для подсчета уникальных сообщений можно использовать distinct("mailing_id"), но это работает
-        # !!!! только в PostgreSQL. ЛУЧШЕ АЛЬТЕРНАТИВНОЕ РЕШЕНИЕ: использовать .values("mailing").distinct().count()
-        # !!!! потому что это работает во всех БД, что важно для поддержания кросс-базовой совместимости:
-        context["total_sent_messages"] = successful_attempts + failed_attempts
-        context["unique_sent_messages"] = (Attempt.objects
-                                           .filter(owner=user)
-                                           .values("mailing")
-                                           .distinct()
-                                           .count()
-                                           )
 
-        return context
+# 5. Контроллеры для "Экспорт данных"
+
+
+class ExportView(LoginRequiredMixin, ReadReplicaMixin, generic.View):
+    """Базовое представление для потоковой выгрузки данных в CSV или NDJSON (?format=csv|ndjson).
+    Ответ формируется генератором (StreamingHttpResponse) поверх .iterator(), поэтому память процесса не растет
+    с количеством строк. Данные ограничены владельцем, как в списках; Менеджер сервиса выгружает все данные."""
+
+    model = None
+    columns = []  # Пары (поле/lookup для values_list, заголовок колонки)
+    filename = None
+
+    def get_queryset(self):
+        """Ограничение данных по owner (кроме группы 'Менеджер сервиса')."""
+        qs = self.model.objects.all()
+        if not self.request.authz.is_manager:
+            qs = qs.filter(owner=self.request.user)
+        return qs.order_by("pk")
+
+    def get(self, request, *args, **kwargs):
+        """Отдает выгрузку как вложение с именем <filename>-<дата>.<формат>."""
+        fmt = request.GET.get("format", "csv")
+        if fmt not in EXPORT_FORMATS:
+            return HttpResponseBadRequest(f"Неподдерживаемый формат выгрузки: {fmt}")
+
+        response = StreamingHttpResponse(
+            iter_export_rows(self.get_queryset(), self.columns, fmt),
+            content_type=f"{EXPORT_FORMATS[fmt]}; charset=utf-8",
+        )
+        response["Content-Disposition"] = f'attachment; filename="{self.filename}-{timezone.localdate():%Y%m%d}.{fmt}"'
+        # Просим nginx буферизовать ответ целиком (в т.ч. во временный файл): воркер Gunicorn освобождается, как только
+        # данные переданы в nginx, а не когда их скачает медленный клиент
+        response["X-Accel-Buffering"] = "yes"
+        return response
+
+
+class RecipientExportView(ExportView):
+    """Представление для выгрузки Получателей рассылки."""
+
+    model = Recipient
+    columns = [
+        ("id", "id"),
+        ("email", "email"),
+        ("full_name", "full_name"),
+        ("comment", "comment"),
+    ]
+    filename = "recipients"
+
+
+class AttemptExportView(ExportView):
+    """Представление для выгрузки Попыток рассылок (с темой сообщения, email получателя и ответом сервера)."""
+
+    model = Attempt
+    columns = [
+        ("id", "id"),
+        ("attempt_time", "attempt_time"),
+        ("status", "status"),
+        ("mailing_id", "mailing_id"),
+        ("mailing__message__message_subject", "message_subject"),
+        ("recipient__email", "recipient_email"),
+        ("response__text", "server_response"),
+    ]
+    filename = "attempts"
+
+
+# 6. Контроллеры для "Сегменты получателей"
+
+
+class SegmentListView(LoginRequiredMixin, ReadReplicaMixin, generic.ListView):
+    """Представление для отображения списка Сегментов получателей пользователя."""
+
+    model = Segment
+    template_name = "app_mailing/segment/segment_list.html"
+    context_object_name = "segments"
+
+    def get_queryset(self):
+        """Ограничение данных по owner, т.е. выводим только те данные, где user==owner."""
+        return Segment.objects.filter(owner=self.request.user)
+
+
+class SegmentCreateView(LoginRequiredMixin, generic.CreateView):
+    """Представление для добавления нового Сегмента получателей."""
+
+    model = Segment
+    form_class = SegmentForm
+    template_name = "app_mailing/segment/segment_add_update.html"
+    success_url = reverse_lazy("app_mailing:segment_list_page")
+
+    def form_valid(self, form):
+        """1) Отправка пользователю уведомления об успешном добавлении нового Сегмента.
+        2) Автоматическое заполнение текущим пользователем поля 'owner'."""
+        messages.success(self.request, "Новый сегмент успешно добавлен")
+        form.instance.owner = self.request.user
+        return super().form_valid(form)
+
+
+class SegmentUpdateView(LoginRequiredMixin, generic.UpdateView):
+    """Представление для редактирования существующего Сегмента получателей. Изменение правила сразу действует на
+    все еще не отправленные рассылки этого сегмента (состав вычисляется в момент отправки)."""
+
+    model = Segment
+    form_class = SegmentForm
+    template_name = "app_mailing/segment/segment_add_update.html"
+    success_url = reverse_lazy("app_mailing:segment_list_page")
+
+    def get_queryset(self):
+        """Редактировать можно только свои сегменты (чужой сегмент - 404)."""
+        return Segment.objects.filter(owner=self.request.user)
+
+    def form_valid(self, form):
+        """Отправка пользователю уведомления об успешном редактировании Сегмента."""
+        messages.success(self.request, f"Вы успешно обновили сегмент: {form.instance.name}")
+        return super().form_valid(form)
+
+
+class SegmentDeleteView(LoginRequiredMixin, generic.DeleteView):
+    """Представление для удаления Сегмента получателей."""
+
+    model = Segment
+    template_name = "app_mailing/segment/segment_delete.html"
+    context_object_name = "segment"
+    success_url = reverse_lazy("app_mailing:segment_list_page")
+
+    def get_queryset(self):
+        """Удалять можно только свои сегменты (чужой сегмент - 404)."""
+        return Segment.objects.filter(owner=self.request.user)
+
+    def form_valid(self, form):
+        """Удаление сегмента. Сегмент, на который нацелены рассылки, удалить нельзя (on_delete=PROTECT) - в этом
+        случае пользователь получает предупреждение."""
+        try:
+            response = super().form_valid(form)
+        except ProtectedError:
+            messages.warning(self.request, "Этот сегмент используется в рассылках - его нельзя удалить.")
+            return redirect("app_mailing:segment_list_page")
+        messages.success(self.request, "Вы удалили сегмент.")
+        return response
+
+
+# 7. Контроллеры для "Метрики кэша"
+
+
+class CacheMetricsView(LoginRequiredMixin, generic.View):
+    """Представление для выдачи метрик кэша в JSON (попадания, промахи, записи, удаления, объем данных и время
+    операций по префиксам ключей) - для подбора сроков жизни кэша и проверки эффекта изменений. Только для
+    персонала (is_staff)."""
+
+    def dispatch(self, request, *args, **kwargs):
+        """Метрики раскрывают устройство ключей кэша - доступ только для персонала (403 Forbidden)."""
+        if request.user.is_authenticated and not request.user.is_staff:
+            return HttpResponseForbidden("У вас нет прав на просмотр метрик кэша.")
+        return super().dispatch(request, *args, **kwargs)
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(get_cache_metrics(), json_dumps_params={"ensure_ascii": False})
@@ -0,0 +1,737 @@
+"""Бэкенды кэша проекта.
+
+TwoTierRedisCache - двухуровневый кэш для "горячих" маленьких значений (снимки прав пользователей, счетчики
+поколений кэша страниц): перед Redis (второй уровень, L2) в каждом процессе (воркере Gunicorn) стоит небольшой
+LRU-кэш в памяти (первый уровень, L1). Повторное чтение значения из L1 не требует обращения к Redis.
+
+Согласованность L1 между процессами: каждая запись (set, add, incr, delete, ...) идет в Redis и публикуется в канал
+Redis pub/sub, а фоновый поток каждого процесса, подписанный на канал, удаляет ключ из своего L1 - обычно за
+миллисекунды. Если сообщение потеряно (например, при переподключении к Redis), устаревшее значение живет в L1 не
+дольше L1_TIMEOUT секунд, а после переподключения L1 очищается целиком.
+
+Подключается в settings.CACHES как отдельный алиас (например, "hot"):
+    'hot': {
+        'BACKEND': 'config.cache_backends.TwoTierRedisCache',
+        'LOCATION': REDIS_URL,
+        'OPTIONS': {'L1_MAX_ENTRIES': 1000, 'L1_TIMEOUT': 5, 'CHANNEL': 'cache:invalidate'},
+    }
+
+InstrumentedCacheMixin - сбор метрик: попадания, промахи, записи, удаления, объем прочитанных/записанных в Redis
+данных и гистограмма времени операций по префиксу ключа (cache_key_prefix: "page:RecipientListView", "authz",
+"gen:app_mailing.mailing", ...). Метрики копятся в памяти процесса и раз в METRICS_FLUSH_INTERVAL секунд одним
+pipeline-запросом добавляются в хэш Redis (OPTIONS METRICS_KEY, по умолчанию "cache:metrics"), поэтому видны сводно
+по всем воркерам.
+
+CircuitBreakerCacheMixin - работа без Redis: при ошибках и таймаутах Redis кэш переключается на память процесса, а
+Redis перестает опрашиваться до пробного обращения (CircuitBreaker), поэтому недоступность Redis не превращается в
+недоступность сервиса.
+
+В settings.CACHES используются ResilientRedisCache ("default") и ResilientTwoTierRedisCache ("hot") - оба миксина
+поверх RedisCache и TwoTierRedisCache, а без Redis (REDIS_URL не задан) - InstrumentedLocMemCache."""
+import logging
+import os
+import pickle
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache, RedisSerializer
+from django.utils.connection import ConnectionProxy
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+HOT_CACHE_ALIAS = "hot"
+# Кэш "горячих" значений (алиас "hot" в settings.CACHES), по аналогии с django.core.cache.cache для "default"
+hot_cache = ConnectionProxy(caches, HOT_CACHE_ALIAS)
+
+_MISSING = object()
+
+
+class LocalLRUCache:
+    """Ограниченный по размеру (max_entries) LRU-кэш в памяти процесса со сроком жизни записей (timeout, секунды).
+    Значения хранятся сериализованными (pickle), чтобы изменение полученного объекта не меняло значение в кэше.
+    Потокобезопасен."""
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Значение по ключу или _MISSING (нет ключа или срок записи истек)."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return _MISSING
+            expires, payload = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+        return pickle.loads(payload)
+
+    def set(self, key, value):
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout, payload)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TwoTierRedisCache(RedisCache):
+    """Redis-кэш Django (RedisCache) с первым уровнем в памяти процесса (LocalLRUCache) и сбросом первого уровня во
+    всех процессах через Redis pub/sub.
+    Дополнительные OPTIONS (остальные передаются клиенту Redis, как в RedisCache):
+    - L1_MAX_ENTRIES - сколько значений хранить в памяти процесса (по умолчанию 1000);
+    - L1_TIMEOUT - сколько секунд значение живет в памяти процесса (по умолчанию 5);
+    - CHANNEL - канал pub/sub для сообщений о сбросе (по умолчанию "cache:invalidate").
+    Первый уровень и поток-подписчик общие для всех потоков процесса (Django создает объект кэша на каждый поток)."""
+
+    _shared = {}  # (серверы, канал) -> (LocalLRUCache, состояние подписчика), одни на процесс
+    _shared_lock = threading.Lock()
+
+    def __init__(self, server, params):
+        options = dict(params.get("OPTIONS", {}))
+        max_entries = options.pop("L1_MAX_ENTRIES", 1000)
+        l1_timeout = options.pop("L1_TIMEOUT", 5)
+        self._channel = options.pop("CHANNEL", "cache:invalidate")
+        super().__init__(server, {**params, "OPTIONS": options})
+
+        shared_key = (tuple(self._servers or ()), self._channel)
+        with self._shared_lock:
+            if shared_key not in self._shared:
+                self._shared[shared_key] = (LocalLRUCache(max_entries, l1_timeout), {"pid": None})
+        self._l1, self._listener = self._shared[shared_key]
+
+    # Рассылка сообщений о сбросе первого уровня
+
+    def _ensure_listener(self):
+        """Запускает поток-подписчик в текущем процессе (после fork воркера Gunicorn поток нужно запустить заново)."""
+        pid = os.getpid()
+        if self._listener["pid"] == pid:
+            return
+        with self._shared_lock:
+            if self._listener["pid"] == pid:
+                return
+            self._listener["pid"] = pid
+            self._listener["node"] = uuid.uuid4().hex  # Свои сообщения подписчик пропускает
+            self._l1.clear()  # Значения, унаследованные от родительского процесса, могли устареть
+            thread = threading.Thread(target=self._listen, name="cache-invalidation-listener", daemon=True)
+            thread.start()
+
+    def _listen(self):
+        """Цикл потока-подписчика: удаляет из первого уровня ключи из сообщений канала, переподключается при
+        ошибках (после переподключения первый уровень очищается - сообщения за время разрыва потеряны).
+        Сообщения ждет через get_message(timeout=...), а не listen(): с коротким socket_timeout клиента Redis
+        ожидание в listen() прерывалось бы ошибкой таймаута при каждой паузе в сообщениях."""
+        connected = True
+        while True:
+            try:
+                pubsub = self._cache.get_client(write=False).pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self._channel)
+                self._l1.clear()
+                connected = True
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        self._handle_message(message.get("data"))
+            except Exception as error:
+                if connected:  # Пока Redis недоступен, не пишу в лог при каждой попытке переподключения
+                    logger.warning("Подписка на сброс кэша прервана: %s", error)
+                connected = False
+                self._l1.clear()
+                time.sleep(1)
+
+    def _handle_message(self, data):
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        if not isinstance(data, str):
+            return
+        node, _, key = data.partition(" ")
+        if node == self._listener.get("node"):
+            return
+        if key == "*":
+            self._l1.clear()
+        else:
+            self._l1.delete(key)
+
+    def _invalidate(self, keys):
+        """Удаляет ключи из своего первого уровня и сообщает об этом остальным процессам."""
+        for key in keys:
+            if key == "*":
+                self._l1.clear()
+            else:
+                self._l1.delete(key)
+        client = self._cache.get_client(write=True)
+        for key in keys:
+            client.publish(self._channel, f"{self._listener.get('node')} {key}")
+
+    # Чтение: сначала первый уровень, потом Redis
+
+    def get(self, key, default=None, version=None):
+        self._ensure_listener()
+        key = self.make_and_validate_key(key, version=version)
+        value = self._l1.get(key)
+        if value is _MISSING:
+            value = self._cache.get(key, _MISSING)
+            if value is _MISSING:
+                return default
+            self._l1.set(key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._ensure_listener()
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        result = {}
+        for made_key, key in key_map.items():
+            value = self._l1.get(made_key)
+            if value is not _MISSING:
+                result[key] = value
+        missing = [made_key for made_key, key in key_map.items() if key not in result]
+        if missing:
+            for made_key, value in self._cache.get_many(missing).items():
+                self._l1.set(made_key, value)
+                result[key_map[made_key]] = value
+        return result
+
+    def has_key(self, key, version=None):
+        self._ensure_listener()
+        if self._l1.get(self.make_and_validate_key(key, version=version)) is not _MISSING:
+            return True
+        return super().has_key(key, version=version)
+
+    # Запись: в Redis, затем сброс первого уровня во всех процессах
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._ensure_listener()
+        super().set(key, value, timeout, version=version)
+        self._invalidate([self.make_and_validate_key(key, version=version)])
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._ensure_listener()
+        added = super().add(key, value, timeout, version=version)
+        if added:
+            self._invalidate([self.make_and_validate_key(key, version=version)])
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._ensure_listener()
+        touched = super().touch(key, timeout, version=version)
+        self._invalidate([self.make_and_validate_key(key, version=version)])
+        return touched
+
+    def delete(self, key, version=None):
+        self._ensure_listener()
+        deleted = super().delete(key, version=version)
+        self._invalidate([self.make_and_validate_key(key, version=version)])
+        return deleted
+
+    def incr(self, key, delta=1, version=None):
+        self._ensure_listener()
+        value = super().incr(key, delta, version=version)
+        self._invalidate([self.make_and_validate_key(key, version=version)])
+        return value
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._ensure_listener()
+        failed = super().set_many(data, timeout, version=version)
+        self._invalidate([self.make_and_validate_key(key, version=version) for key in data])
+        return failed
+
+    def delete_many(self, keys, version=None):
+        self._ensure_listener()
+        super().delete_many(keys, version=version)
+        self._invalidate([self.make_and_validate_key(key, version=version) for key in keys])
+
+    def clear(self):
+        self._ensure_listener()
+        result = super().clear()
+        self._invalidate(["*"])
+        return result
+
+
+# Метрики кэша
+
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 1000)  # Верхние границы корзин гистограммы времени операций
+METRICS_FLUSH_INTERVAL = 10  # Как часто (секунды) процесс добавляет накопленные метрики в Redis
+METRICS_COUNTERS = ("calls", "hits", "misses", "sets", "deletes", "bytes_read", "bytes_written", "time_ms")
+
+_local = threading.local()  # Состояние текущего потока: вложенность операций и объем данных Redis
+
+
+def cache_key_prefix(key):
+    """Префикс ключа для группировки метрик: начальные части ключа (через ":", а если двоеточий нет - через ".")
+    до первой части с цифрами или хэшем (ID пользователей, версии, хэши запросов), не больше трех частей.
+    "page:RecipientListView:5:..." -> "page:RecipientListView", "authz:5:..." -> "authz",
+    "template.cache.mailing_row.<md5>" -> "template.cache.mailing_row"."""
+    separator = ":" if ":" in key else "."
+    parts = []
+    for part in key.split(separator)[:3]:
+        if not part or len(part) >= 32 or any(char.isdigit() for char in part):
+            break
+        parts.append(part)
+    return separator.join(parts) or "other"
+
+
+class CountingRedisSerializer(RedisSerializer):
+    """Сериализатор RedisCache, считающий объем прочитанных и записанных в Redis данных текущим потоком."""
+
+    def dumps(self, obj):
+        data = super().dumps(obj)
+        if isinstance(data, bytes):
+            _local.bytes_written = getattr(_local, "bytes_written", 0) + len(data)
+        return data
+
+    def loads(self, data):
+        if isinstance(data, bytes):
+            _local.bytes_read = getattr(_local, "bytes_read", 0) + len(data)
+        return super().loads(data)
+
+
+class CacheMetrics:
+    """Метрики кэша в памяти процесса: счетчики METRICS_COUNTERS и гистограмма времени операций по префиксам
+    ключей. Потокобезопасны."""
+
+    def __init__(self):
+        self._data = {}  # префикс -> Counter
+        self._lock = threading.Lock()
+        self.flushed_at = time.monotonic()
+
+    def record(self, prefix, elapsed_ms, **counters):
+        bucket = next((f"le_{bound}" for bound in LATENCY_BUCKETS_MS if elapsed_ms <= bound), "le_inf")
+        with self._lock:
+            stats = self._data.setdefault(prefix, Counter())
+            stats["calls"] += 1
+            stats["time_ms"] += elapsed_ms
+            stats[bucket] += 1
+            stats.update(counters)
+
+    def pop(self):
+        """Забирает накопленные метрики (для переноса в Redis) и начинает копить заново."""
+        with self._lock:
+            data, self._data = self._data, {}
+            self.flushed_at = time.monotonic()
+        return data
+
+    def snapshot(self):
+        with self._lock:
+            return {prefix: Counter(stats) for prefix, stats in self._data.items()}
+
+
+def summarize_metrics(data):
+    """Сводка метрик по префиксам: счетчики, доля попаданий, среднее время и оценка 95-го перцентиля времени
+    операции (верхняя граница корзины гистограммы)."""
+    summary = {}
+    for prefix, stats in sorted(data.items()):
+        lookups = stats["hits"] + stats["misses"]
+        histogram = {f"le_{bound}": int(stats[f"le_{bound}"]) for bound in LATENCY_BUCKETS_MS}
+        histogram["le_inf"] = int(stats["le_inf"])
+        p95, seen = None, 0
+        for bound, count in zip(LATENCY_BUCKETS_MS + ("inf",), histogram.values()):
+            seen += count
+            if p95 is None and stats["calls"] and seen >= stats["calls"] * 0.95:
+                p95 = bound
+        summary[prefix] = {
+            **{name: int(stats[name]) for name in METRICS_COUNTERS if name != "time_ms"},
+            "hit_ratio": round(stats["hits"] / lookups, 3) if lookups else None,
+            "avg_ms": round(stats["time_ms"] / stats["calls"], 3) if stats["calls"] else None,
+            "p95_ms": p95,
+            "latency_histogram": histogram,
+        }
+    return summary
+
+
+class InstrumentedCacheMixin:
+    """Миксин бэкенда кэша: измеряет каждую операцию (get, set, delete, ...) и записывает метрики по префиксу ключа
+    (cache_key_prefix). Для бэкендов на Redis (RedisCache) метрики процессов сводятся в хэш Redis METRICS_KEY,
+    для остальных - остаются в памяти процесса.
+    Указывается в списке базовых классов перед классом бэкенда."""
+
+    _metrics_registry = {}  # METRICS_KEY -> CacheMetrics, одни на процесс
+    _metrics_registry_lock = threading.Lock()
+
+    def __init__(self, server, params):
+        options = dict(params.get("OPTIONS", {}))
+        self.metrics_key = options.pop("METRICS_KEY", "cache:metrics")
+        if isinstance(self, RedisCache):
+            options.setdefault("serializer", CountingRedisSerializer)
+        super().__init__(server, {**params, "OPTIONS": options})
+        with self._metrics_registry_lock:
+            self._metrics = self._metrics_registry.setdefault(self.metrics_key, CacheMetrics())
+
+    @contextmanager
+    def _measure(self, keys, operation):
+        """Измеряет операцию над ключами keys (operation - "read", "write" или "delete"). Внутри блока в result
+        записываются прочитанные значения ({ключ: значение}) для подсчета попаданий. Вложенные операции (например,
+        delete_many, реализованный через delete) не учитываются повторно."""
+        depth = getattr(_local, "depth", 0)
+        _local.depth = depth + 1
+        if depth == 0:
+            _local.bytes_read = _local.bytes_written = 0
+        result = {}
+        started = time.perf_counter()
+        try:
+            yield result
+        finally:
+            _local.depth = depth
+            if depth == 0:
+                self._record(keys, operation, result, (time.perf_counter() - started) * 1000)
+
+    def _record(self, keys, operation, result, elapsed_ms):
+        groups = {}
+        for key in keys:
+            groups.setdefault(cache_key_prefix(str(key)), []).append(key)
+        for index, (prefix, group) in enumerate(groups.items()):
+            counters = {}
+            if operation == "read":
+                counters["hits"] = sum(1 for key in group if key in result)
+                counters["misses"] = len(group) - counters["hits"]
+            elif operation == "write":
+                counters["sets"] = len(group)
+            else:
+                counters["deletes"] = len(group)
+            if index == 0:  # Объем данных операции - одним числом, отношу к первому префиксу
+                counters["bytes_read"] = _local.bytes_read
+                counters["bytes_written"] = _local.bytes_written
+            self._metrics.record(prefix, elapsed_ms, **counters)
+        if time.monotonic() - self._metrics.flushed_at >= METRICS_FLUSH_INTERVAL:
+            self.flush_metrics()
+
+    def _metrics_in_redis(self):
+        """Метрики сводятся в Redis, если бэкенд на Redis и Redis сейчас доступен (CircuitBreakerCacheMixin), иначе
+        копятся в памяти процесса."""
+        if isinstance(self, CircuitBreakerCacheMixin) and not self.redis_available:
+            return False
+        return isinstance(self, RedisCache)
+
+    def flush_metrics(self):
+        """Добавляет накопленные процессом метрики в хэш Redis (поля "<префикс>|<счетчик>")."""
+        if not self._metrics_in_redis():
+            return
+        data = self._metrics.pop()
+        if not data:
+            return
+        try:
+            pipeline = self._cache.get_client(write=True).pipeline(transaction=False)
+            for prefix, stats in data.items():
+                for name, value in stats.items():
+                    if isinstance(value, float):
+                        pipeline.hincrbyfloat(self.metrics_key, f"{prefix}|{name}", value)
+                    else:
+                        pipeline.hincrby(self.metrics_key, f"{prefix}|{name}", value)
+            pipeline.execute()
+        except Exception as error:  # Метрики не должны ломать запросы
+            logger.warning("Не удалось сохранить метрики кэша: %s", error)
+
+    def get_metrics(self):
+        """Сводка метрик (summarize_metrics): для Redis - по всем процессам, иначе - по текущему процессу."""
+        if not self._metrics_in_redis():
+            return summarize_metrics(self._metrics.snapshot())
+        self.flush_metrics()
+        data = {}
+        try:
+            fields = self._cache.get_client(write=False).hgetall(self.metrics_key)
+        except RedisError:  # Redis недоступен - отдаю то, что накоплено в памяти процесса
+            return summarize_metrics(self._metrics.snapshot())
+        for field, value in fields.items():
+            prefix, _, name = field.decode("utf-8").rpartition("|")
+            data.setdefault(prefix, Counter())[name] = float(value) if name == "time_ms" else int(value)
+        return summarize_metrics(data)
+
+    def reset_metrics(self):
+        self._metrics.pop()
+        if self._metrics_in_redis():
+            try:
+                self._cache.get_client(write=True).delete(self.metrics_key)
+            except RedisError as error:
+                logger.warning("Не удалось обнулить метрики кэша в Redis: %s", error)
+
+    # Измеряемые операции
+
+    def get(self, key, default=None, version=None):
+        with self._measure([key], "read") as result:
+            value = super().get(key, _MISSING, version=version)
+            if value is not _MISSING:
+                result[key] = value
+        return default if value is _MISSING else value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        with self._measure(keys, "read") as result:
+            result.update(super().get_many(keys, version=version))
+        return dict(result)
+
+    def has_key(self, key, version=None):
+        with self._measure([key], "read") as result:
+            if super().has_key(key, version=version):
+                result[key] = True
+        return key in result
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._measure([key], "write"):
+            return super().set(key, value, timeout, version=version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._measure([key], "write"):
+            return super().add(key, value, timeout, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._measure([key], "write"):
+            return super().touch(key, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        with self._measure([key], "write"):
+            return super().incr(key, delta, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        with self._measure(list(data), "write"):
+            return super().set_many(data, timeout, version=version)
+
+    def delete(self, key, version=None):
+        with self._measure([key], "delete"):
+            return super().delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        with self._measure(keys, "delete"):
+            return super().delete_many(keys, version=version)
+
+
+# Защита от недоступности Redis
+
+class CircuitBreaker:
+    """Автоматический выключатель (circuit breaker) для обращений к Redis:
+    - closed - обращения идут в Redis; после failure_threshold ошибок подряд выключатель размыкается;
+    - open - обращения в Redis не идут (не ждут таймаутов), через recovery_timeout секунд выключатель пропускает
+    одно пробное обращение (half-open);
+    - half-open - пробное обращение выполняется: успех замыкает выключатель, ошибка снова размыкает.
+    Потокобезопасен."""
+
+    def __init__(self, failure_threshold, recovery_timeout):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True - можно обращаться к Redis (в состоянии open через recovery_timeout - пробное обращение)."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.recovery_timeout:
+                self.state = "half-open"
+                return True
+            return False
+
+    def success(self):
+        """Учитывает успешное обращение. Возвращает True, если выключатель замкнулся после аварии."""
+        with self._lock:
+            recovered = self.state != "closed"
+            self.state = "closed"
+            self._failures = 0
+            return recovered
+
+    def failure(self):
+        """Учитывает ошибку обращения. Возвращает True, если выключатель только что разомкнулся."""
+        with self._lock:
+            self._failures += 1
+            if self.state == "half-open" or (self.state == "closed" and self._failures >= self.failure_threshold):
+                opened = self.state == "closed"
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                return opened
+            return False
+
+
+class CircuitBreakerCacheMixin:
+    """Миксин бэкенда кэша на Redis: при ошибках Redis (недоступен, таймаут) операции выполняются в кэше в памяти
+    процесса (LocMemCache), а после FAILURE_THRESHOLD ошибок подряд Redis на RECOVERY_TIMEOUT секунд перестает
+    опрашиваться (CircuitBreaker) - запросы не ждут таймаутов подключения. Восстановление Redis определяется
+    пробным обращением.
+    Пока Redis недоступен, процессы не видят изменений друг друга, поэтому значения в памяти процесса живут не
+    дольше FALLBACK_TIMEOUT секунд. Ключи, измененные за время аварии, после восстановления удаляются из Redis:
+    там остались прежние значения (например, счетчики поколений кэша страниц без учета изменений за время аварии).
+    Дополнительные OPTIONS: FAILURE_THRESHOLD (по умолчанию 3), RECOVERY_TIMEOUT (по умолчанию 10),
+    FALLBACK_TIMEOUT (по умолчанию 30). Короткие таймауты подключения задаются OPTIONS клиента Redis
+    (socket_connect_timeout, socket_timeout)."""
+
+    MAX_DIRTY_KEYS = 10000  # Если за время аварии изменено больше ключей - после восстановления кэш очищается
+
+    _breaker_registry = {}  # (серверы, префикс ключей) -> состояние, одно на процесс
+    _breaker_registry_lock = threading.Lock()
+
+    def __init__(self, server, params):
+        options = dict(params.get("OPTIONS", {}))
+        failure_threshold = options.pop("FAILURE_THRESHOLD", 3)
+        recovery_timeout = options.pop("RECOVERY_TIMEOUT", 10)
+        self.fallback_timeout = options.pop("FALLBACK_TIMEOUT", 30)
+        super().__init__(server, {**params, "OPTIONS": options})
+
+        registry_key = (tuple(self._servers or ()), self.key_prefix)
+        with self._breaker_registry_lock:
+            if registry_key not in self._breaker_registry:
+                self._breaker_registry[registry_key] = {
+                    "breaker": CircuitBreaker(failure_threshold, recovery_timeout),
+                    "fallback": LocMemCache(f"fallback:{registry_key}", {"OPTIONS": {"MAX_ENTRIES": 1000}}),
+                    "dirty": set(),  # (ключ, версия), измененные за время аварии; "*" - кэш очищали
+                    "lock": threading.Lock(),
+                }
+        state = self._breaker_registry[registry_key]
+        self.breaker, self._fallback, self._dirty, self._dirty_lock = (
+            state["breaker"], state["fallback"], state["dirty"], state["lock"]
+        )
+
+    @property
+    def redis_available(self):
+        return self.breaker.state == "closed"
+
+    def _fallback_timeout(self, timeout):
+        """Срок жизни значения в памяти процесса: не дольше FALLBACK_TIMEOUT секунд."""
+        timeout = self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+        return self.fallback_timeout if timeout is None else min(timeout, self.fallback_timeout)
+
+    def _call(self, name, *args, dirty_keys=(), version=None, fallback_kwargs=None, **kwargs):
+        """Выполняет операцию name в Redis, а если Redis недоступен - в кэше в памяти процесса (dirty_keys -
+        изменяемые операцией ключи, их нужно удалить из Redis после восстановления)."""
+        if self.breaker.allow():
+            try:
+                result = getattr(super(), name)(*args, version=version, **kwargs)
+            except RedisError as error:
+                if self.breaker.failure():
+                    logger.warning("Redis недоступен (%s), кэш переключен на память процесса", error)
+            except Exception:  # Ошибка не связана с доступностью Redis (например, incr несуществующего ключа)
+                self._on_success()
+                raise
+            else:
+                self._on_success()
+                return result
+
+        if dirty_keys:
+            with self._dirty_lock:
+                self._dirty.update((key, version) for key in dirty_keys)
+        return getattr(self._fallback, name)(*args, version=version, **{**kwargs, **(fallback_kwargs or {})})
+
+    def _on_success(self):
+        if self.breaker.success():
+            self._recover()
+
+    def _recover(self):
+        """После восстановления Redis удаляет из него ключи, измененные за время аварии, и очищает кэш в памяти
+        процесса."""
+        with self._dirty_lock:
+            dirty = set(self._dirty)
+            self._dirty.clear()
+        try:
+            if ("*", None) in dirty or len(dirty) > self.MAX_DIRTY_KEYS:
+                super().clear()
+            else:
+                versions = {}
+                for key, version in dirty:
+                    versions.setdefault(version, []).append(key)
+                for version, keys in versions.items():
+                    super().delete_many(keys, version=version)
+        except RedisError as error:
+            with self._dirty_lock:
+                self._dirty.update(dirty)
+            self.breaker.failure()
+            logger.warning("Redis снова недоступен при восстановлении кэша: %s", error)
+            return
+        self._fallback.clear()
+        logger.warning("Redis снова доступен, кэш переключен обратно на Redis (сброшено ключей: %s)", len(dirty))
+
+    def get(self, key, default=None, version=None):
+        return self._call("get", key, default, version=version)
+
+    def get_many(self, keys, version=None):
+        return self._call("get_many", list(keys), version=version)
+
+    def has_key(self, key, version=None):
+        return self._call("has_key", key, version=version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call("set", key, value, timeout=timeout, version=version, dirty_keys=[key],
+                          fallback_kwargs={"timeout": self._fallback_timeout(timeout)})
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call("add", key, value, timeout=timeout, version=version, dirty_keys=[key],
+                          fallback_kwargs={"timeout": self._fallback_timeout(timeout)})
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call("touch", key, timeout=timeout, version=version, dirty_keys=[key],
+                          fallback_kwargs={"timeout": self._fallback_timeout(timeout)})
+
+    def incr(self, key, delta=1, version=None):
+        return self._call("incr", key, delta, version=version, dirty_keys=[key])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._call("set_many", data, timeout=timeout, version=version, dirty_keys=list(data),
+                          fallback_kwargs={"timeout": self._fallback_timeout(timeout)})
+
+    def delete(self, key, version=None):
+        return self._call("delete", key, version=version, dirty_keys=[key])
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        return self._call("delete_many", keys, version=version, dirty_keys=keys)
+
+    def clear(self):
+        if self.breaker.allow():
+            try:
+                result = super().clear()
+            except RedisError:
+                self.breaker.failure()
+            else:
+                self._on_success()
+                return result
+        with self._dirty_lock:
+            self._dirty.add(("*", None))
+        return self._fallback.clear()
+
+
+class InstrumentedLocMemCache(InstrumentedCacheMixin, LocMemCache):
+    """LocMemCache Django со сбором метрик (в памяти процесса) - для разработки без Redis (REDIS_URL не задан)."""
+
+
+class ResilientRedisCache(InstrumentedCacheMixin, CircuitBreakerCacheMixin, RedisCache):
+    """RedisCache Django со сбором метрик (InstrumentedCacheMixin) и переключением на память процесса при
+    недоступности Redis (CircuitBreakerCacheMixin)."""
+
+
+class ResilientTwoTierRedisCache(InstrumentedCacheMixin, CircuitBreakerCacheMixin, TwoTierRedisCache):
+    """TwoTierRedisCache со сбором метрик и переключением на память процесса при недоступности Redis. Попадания в
+    первый уровень видны в метриках как быстрые попадания без трафика Redis."""
+
+
+def get_cache_metrics():
+    """Сервисная функция для получения метрик всех кэшей из settings.CACHES со сбором метрик: {алиас: сводка}."""
+    return {
+        alias: caches[alias].get_metrics()
+        for alias in settings.CACHES
+        if isinstance(caches[alias], InstrumentedCacheMixin)
+    }
+
+
+def reset_cache_metrics():
+    """Сервисная функция для обнуления метрик всех кэшей со сбором метрик."""
+    for alias in settings.CACHES:
+        if isinstance(caches[alias], InstrumentedCacheMixin):
+            caches[alias].reset_metrics()
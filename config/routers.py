@@ -0,0 +1,94 @@
+"""Маршрутизация запросов к БД между основной базой (default) и репликой для чтения (replica).
+
+По умолчанию все запросы (чтение и запись) идут в основную базу - так работают сервисные функции (services.py),
+планировщик рассылок и все изменяющие данные контроллеры. На реплику уходят только чтения внутри контекста
+use_replica(), который включают контроллеры "только для чтения" (списки, главная страница, выгрузки) через
+ReadReplicaMixin (app_mailing/mixins.py).
+
+Реплика отстает от основной базы, поэтому после изменяющего запроса (POST и т.п.) пользователь на короткое время
+"прилипает" к основной базе (ReplicaStickinessMiddleware): он сразу видит свои изменения (read-your-writes)."""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+REPLICA_DB = "replica"
+PRIMARY_DB = "default"
+STICKY_SESSION_KEY = "db_primary_until"  # До какого момента (timestamp) читать пользователю из основной базы
+
+_use_replica = ContextVar("use_replica", default=False)
+
+
+def replica_enabled():
+    """True, если реплика настроена (в settings.DATABASES есть алиас replica)."""
+    return REPLICA_DB in settings.DATABASES
+
+
+@contextmanager
+def use_replica(enabled=True):
+    """Контекст, внутри которого чтения идут на реплику (если она настроена)."""
+    token = _use_replica.set(enabled)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def iterate_on_replica(iterable):
+    """Оборачивает ленивый итератор (например, тело StreamingHttpResponse), чтобы каждая его порция читалась с
+    реплики: тело потокового ответа вычисляется уже после выхода из контроллера, вне контекста use_replica()."""
+    iterator = iter(iterable)
+    while True:
+        with use_replica():
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+        yield chunk
+
+
+def is_sticky_to_primary(request):
+    """True, если пользователь недавно изменял данные и должен читать из основной базы."""
+    session = getattr(request, "session", None)
+    return session is not None and session.get(STICKY_SESSION_KEY, 0) > time.time()
+
+
+class ReplicaRouter:
+    """Роутер БД (settings.DATABASE_ROUTERS): чтения внутри use_replica() - на реплику, все остальное - в основную
+    базу. Если реплика не настроена, все запросы идут в основную базу."""
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and replica_enabled():
+            return REPLICA_DB
+        return PRIMARY_DB
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY_DB
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика - копия основной базы, поэтому связи между объектами из разных алиасов допустимы
+        databases = {PRIMARY_DB, REPLICA_DB}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaStickinessMiddleware:
+    """После изменяющего запроса (не GET/HEAD/OPTIONS) записывает в сессию момент, до которого пользователь читает из
+    основной базы (settings.REPLICA_STICKY_SECONDS): так он не увидит "старые" данные из отстающей реплики.
+    Должен стоять в MIDDLEWARE после SessionMiddleware."""
+
+    safe_methods = ("GET", "HEAD", "OPTIONS", "TRACE")
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        session = getattr(request, "session", None)
+        user = getattr(request, "user", None)
+        if (session is not None and user is not None and user.is_authenticated
+                and request.method not in self.safe_methods and replica_enabled()):
+            session[STICKY_SESSION_KEY] = time.time() + settings.REPLICA_STICKY_SECONDS
+        return response
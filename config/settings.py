@@ -49,6 +49,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'config.routers.ReplicaStickinessMiddleware',
+    'users.authz.AuthzMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -65,6 +67,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'users.authz.authz',
             ],
         },
     },
@@ -87,6 +90,26 @@ DATABASES = {
     }
 }
 
+# Реплика основной базы только для чтения (списки, главная страница, выгрузки - см. config/routers.py). Включается,
+# если задан DATABASE_REPLICA_HOST или DATABASE_REPLICA_NAME; незаданные параметры берутся от основной базы.
+# Для проверки локально можно указать вторую базу (DATABASE_REPLICA_NAME), заполненную копией основной.
+if os.getenv('DATABASE_REPLICA_HOST') or os.getenv('DATABASE_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.getenv('DATABASE_REPLICA_NAME') or DATABASES['default']['NAME'],
+        'USER': os.getenv('DATABASE_REPLICA_USER') or DATABASES['default']['USER'],
+        'PASSWORD': os.getenv('DATABASE_REPLICA_PASSWORD') or DATABASES['default']['PASSWORD'],
+        'HOST': os.getenv('DATABASE_REPLICA_HOST') or DATABASES['default']['HOST'],
+        'PORT': os.getenv('DATABASE_REPLICA_PORT') or DATABASES['default']['PORT'],
+        # В тестах реплика - то же подключение, что и основная база (отдельная тестовая база не создается)
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['config.routers.ReplicaRouter']
+
+# Сколько секунд после изменяющего запроса пользователь читает из основной базы, а не из реплики (read-your-writes)
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS') or 10)
+
 # База данных для тестов при разворачивании приложения (чтоб не разворачивать сразу postgresql достаточно в начале
 # для тестов развернуть sqlite
 if 'test' in sys.argv:
@@ -94,8 +117,10 @@ if 'test' in sys.argv:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'test_db.sqlite3',
-        }
+        },
     }
+    # Без алиаса replica роутер (config/routers.py) отправляет все запросы в основную базу: второе подключение к
+    # тому же файлу SQLite вне транзакции TestCase блокировало бы таблицы, а TestCase не разрешает запросы к нему
 
 
 # Password validation
@@ -143,6 +168,9 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Каталог для архивов старых партиций tb_attempt (команда archive_attempts)
+ATTEMPT_ARCHIVE_DIR = os.getenv('ATTEMPT_ARCHIVE_DIR', default=str(BASE_DIR / 'archive' / 'attempts'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -160,17 +188,47 @@ EMAIL_USE_SSL = True
 EMAIL_HOST_USER = os.getenv('YANDEX_EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('YANDEX_EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+# Таймаут подключения и ответа SMTP-сервера (секунды): зависший SMTP не держит отправителя писем бесконечно
+EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT') or 10)
+# Служебные письма (подтверждение email, восстановление пароля) отправляются в фоновом потоке сразу после коммита.
+# False - только задачей планировщика или командой send_transactional_emails (например, в отдельном контейнере)
+TRANSACTIONAL_EMAIL_SEND_IMMEDIATELY = os.getenv('TRANSACTIONAL_EMAIL_SEND_IMMEDIATELY', default='True') == 'True'
 
 LOGOUT_REDIRECT_URL = 'users:start_page'
 
 LOGIN_URL = 'users:start_page'
 
 REDIS_URL = os.getenv('REDIS_URL')
+# Короткие таймауты Redis (секунды): при недоступности Redis запросы не ждут долго - кэш переключается на память
+# процесса (config/cache_backends.py, CircuitBreakerCacheMixin)
+CACHE_REDIS_TIMEOUT = float(os.getenv('CACHE_REDIS_TIMEOUT') or 0.5)
 CACHE_ENABLED = True
-if CACHE_ENABLED:
+if CACHE_ENABLED and REDIS_URL:
     CACHES = {
         'default': {
-            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'BACKEND': 'config.cache_backends.ResilientRedisCache',
             'LOCATION': REDIS_URL,
-        }
+            'OPTIONS': {
+                'socket_connect_timeout': CACHE_REDIS_TIMEOUT,
+                'socket_timeout': CACHE_REDIS_TIMEOUT,
+            },
+        },
+        # "Горячие" маленькие значения (снимки прав, счетчики поколений кэша): память процесса + Redis
+        'hot': {
+            'BACKEND': 'config.cache_backends.ResilientTwoTierRedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {
+                'METRICS_KEY': 'cache:metrics:hot',
+                'L1_MAX_ENTRIES': int(os.getenv('CACHE_L1_MAX_ENTRIES') or 1000),
+                'L1_TIMEOUT': int(os.getenv('CACHE_L1_TIMEOUT') or 5),
+                'socket_connect_timeout': CACHE_REDIS_TIMEOUT,
+                'socket_timeout': CACHE_REDIS_TIMEOUT,
+            },
+        },
+    }
+elif CACHE_ENABLED:
+    # Без Redis (локальная разработка): кэш в памяти процесса, сброс кэша виден только в этом процессе
+    CACHES = {
+        'default': {'BACKEND': 'config.cache_backends.InstrumentedLocMemCache', 'LOCATION': 'default'},
+        'hot': {'BACKEND': 'config.cache_backends.InstrumentedLocMemCache', 'LOCATION': 'hot'},
     }
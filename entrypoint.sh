@@ -12,4 +12,6 @@ echo "📦 Собираю статику..."
 python manage.py collectstatic --noinput
 
 echo "✅ Запускаю Gunicorn..."
-exec gunicorn config.wsgi:application --bind 0.0.0.0:8000
+# Таймаут воркера (секунды) - короткий: зависший запрос (медленный запрос к БД, SMTP, Redis) не держит воркер.
+# Импорт и выгрузки обслуживает отдельный сервис bulk (docker-compose.yml) со своим длинным таймаутом
+exec gunicorn config.wsgi:application --bind 0.0.0.0:8000 --timeout "${GUNICORN_TIMEOUT:-30}"
@@ -1,7 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from django.utils import timezone
 
-from users.models import AppUser
+from users.models import AppUser, TransactionalEmail
 
 
 @admin.register(AppUser)
@@ -27,3 +28,20 @@ class AppUserAdmin(UserAdmin):
             "fields": ("email", "first_name", "last_name", "password1", "password2"),
         }),
     )
+
+
+@admin.register(TransactionalEmail)
+class TransactionalEmailAdmin(admin.ModelAdmin):
+    """Настройка отображения очереди служебных писем в админке."""
+
+    list_display = ("to_email", "kind", "status", "attempts", "created_at", "sent_at")
+    list_filter = ("kind", "status")
+    search_fields = ("to_email",)
+    readonly_fields = ("created_at", "sent_at", "last_error")
+    actions = ["retry_emails"]
+
+    @admin.action(description="Отправить повторно")
+    def retry_emails(self, request, queryset):
+        """Возвращает неотправленные письма в очередь: отправитель заберет их при следующем проходе."""
+        updated = queryset.filter(status="failed").update(status="pending", attempts=0, next_attempt_at=timezone.now())
+        self.message_user(request, f"Возвращено в очередь писем: {updated}")
@@ -0,0 +1,115 @@
+"""Снимок прав пользователя (authorization snapshot): роль "Менеджер сервиса", разрешения и статус блокировки.
+
+Без снимка каждая проверка прав - отдельные запросы к БД: groups.filter(...).exists() в каждом списке, has_perm() в
+контроллерах и {{ perms }} в меню на каждой странице (разрешения пользователя и его групп). Снимок вычисляется один
+раз и хранится в кэше "горячих" значений (алиас hot: память процесса + Redis, config/cache_backends.py), а в
+запросе доступен как request.authz (AuthzMiddleware) и в шаблонах как {{ authz }}.
+
+Сброс снимков - версиями: ключ снимка содержит общую версию (меняется при изменении групп и их разрешений - это
+затрагивает многих пользователей) и версию пользователя (меняется при изменении его групп, его разрешений и самого
+пользователя, в том числе блокировке/разблокировке). Смена версии делает старые снимки недоступными, удалять их не
+нужно - они истекут сами. Версии меняют сигналы (users/signals.py) после коммита транзакции."""
+import time
+
+from django.db import transaction
+from django.utils.functional import SimpleLazyObject
+
+from config.cache_backends import hot_cache
+from config.routers import use_replica
+
+MANAGER_GROUP_NAME = "Менеджер сервиса"
+
+AUTHZ_CACHE_KEY = "authz:{user_id}:{global_version}:{user_version}"
+AUTHZ_CACHE_TIMEOUT = 60 * 60
+AUTHZ_GLOBAL_VERSION_KEY = "authz:version"
+AUTHZ_USER_VERSION_KEY = "authz:version:{user_id}"
+
+
+class AuthzSnapshot:
+    """Права пользователя на момент вычисления снимка: is_manager - входит в группу "Менеджер сервиса",
+    permissions - все разрешения ("app_label.codename") с учетом групп, is_blocked - пользователь заблокирован."""
+
+    def __init__(self, is_manager=False, is_blocked=False, is_superuser=False, permissions=()):
+        self.is_manager = is_manager
+        self.is_blocked = is_blocked
+        self.is_superuser = is_superuser
+        self.permissions = frozenset(permissions)
+
+    def has_perm(self, perm):
+        """Аналог user.has_perm(): у активного суперпользователя есть все разрешения."""
+        return self.is_superuser or perm in self.permissions
+
+
+ANONYMOUS_AUTHZ = AuthzSnapshot()
+
+
+def _get_version(key):
+    """Текущая версия по ключу. Если ключа нет (еще не создан или вытеснен из кэша) - создаю новую: версия -
+    метка времени, поэтому после вытеснения не вернется прежнее значение и не оживит устаревшие снимки."""
+    version = hot_cache.get(key)
+    if version is None:
+        hot_cache.add(key, time.time_ns(), timeout=None)
+        version = hot_cache.get(key)
+    return version
+
+
+def compute_authz(user):
+    """Вычисляет снимок прав пользователя по основной базе (реплика может отставать, а снимок живет долго)."""
+    with use_replica(False):
+        return AuthzSnapshot(
+            is_manager=user.groups.filter(name=MANAGER_GROUP_NAME).exists(),
+            is_blocked=user.is_blocked,
+            is_superuser=user.is_active and user.is_superuser,
+            permissions=user.get_all_permissions(),
+        )
+
+
+def get_authz(user):
+    """Сервисная функция для получения снимка прав пользователя: из кэша, а если его нет - вычисляет и кэширует."""
+    if not user.is_authenticated:
+        return ANONYMOUS_AUTHZ
+
+    versions = hot_cache.get_many([AUTHZ_GLOBAL_VERSION_KEY, AUTHZ_USER_VERSION_KEY.format(user_id=user.pk)])
+    key = AUTHZ_CACHE_KEY.format(
+        user_id=user.pk,
+        global_version=versions.get(AUTHZ_GLOBAL_VERSION_KEY) or _get_version(AUTHZ_GLOBAL_VERSION_KEY),
+        user_version=(versions.get(AUTHZ_USER_VERSION_KEY.format(user_id=user.pk))
+                      or _get_version(AUTHZ_USER_VERSION_KEY.format(user_id=user.pk))),
+    )
+    snapshot = hot_cache.get(key)
+    if snapshot is None:
+        snapshot = compute_authz(user)
+        hot_cache.set(key, snapshot, AUTHZ_CACHE_TIMEOUT)
+    return snapshot
+
+
+def invalidate_authz(user_ids=None):
+    """Сервисная функция для сброса снимков прав (после коммита транзакции): для перечисленных пользователей или,
+    если user_ids=None, для всех пользователей (изменились группы или их разрешения)."""
+    if user_ids is None:
+        keys = [AUTHZ_GLOBAL_VERSION_KEY]
+    else:
+        keys = [AUTHZ_USER_VERSION_KEY.format(user_id=user_id) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: hot_cache.set_many({key: time.time_ns() for key in keys}, timeout=None))
+
+
+class AuthzMiddleware:
+    """Добавляет в запрос request.authz - снимок прав текущего пользователя. Снимок загружается лениво, при первом
+    обращении, поэтому запросы без проверок прав кэш не трогают. Должен стоять в MIDDLEWARE после
+    AuthenticationMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.authz = SimpleLazyObject(lambda: get_authz(request.user))
+        return self.get_response(request)
+
+
+def authz(request):
+    """Контекстный процессор (TEMPLATES -> context_processors): снимок прав пользователя в шаблонах - {{ authz }}."""
+    snapshot = getattr(request, "authz", None)
+    if snapshot is None:
+        snapshot = get_authz(request.user) if hasattr(request, "user") else ANONYMOUS_AUTHZ
+    return {"authz": snapshot}
@@ -1,6 +1,8 @@
 from django import forms
-from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
+from django.contrib.auth.forms import (AuthenticationForm, PasswordResetForm,
+                                       UserCreationForm)
 from django.core.exceptions import ValidationError
+from django.template import loader
 # gettext_lazy() - инструмент для поддержки многоязычности (i18n, internationalization) в Django.
 # gettext_lazy() - это "ленивый перевод" строки. Он не переводит сразу, а откладывает перевод до момента отображения
 # пользователю (например, в шаблоне или в форме).
@@ -15,6 +17,7 @@ from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as translation
 
 from users.models import AppUser
+from users.services import enqueue_transactional_email
 
 
 class AppUserRegistrationForm(UserCreationForm):
@@ -104,3 +107,27 @@ class AppUserLoginForm(AuthenticationForm):
                 translation("Пожалуйста, проверьте правильность введённых данных и повторите попытку."),
                 code="invalid_login"
             )
+
+
+class AppUserPasswordResetForm(PasswordResetForm):
+    """Форма восстановления пароля: письмо со ссылкой не отправляется по SMTP в запросе, а ставится в очередь
+    служебных писем (users/services.py: enqueue_transactional_email) и отправляется в фоне."""
+
+    def send_mail(self, subject_template_name, email_template_name, context, from_email, to_email,
+                  html_email_template_name=None):
+        """Переопределяю отправку письма: рендер темы и текста как в PasswordResetForm, но вместо отправки -
+        постановка письма в очередь."""
+        subject = loader.render_to_string(subject_template_name, context)
+        subject = "".join(subject.splitlines())  # Тема письма не должна содержать переводов строк
+        body = loader.render_to_string(email_template_name, context)
+        html_body = loader.render_to_string(html_email_template_name, context) if html_email_template_name else ""
+        enqueue_transactional_email("password_reset", to_email, subject, body, html_body)
+
+
+class ResendActivationForm(forms.Form):
+    """Форма для повторной отправки письма подтверждения email."""
+
+    email = forms.EmailField(
+        label="Почта",
+        widget=forms.EmailInput(attrs={"class": "form-control", "placeholder": "Введите email"}),
+    )
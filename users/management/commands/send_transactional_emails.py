@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.services import (TRANSACTIONAL_EMAIL_BATCH_SIZE,
+                            purge_transactional_emails,
+                            send_transactional_emails)
+
+
+class Command(BaseCommand):
+    """Команда для отправки служебных писем (подтверждение email, восстановление пароля) из очереди
+    TransactionalEmail. С --loop работает постоянно - так отправитель можно запустить отдельным процессом
+    (контейнер mailer в docker-compose.yml), независимо от веб-сервера и массовых рассылок."""
+
+    help = "Отправка служебных писем из очереди (с --loop - постоянно, с интервалом --interval секунд)"
+
+    def add_arguments(self, parser):
+        """Аргументы: режим постоянной работы, интервал между проходами и размер пачки писем."""
+        parser.add_argument("--loop", action="store_true", help="Работать постоянно, а не один проход")
+        parser.add_argument("--interval", type=float, default=5, help="Пауза между проходами, секунды")
+        parser.add_argument("--batch-size", type=int, default=TRANSACTIONAL_EMAIL_BATCH_SIZE,
+                            help="Писем за один проход")
+
+    def handle(self, *args, **kwargs):
+        """Основная логика команды: отправляет письма, которым подошло время отправки, пока очередь не опустеет.
+        В режиме --loop повторяет проходы и раз в сутки удаляет старые письма из очереди."""
+        purged_at = None  # Время последней чистки по time.monotonic() (начало отсчета произвольное)
+        while True:
+            while True:
+                result = send_transactional_emails(limit=kwargs["batch_size"])
+                if any(result.values()):
+                    self.stdout.write(
+                        f"Отправлено: {result['sent']}, отложено: {result['retry']}, не отправлено: {result['failed']}"
+                    )
+                if sum(result.values()) < kwargs["batch_size"]:
+                    break
+
+            if not kwargs["loop"]:
+                break
+            if purged_at is None or time.monotonic() - purged_at > 60 * 60 * 24:
+                purge_transactional_emails()
+                purged_at = time.monotonic()
+            time.sleep(kwargs["interval"])
@@ -0,0 +1,144 @@
+# Generated by Django 5.2.18 on 2026-10-19 00:51
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("users", "0005_alter_appuser_options_appuser_is_blocked"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TransactionalEmail",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("activation", "Подтверждение email"),
+                            ("password_reset", "Восстановление пароля"),
+                        ],
+                        help_text="Укажите тип служебного письма",
+                        max_length=20,
+                        verbose_name="Тип письма:",
+                    ),
+                ),
+                (
+                    "to_email",
+                    models.EmailField(
+                        help_text="Укажите email получателя",
+                        max_length=254,
+                        verbose_name="Получатель:",
+                    ),
+                ),
+                (
+                    "subject",
+                    models.CharField(
+                        help_text="Укажите тему письма",
+                        max_length=255,
+                        verbose_name="Тема письма:",
+                    ),
+                ),
+                (
+                    "body",
+                    models.TextField(
+                        help_text="Укажите текст письма", verbose_name="Текст письма:"
+                    ),
+                ),
+                (
+                    "html_body",
+                    models.TextField(
+                        blank=True,
+                        default="",
+                        help_text="Укажите HTML-версию письма (необязательно)",
+                        verbose_name="HTML-версия письма:",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Ожидает отправки"),
+                            ("sending", "Отправляется"),
+                            ("sent", "Отправлено"),
+                            ("failed", "Не отправлено"),
+                        ],
+                        default="pending",
+                        help_text="Укажите статус отправки письма",
+                        max_length=15,
+                        verbose_name="Статус письма:",
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveSmallIntegerField(
+                        default=0,
+                        help_text="Количество попыток отправки письма",
+                        verbose_name="Попыток отправки:",
+                    ),
+                ),
+                (
+                    "next_attempt_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        help_text="Не раньше какого времени письмо можно (повторно) отправить",
+                        verbose_name="Следующая попытка:",
+                    ),
+                ),
+                (
+                    "last_error",
+                    models.TextField(
+                        blank=True,
+                        default="",
+                        help_text="Ответ почтового сервера при последней неудачной попытке",
+                        verbose_name="Последняя ошибка:",
+                    ),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True,
+                        help_text="Дата и время постановки письма в очередь",
+                        verbose_name="Дата создания:",
+                    ),
+                ),
+                (
+                    "sent_at",
+                    models.DateTimeField(
+                        blank=True,
+                        help_text="Дата и время успешной отправки письма",
+                        null=True,
+                        verbose_name="Дата отправки:",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Служебное письмо",
+                "verbose_name_plural": "Служебные письма",
+                "db_table": "tb_transactional_emails",
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["status", "next_attempt_at"],
+                        name="txemail_status_next_idx",
+                    ),
+                    models.Index(
+                        fields=["to_email", "kind", "created_at"],
+                        name="txemail_to_kind_created_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 
 from users.managers import AppUserManager
 
@@ -47,3 +48,98 @@ class AppUser(AbstractUser):
             ("can_see_list_user", "Может видеть список пользователей сервиса"),
             ("can_block_user", "Может блокировать пользователей сервиса"),
         ]
+
+
+class TransactionalEmail(models.Model):
+    """Модель *TransactionalEmail* представляет "Служебное письмо" (подтверждение email, восстановление пароля) в
+    очереди на отправку. Контроллер только сохраняет письмо в очередь, а отправляет его фоновый отправитель
+    (users/services.py: send_transactional_emails) - SMTP не задерживает ответ пользователю, а при ошибке SMTP
+    письмо отправляется повторно. Очередь отделена от массовых рассылок (Mailing) и разбирается отдельной задачей."""
+
+    EMAIL_KIND = [
+        ("activation", "Подтверждение email"),
+        ("password_reset", "Восстановление пароля"),
+    ]
+
+    EMAIL_STATUS = [
+        ("pending", "Ожидает отправки"),
+        ("sending", "Отправляется"),
+        ("sent", "Отправлено"),
+        ("failed", "Не отправлено"),
+    ]
+
+    kind = models.CharField(
+        max_length=20,
+        choices=EMAIL_KIND,
+        verbose_name="Тип письма:",
+        help_text="Укажите тип служебного письма",
+    )
+    to_email = models.EmailField(
+        verbose_name="Получатель:",
+        help_text="Укажите email получателя",
+    )
+    subject = models.CharField(
+        max_length=255,
+        verbose_name="Тема письма:",
+        help_text="Укажите тему письма",
+    )
+    body = models.TextField(
+        verbose_name="Текст письма:",
+        help_text="Укажите текст письма",
+    )
+    html_body = models.TextField(
+        blank=True,
+        default="",
+        verbose_name="HTML-версия письма:",
+        help_text="Укажите HTML-версию письма (необязательно)",
+    )
+    status = models.CharField(
+        max_length=15,
+        choices=EMAIL_STATUS,
+        default="pending",
+        verbose_name="Статус письма:",
+        help_text="Укажите статус отправки письма",
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name="Попыток отправки:",
+        help_text="Количество попыток отправки письма",
+    )
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name="Следующая попытка:",
+        help_text="Не раньше какого времени письмо можно (повторно) отправить",
+    )
+    last_error = models.TextField(
+        blank=True,
+        default="",
+        verbose_name="Последняя ошибка:",
+        help_text="Ответ почтового сервера при последней неудачной попытке",
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Дата создания:",
+        help_text="Дата и время постановки письма в очередь",
+    )
+    sent_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Дата отправки:",
+        help_text="Дата и время успешной отправки письма",
+    )
+
+    def __str__(self):
+        """Метод определяет строковое представление объекта. Полезно для отображения объектов в админке/консоли."""
+        return f"{self.get_kind_display()} | {self.to_email} | {self.get_status_display()}"
+
+    class Meta:
+        verbose_name = "Служебное письмо"
+        verbose_name_plural = "Служебные письма"
+        ordering = ["-created_at"]
+        db_table = "tb_transactional_emails"
+        indexes = [
+            # Фоновый отправитель выбирает письма к отправке: status in (pending, sending) и next_attempt_at <= now.
+            models.Index(fields=["status", "next_attempt_at"], name="txemail_status_next_idx"),
+            # Ограничение частоты повторной отправки письма подтверждения на один адрес.
+            models.Index(fields=["to_email", "kind", "created_at"], name="txemail_to_kind_created_idx"),
+        ]
@@ -1,4 +1,38 @@
-from users.models import AppUser
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.contrib.sites.shortcuts import get_current_site
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connections, transaction
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from users.models import AppUser, TransactionalEmail
+
+logger = logging.getLogger(__name__)
+
+# Служебные письма (users.models.TransactionalEmail): сколько писем отправитель забирает за один проход, сколько раз
+# пробует отправить письмо и через сколько секунд повторяет попытку (задержка удваивается с каждой попыткой)
+TRANSACTIONAL_EMAIL_BATCH_SIZE = 50
+TRANSACTIONAL_EMAIL_MAX_ATTEMPTS = 5
+TRANSACTIONAL_EMAIL_RETRY_DELAY = 30
+# Письмо в статусе "sending" дольше этого срока (секунды) считается брошенным (отправитель упал) и забирается снова
+TRANSACTIONAL_EMAIL_CLAIM_TIMEOUT = 60 * 5
+# Сколько дней хранятся отправленные и неотправленные письма (в письмах - ссылки с токенами)
+TRANSACTIONAL_EMAIL_KEEP_DAYS = 7
+# Письмо подтверждения на один адрес отправляется не чаще, чем раз в столько секунд
+ACTIVATION_RESEND_INTERVAL = 60
+
+# Один фоновый поток процесса для отправки служебных писем сразу после коммита: запрос не ждет SMTP, а письма
+# не конкурируют за потоки с массовыми рассылками
+_transactional_email_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="transactional-email")
 
 
 def block_user(user: AppUser):
@@ -23,3 +57,157 @@ def unblock_user(user: AppUser):
     if user.is_blocked:
         user.is_blocked = False
         user.save()
+
+
+def enqueue_transactional_email(kind, to_email, subject, body, html_body=""):
+    """Сервисная функция для постановки служебного письма в очередь (TransactionalEmail). Письмо сохраняется в
+    текущей транзакции, а после ее коммита (если TRANSACTIONAL_EMAIL_SEND_IMMEDIATELY) отправляется в фоновом
+    потоке - запрос не ждет SMTP. Если отправить сразу не удалось, письмо отправит повторно задача планировщика или
+    команда send_transactional_emails.
+    :param kind: тип письма ("activation", "password_reset").
+    :return: объект TransactionalEmail."""
+    email = TransactionalEmail.objects.create(
+        kind=kind,
+        to_email=to_email,
+        subject=subject,
+        body=body,
+        html_body=html_body or "",
+    )
+    if settings.TRANSACTIONAL_EMAIL_SEND_IMMEDIATELY:
+        transaction.on_commit(
+            lambda: _transactional_email_executor.submit(_send_transactional_emails_in_thread, [email.pk])
+        )
+    return email
+
+
+def _send_transactional_emails_in_thread(ids):
+    """Отправка писем в фоновом потоке: ошибки не выходят за пределы потока (письмо останется в очереди), а
+    соединения с БД этого потока закрываются после отправки."""
+    try:
+        send_transactional_emails(ids=ids)
+    except Exception:
+        logger.exception("Ошибка фоновой отправки служебных писем %s", ids)
+    finally:
+        connections.close_all()
+
+
+def _claim_transactional_emails(limit, ids=None):
+    """Забирает письма к отправке: статус "pending" (или брошенное "sending") и подошло время попытки. Письмо
+    помечается "sending" условным UPDATE (по прежним статусу и числу попыток) - если письмо уже забрал другой
+    процесс, UPDATE не изменит строку и письмо будет пропущено. Так несколько отправителей (поток веб-процесса,
+    планировщик, команда) не отправят одно письмо дважды."""
+    now = timezone.now()
+    # Брошенные письма, у которых закончились попытки, больше не отправляются
+    TransactionalEmail.objects.filter(
+        status="sending", next_attempt_at__lte=now, attempts__gte=TRANSACTIONAL_EMAIL_MAX_ATTEMPTS
+    ).update(status="failed", last_error="Отправка прервана")
+
+    candidates = TransactionalEmail.objects.filter(status__in=["pending", "sending"], next_attempt_at__lte=now)
+    if ids is not None:
+        candidates = candidates.filter(pk__in=ids)
+
+    claimed = []
+    for email in candidates.order_by("next_attempt_at")[:limit]:
+        updated = TransactionalEmail.objects.filter(
+            pk=email.pk, status=email.status, attempts=email.attempts
+        ).update(
+            status="sending",
+            attempts=F("attempts") + 1,
+            next_attempt_at=now + timedelta(seconds=TRANSACTIONAL_EMAIL_CLAIM_TIMEOUT),
+        )
+        if updated:
+            email.status = "sending"
+            email.attempts += 1
+            claimed.append(email)
+    return claimed
+
+
+def send_transactional_emails(limit=TRANSACTIONAL_EMAIL_BATCH_SIZE, ids=None):
+    """Сервисная функция для отправки служебных писем из очереди (TransactionalEmail):
+    - Забирает до limit писем, которым подошло время отправки (или только письма ids).
+    - Отправляет их через одно SMTP-соединение (без нового подключения и авторизации на каждое письмо).
+    - При ошибке письмо откладывается с удваивающейся задержкой, после TRANSACTIONAL_EMAIL_MAX_ATTEMPTS попыток
+    помечается "failed".
+    :return: словарь с количеством отправленных, отложенных и неотправленных писем."""
+    result = {"sent": 0, "retry": 0, "failed": 0}
+    emails = _claim_transactional_emails(limit, ids)
+    if not emails:
+        return result
+
+    from_email = settings.DEFAULT_FROM_EMAIL
+    connection = get_connection(fail_silently=False)
+    try:
+        for email in emails:
+            message = EmailMultiAlternatives(
+                email.subject, email.body, from_email, [email.to_email], connection=connection
+            )
+            if email.html_body:
+                message.attach_alternative(email.html_body, "text/html")
+            try:
+                connection.open()  # Открывает соединение, если оно еще не открыто (или закрыто после ошибки)
+                message.send()
+            except Exception as e:
+                connection.close()  # После ошибки состояние SMTP-сессии неизвестно - следующее письмо откроет новую
+                if email.attempts >= TRANSACTIONAL_EMAIL_MAX_ATTEMPTS:
+                    changes = {"status": "failed"}
+                    result["failed"] += 1
+                else:
+                    delay = TRANSACTIONAL_EMAIL_RETRY_DELAY * 2 ** (email.attempts - 1)
+                    changes = {"status": "pending", "next_attempt_at": timezone.now() + timedelta(seconds=delay)}
+                    result["retry"] += 1
+                TransactionalEmail.objects.filter(pk=email.pk).update(last_error=str(e), **changes)
+                logger.warning("Ошибка при отправке служебного письма на %s: %s", email.to_email, e)
+            else:
+                TransactionalEmail.objects.filter(pk=email.pk).update(
+                    status="sent", sent_at=timezone.now(), last_error=""
+                )
+                result["sent"] += 1
+    finally:
+        connection.close()
+    return result
+
+
+def purge_transactional_emails(days=TRANSACTIONAL_EMAIL_KEEP_DAYS):
+    """Сервисная функция для удаления из очереди отправленных и неотправленных служебных писем старше days дней.
+    :return: количество удаленных писем."""
+    deleted, _ = TransactionalEmail.objects.filter(
+        status__in=["sent", "failed"], created_at__lt=timezone.now() - timedelta(days=days)
+    ).delete()
+    return deleted
+
+
+def send_activation_email(request, user):
+    """Сервисная функция для постановки в очередь письма со ссылкой подтверждения email (активации) пользователя.
+    Ссылка содержит зашифрованный ID пользователя и одноразовый токен (default_token_generator)."""
+    uid = urlsafe_base64_encode(force_bytes(user.pk))
+    token = default_token_generator.make_token(user)
+    activation_link = request.build_absolute_uri(
+        reverse("users:activate_account", kwargs={"uidb64": uid, "token": token})
+    )
+    message = render_to_string(
+        "users/email_confirmation.html",
+        {
+            "user": user,
+            "domain": get_current_site(request).domain,
+            "activation_link": activation_link,
+        })
+    return enqueue_transactional_email("activation", user.email, "Подтвердите регистрацию на MailForge", message)
+
+
+def resend_activation_email(request, email):
+    """Сервисная функция для повторной отправки письма подтверждения email. Письмо отправляется, только если
+    пользователь с таким email существует и еще не активирован, и предыдущее письмо подтверждения на этот адрес было
+    не раньше ACTIVATION_RESEND_INTERVAL секунд назад.
+    :return: True, если письмо поставлено в очередь."""
+    user = AppUser.objects.filter(email__iexact=email, is_active=False).first()
+    if user is None:
+        return False
+    recently_sent = TransactionalEmail.objects.filter(
+        to_email=user.email,
+        kind="activation",
+        created_at__gte=timezone.now() - timedelta(seconds=ACTIVATION_RESEND_INTERVAL),
+    ).exists()
+    if recently_sent:
+        return False
+    send_activation_email(request, user)
+    return True
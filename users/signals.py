@@ -0,0 +1,46 @@
+from django.contrib.auth.models import Group
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from users.authz import invalidate_authz
+from users.models import AppUser
+
+
+@receiver(post_save, sender=AppUser)
+def invalidate_authz_on_user_save(sender, instance, created, update_fields, **kwargs):
+    """Сигнал сбрасывает снимок прав пользователя при его изменении (блокировка/разблокировка, is_active,
+    is_superuser и т.д.). Обновление только last_login при входе права не меняет - снимок не сбрасываю."""
+    if created or (update_fields is not None and set(update_fields) <= {"last_login"}):
+        return
+    invalidate_authz([instance.pk])
+
+
+@receiver(m2m_changed, sender=AppUser.groups.through)
+@receiver(m2m_changed, sender=AppUser.user_permissions.through)
+def invalidate_authz_on_user_relations_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Сигнал сбрасывает снимки прав при изменении групп или разрешений пользователя. Изменения возможны с обеих
+    сторон связи: user.groups.add(group) (instance - пользователь) и group.user_set.add(user) (pk_set - ID
+    пользователей). При group.user_set.clear() список пользователей неизвестен - сбрасываю снимки всех."""
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        invalidate_authz([instance.pk])
+    elif action == "post_clear":
+        invalidate_authz()
+    else:
+        invalidate_authz(pk_set)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_authz_on_group_permissions_change(sender, action, **kwargs):
+    """Сигнал сбрасывает снимки прав всех пользователей при изменении разрешений групп."""
+    if action in ("post_add", "post_remove", "post_clear"):
+        invalidate_authz()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_authz_on_group_change(sender, **kwargs):
+    """Сигнал сбрасывает снимки прав всех пользователей при изменении или удалении группы (роль "Менеджер сервиса"
+    определяется по названию группы)."""
+    invalidate_authz()
@@ -1,3 +1,150 @@
-# from django.test import TestCase
+from datetime import timedelta
+from smtplib import SMTPException
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.db.models import QuerySet
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from users.models import AppUser, TransactionalEmail
+from users.services import (ACTIVATION_RESEND_INTERVAL,
+                            TRANSACTIONAL_EMAIL_CLAIM_TIMEOUT,
+                            TRANSACTIONAL_EMAIL_MAX_ATTEMPTS,
+                            TRANSACTIONAL_EMAIL_RETRY_DELAY,
+                            _claim_transactional_emails,
+                            _send_transactional_emails_in_thread,
+                            enqueue_transactional_email,
+                            resend_activation_email, send_transactional_emails)
+
+# Ошибка SMTP-сервера при отправке письма (тестовый почтовый бэкенд Django - locmem)
+SMTP_ERROR = mock.patch(
+    "django.core.mail.backends.locmem.EmailBackend.send_messages", side_effect=SMTPException("Сервер недоступен")
+)
+
+
+@override_settings(TRANSACTIONAL_EMAIL_SEND_IMMEDIATELY=False, DEFAULT_FROM_EMAIL="noreply@example.com")
+class TransactionalEmailTests(TestCase):
+    """Очередь служебных писем (users/services.py): отправка, повторные попытки с удваивающейся задержкой и
+    захват письма только одним отправителем."""
+
+    def setUp(self):
+        self.email = enqueue_transactional_email("activation", "user@example.com", "Тема", "Текст", "<p>Текст</p>")
+
+    def make_due(self):
+        """Время следующей попытки письма подошло."""
+        TransactionalEmail.objects.filter(pk=self.email.pk).update(next_attempt_at=timezone.now())
+
+    def test_send(self):
+        self.assertEqual(send_transactional_emails(), {"sent": 1, "retry": 0, "failed": 0})
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].from_email, "noreply@example.com")
+        self.assertEqual(mail.outbox[0].alternatives[0][1], "text/html")
+        self.email.refresh_from_db()
+        self.assertEqual((self.email.status, self.email.attempts), ("sent", 1))
+        self.assertIsNotNone(self.email.sent_at)
+
+    def test_retry_with_backoff(self):
+        for attempt in (1, 2):
+            with SMTP_ERROR, self.assertLogs("users.services", "WARNING"):
+                started = timezone.now()
+                self.assertEqual(send_transactional_emails(), {"sent": 0, "retry": 1, "failed": 0})
+            self.email.refresh_from_db()
+            self.assertEqual((self.email.status, self.email.attempts), ("pending", attempt))
+            self.assertEqual(self.email.last_error, "Сервер недоступен")
+            delay = (self.email.next_attempt_at - started).total_seconds()
+            self.assertAlmostEqual(delay, TRANSACTIONAL_EMAIL_RETRY_DELAY * 2 ** (attempt - 1), delta=5)
+            # До времени следующей попытки письмо не отправляется
+            self.assertEqual(send_transactional_emails(), {"sent": 0, "retry": 0, "failed": 0})
+            self.make_due()
+
+        self.assertEqual(send_transactional_emails(), {"sent": 1, "retry": 0, "failed": 0})
+        self.email.refresh_from_db()
+        self.assertEqual((self.email.status, self.email.attempts, self.email.last_error), ("sent", 3, ""))
+
+    def test_failed_after_max_attempts(self):
+        TransactionalEmail.objects.filter(pk=self.email.pk).update(attempts=TRANSACTIONAL_EMAIL_MAX_ATTEMPTS - 1)
+        with SMTP_ERROR, self.assertLogs("users.services", "WARNING"):
+            self.assertEqual(send_transactional_emails(), {"sent": 0, "retry": 0, "failed": 1})
+        self.email.refresh_from_db()
+        self.assertEqual(self.email.status, "failed")
+
+    def test_email_is_claimed_once(self):
+        self.assertEqual([email.pk for email in _claim_transactional_emails(10)], [self.email.pk])
+        # Письмо уже забрал другой отправитель (поток веб-процесса, планировщик или команда)
+        self.assertEqual(_claim_transactional_emails(10), [])
+        self.assertEqual(send_transactional_emails(), {"sent": 0, "retry": 0, "failed": 0})
+        self.email.refresh_from_db()
+        self.assertEqual((self.email.status, self.email.attempts), ("sending", 1))
+        claim_expires = (self.email.next_attempt_at - timezone.now()).total_seconds()
+        self.assertAlmostEqual(claim_expires, TRANSACTIONAL_EMAIL_CLAIM_TIMEOUT, delta=5)
+
+    def test_concurrent_claim_is_lost(self):
+        """Другой отправитель забрал письмо между выборкой кандидатов и условным UPDATE этого отправителя - UPDATE
+        (по прежним статусу и числу попыток) не изменит строку, и письмо не будет отправлено дважды."""
+        update = QuerySet.update
+
+        def update_after_other_sender(queryset, **kwargs):
+            if "attempts" in kwargs and not self.email.attempts:
+                self.email.attempts = 1
+                TransactionalEmail.objects.filter(pk=self.email.pk).update(status="sending", attempts=1)
+            return update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, "update", autospec=True, side_effect=update_after_other_sender):
+            self.assertEqual(_claim_transactional_emails(10), [])
+        self.assertEqual(TransactionalEmail.objects.get(pk=self.email.pk).attempts, 1)
+
+    def test_abandoned_sending_is_reclaimed(self):
+        """Отправитель упал после захвата письма - по истечении TRANSACTIONAL_EMAIL_CLAIM_TIMEOUT письмо забирается
+        снова, а если попытки закончились - помечается "failed"."""
+        _claim_transactional_emails(10)
+        self.make_due()
+        self.assertEqual(send_transactional_emails(), {"sent": 1, "retry": 0, "failed": 0})
+
+        other = enqueue_transactional_email("activation", "other@example.com", "Тема", "Текст")
+        TransactionalEmail.objects.filter(pk=other.pk).update(
+            status="sending", attempts=TRANSACTIONAL_EMAIL_MAX_ATTEMPTS, next_attempt_at=timezone.now()
+        )
+        self.assertEqual(send_transactional_emails(), {"sent": 0, "retry": 0, "failed": 0})
+        other.refresh_from_db()
+        self.assertEqual(other.status, "failed")
+
+    def test_background_send_errors_are_logged(self):
+        with mock.patch("users.services.send_transactional_emails", side_effect=RuntimeError("БД недоступна")), \
+                mock.patch("users.services.connections.close_all"), \
+                self.assertLogs("users.services", "ERROR") as logs:
+            _send_transactional_emails_in_thread([self.email.pk])
+        self.assertIn(str(self.email.pk), logs.output[0])
+
+
+@override_settings(TRANSACTIONAL_EMAIL_SEND_IMMEDIATELY=False)
+class ResendActivationTests(TestCase):
+    """Повторная отправка письма подтверждения email (resend_activation_email): только неактивированному
+    пользователю и не чаще, чем раз в ACTIVATION_RESEND_INTERVAL секунд."""
+
+    def setUp(self):
+        self.request = RequestFactory().get("/")
+        self.user = AppUser.objects.create_user("user@example.com", "password")
+        self.user.is_active = False
+        self.user.save()
+
+    def activation_emails(self):
+        return TransactionalEmail.objects.filter(to_email=self.user.email, kind="activation")
+
+    def test_resend_is_throttled(self):
+        self.assertTrue(resend_activation_email(self.request, "User@Example.com"))
+        self.assertFalse(resend_activation_email(self.request, "user@example.com"))
+        self.assertEqual(self.activation_emails().count(), 1)
+
+        self.activation_emails().update(
+            created_at=timezone.now() - timedelta(seconds=ACTIVATION_RESEND_INTERVAL + 1)
+        )
+        self.assertTrue(resend_activation_email(self.request, "user@example.com"))
+        self.assertEqual(self.activation_emails().count(), 2)
+
+    def test_no_resend_to_active_or_unknown_user(self):
+        self.assertFalse(resend_activation_email(self.request, "unknown@example.com"))
+        self.user.is_active = True
+        self.user.save()
+        self.assertFalse(resend_activation_email(self.request, "user@example.com"))
+        self.assertFalse(self.activation_emails().exists())
@@ -2,9 +2,11 @@ from django.contrib.auth import views as auth_views
 from django.contrib.auth.views import LogoutView
 from django.urls import path, reverse_lazy
 
+from users.forms import AppUserPasswordResetForm
 from users.views import (ActivateAccountView, AppUserListView, BlockUserView,
-                         UnblockUserView, UserEmailConfirmationSentView,
-                         UserLoginView, UserRegisterView, UserStartView)
+                         ResendActivationView, UnblockUserView,
+                         UserEmailConfirmationSentView, UserLoginView,
+                         UserRegisterView, UserStartView)
 
 app_name = "users"
 
@@ -13,6 +15,7 @@ urlpatterns = [
     path("register/", UserRegisterView.as_view(), name="register_page"),
     path("activate/<uidb64>/<token>/", ActivateAccountView.as_view(), name="activate_account"),
     path("email-confirmation-sent/", UserEmailConfirmationSentView.as_view(), name="email_confirmation_sent_page"),
+    path("resend-activation/", ResendActivationView.as_view(), name="resend_activation_page"),
     path("login/", UserLoginView.as_view(), name="login_page"),
     path("logout/", LogoutView.as_view(), name="logout_page"),
     path("app-users/", AppUserListView.as_view(), name="user_list_page"),
@@ -23,6 +26,8 @@ urlpatterns = [
         "password-reset/",
         auth_views.PasswordResetView.as_view(
             template_name="users/password_reset/password_reset.html",
+            # Письмо со ссылкой не отправляется в запросе, а ставится в очередь служебных писем (отправка в фоне)
+            form_class=AppUserPasswordResetForm,
             # Django по умолчанию ищет коробочный шаблон в "registration/password_reset_email.html" и ожидает
             # стандартные имена URL-ов (password_reset_confirm и др.). Так как я изменил name= в urls.py
             # (сделал "name="password_reset_confirm_page""), то мне нужно использовать собственный шаблон письма
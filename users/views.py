@@ -1,5 +1,3 @@
-import os
-
 # messages - для отображения сообщений пользователю:
 from django.contrib import messages
 # login - логин пользователя после активации, а get_user_model - получение нашей кастомной модели пользователя
@@ -8,29 +6,24 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 # default_token_generator - генератор безопасных токенов Django для подтверждения email:
 from django.contrib.auth.tokens import default_token_generator
 from django.contrib.auth.views import LoginView
-# get_current_site - получает текущий домен сайта (например, "mailforge.com"), используется в письме:
-from django.contrib.sites.shortcuts import get_current_site
-# send_mail - отправка email через системный smtp/email backend:
-from django.core.mail import send_mail
 from django.http import HttpResponseForbidden
 from django.shortcuts import get_object_or_404, redirect
-# render_to_string - загружаю HTML-шаблон письма и заменяю в нем переменные:
-from django.template.loader import render_to_string
 from django.urls import reverse_lazy
-# force_bytes - преобразует ID пользователя в байты (нужно для кодирования в urlsafe_base64_encode):
-from django.utils.encoding import force_bytes
-# urlsafe_base64_encode - преобразует числовой ID пользователя в безопасный текст base64 (нужно для ссылки).
 # urlsafe_base64_decode - декодирует UID из ссылки обратно в ID:
-from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from django.utils.http import urlsafe_base64_decode
 # Для подтверждения email нам нужен базовый класс представления - View (не FormView)
 from django.views import View, generic
 from django.views.generic import FormView, TemplateView
 
+from app_mailing.mixins import ReadReplicaMixin
 from app_mailing.models import Mailing
+from app_mailing.pagination import KeysetPaginationMixin
 from app_mailing.services import stop_mailing
-from users.forms import AppUserLoginForm, AppUserRegistrationForm
+from users.forms import (AppUserLoginForm, AppUserRegistrationForm,
+                         ResendActivationForm)
 from users.models import AppUser
-from users.services import block_user, unblock_user
+from users.services import (block_user, resend_activation_email,
+                            send_activation_email, unblock_user)
 
 # 1. Контроллеры для регистрации и аутентификации пользователей, для подтверждения своего email для входа и выхода
 # из системы, а также для восстановления пароля
@@ -52,7 +45,7 @@ class UserStartView(TemplateView):
 
 class UserRegisterView(FormView):
     """Представление для отображения страницы регистрации нового пользователя (register.html)
-    с последующей отправкой письма для подтверждения email."""
+    с последующей отправкой письма для подтверждения email (в фоне, через очередь служебных писем)."""
 
     form_class = AppUserRegistrationForm
     template_name = "users/register.html"
@@ -79,36 +72,9 @@ class UserRegisterView(FormView):
             user.is_active = False  # Деактивирую пользователя - он не сможет войти до подтверждения email
             user.save()  # Теперь сохраняю пользователя в БД
 
-        current_site = get_current_site(self.request)  # Получаю домен тек.сайта, нужен для генерации полной ссылки
-        subject = "Подтвердите регистрацию на MailForge"
-        uid = urlsafe_base64_encode(force_bytes(user.pk))  # Генерирую зашифрованный ID пользователя
-        # Генерирую уникальный токен для подтверждения (работает как пароль на одноразовую ссылку)
-        token = default_token_generator.make_token(user)
-
-        # Строю полный абсолютный путь к ссылке активации (например: https://mailforge.com/activate/MjMyNA/token12345/)
-        activation_link = self.request.build_absolute_uri(
-            reverse_lazy("users:activate_account", kwargs={"uidb64": uid, "token": token})
-        )
-
-        # Загружаю HTML-шаблон письма и передаю в него данные
-        message = render_to_string(
-            "users/email_confirmation.html",
-            {
-                "user": user,
-                "domain": current_site.domain,
-                "activation_link": activation_link,
-            })
-
-        # Отправляю письмо пользователю
-        send_mail(
-            subject,
-            message,
-            from_email=os.getenv("YANDEX_EMAIL_HOST_USER"),
-            recipient_list=[user.email],
-            fail_silently=False,  # Выбросить ошибку, если не удалось отправить
-        )
-
-        # После успешной отправки письма делаю редирек на страницу "Письмо отправлено"
+        send_activation_email(self.request, user)  # Письмо ставится в очередь и отправляется в фоне
+
+        # После постановки письма в очередь делаю редирект на страницу "Письмо отправлено"
         return redirect("users:email_confirmation_sent_page")
 
 
@@ -159,6 +125,25 @@ class UserEmailConfirmationSentView(TemplateView):
         return super().dispatch(request, *args, **kwargs)
 
 
+class ResendActivationView(FormView):
+    """Представление для повторной отправки письма подтверждения email (resend_activation.html)."""
+
+    form_class = ResendActivationForm
+    template_name = "users/resend_activation.html"
+
+    def dispatch(self, request, *args, **kwargs):
+        """Авторизованный пользователь уже подтвердил email - перенаправление на главную страницу."""
+        if self.request.user.is_authenticated:
+            return redirect("app_mailing:main_page")
+        return super().dispatch(request, *args, **kwargs)
+
+    def form_valid(self, form):
+        """Ставит письмо в очередь (если пользователь не активирован и письмо не отправлялось только что) и всегда
+        показывает одну и ту же страницу - по ответу нельзя узнать, зарегистрирован ли email."""
+        resend_activation_email(self.request, form.cleaned_data["email"])
+        return redirect("users:email_confirmation_sent_page")
+
+
 class UserLoginView(LoginView):
     """Представление для входа пользователя (login.html)."""
 
@@ -182,19 +167,20 @@ class UserLoginView(LoginView):
 
 # 2. Контроллеры для пользователей "Менеджер сервиса"
 
-class AppUserListView(LoginRequiredMixin, generic.ListView):
-    """Представление для отображения списка *Пользователей сервиса*."""
+class AppUserListView(LoginRequiredMixin, ReadReplicaMixin, KeysetPaginationMixin, generic.ListView):
+    """Представление для отображения списка *Пользователей сервиса* (постранично, по курсору)."""
 
     model = AppUser
     template_name = ("users/app_users/user_list.html")
     context_object_name = "app_users"
+    keyset_ordering = ("email", "id")
 
     def dispatch(self, request, *args, **kwargs):
         """Метод проверяет, имеет ли текущий пользователь право 'can_see_list_user' на просмотр списка пользователей.
         Если не имеет - возвращает запрет доступа (403 Forbidden).
         Эта проверка выполняется до обработки любого типа запроса (GET, POST и т.д.), гарантируя безопасность доступа
         ко всем методам представления."""
-        if not request.user.has_perm("users.can_see_list_user"):
+        if not request.authz.has_perm("users.can_see_list_user"):
             return HttpResponseForbidden("У вас нет прав на просмотр списка пользователей сервиса.")
         return super().dispatch(request, *args, **kwargs)
 
@@ -211,7 +197,7 @@ class BlockUserView(LoginRequiredMixin, generic.View):
         """Метод проверяет, имеет ли текущий пользователь право 'can_block_user' на блокировку пользователей.
         Если не имеет - возвращает запрет доступа (403 Forbidden).
         Выполняется до обработки любого запроса, обеспечивая защиту на всех уровнях."""
-        if not request.user.has_perm("users.can_block_user"):
+        if not request.authz.has_perm("users.can_block_user"):
             return HttpResponseForbidden("У вас нет прав на блокировку пользователей сервиса.")
         return super().dispatch(request, *args, **kwargs)
 
@@ -240,7 +226,7 @@ class UnblockUserView(LoginRequiredMixin, generic.View):
         """Метод проверяет, имеет ли текущий пользователь право 'can_block_user' на разблокировку пользователей.
         Если не имеет - возвращает запрет доступа (403 Forbidden).
         Выполняется до обработки любого запроса, обеспечивая защиту на всех уровнях."""
-        if not request.user.has_perm("users.can_block_user"):
+        if not request.authz.has_perm("users.can_block_user"):
             return HttpResponseForbidden("У вас нет прав на разблокировку пользователей сервиса.")
         return super().dispatch(request, *args, **kwargs)
 